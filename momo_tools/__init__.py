@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s
+ momo 商品頁查核工具（原 momo_check_v1 ~ v6 合併而成）
+
+ 常用入口在第一次存取時才載入對應子模組，import momo_tools 本身不會載入
+ requests / bs4 / pandas / openpyxl：
+
+     import momo_tools
+     momo_tools.fetch_momo_product(url, rules="v5")
+
+ 指令列：python -m momo_tools --help
+"""
+
+import functools
+import importlib
+
+_LAZY_EXPORTS = {
+    "parse_momo_simple": "fetch",
+    "fetch_momo_product": "fetch",
+    "extract_product_fields": "extractors",
+    "register_rules": "extractors",
+    "get_rules": "extractors",
+    "RULESETS": "extractors",
+    "OUTPUT_COLUMNS": "pipeline",
+    "load_input_csv": "pipeline",
+    "load_input_records": "pipeline",
+    "iter_output_rows": "pipeline",
+    "build_output_rows": "pipeline",
+    "export_to_excel": "pipeline",
+    "to_roc_date": "common",
+    "extract_urls_from_text": "common",
+    "canonicalize_momo_url": "common",
+    "find_bsmi_codes": "bsmi",
+    "harvest_products": "harvest",
+    "HistoryStore": "history",
+    "KeywordRules": "keywords",
+    "legacy_word_report": "legacy_word",
+    "main": "cli",
+}
+
+__all__ = sorted(_LAZY_EXPORTS)
+# 接受 rules 參數的入口：舊版相容檔（momo_check_v1 ~ v6、momo_colab_export）預先帶入各自的規則版本
+_RULES_EXPORTS = frozenset(
+    {"parse_momo_simple", "fetch_momo_product", "extract_product_fields", "iter_output_rows", "build_output_rows"}
+)
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+def legacy_export(name: str, rules: str):
+    """
+    舊版相容檔的模組 __getattr__：回傳 momo_tools 的同名入口；接受 rules 的函式以 functools.partial 帶入
+    該版規則（呼叫端明確傳入 rules= 時仍以呼叫端為準）。
+    """
+    value = getattr(importlib.import_module(__name__), name)
+    if name in _RULES_EXPORTS:
+        return functools.partial(value, rules=rules)
+    return value
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from .cli import main
+
+# 解析行程以 spawn 啟動時會重新載入 __main__，入口必須放在 guard 內
+if __name__ == "__main__":
+    main()
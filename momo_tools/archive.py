@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . a r c h i v e
+ 原始商品頁存檔（append-only）：查核當天實際抓到的 HTML 逐筆壓縮保存，供日後稽核與離線重新解析
+
+ - 資料檔（.arc）只會往後附加；每筆紀錄 = 標頭（i_code、網址、抓取時間、編碼、SHA-256）+ 壓縮後的 HTML
+ - 有安裝 zstandard 時以 zstd 逐筆壓縮，否則改用 zlib；編碼方式記在每筆紀錄裡，兩者可混用
+ - 索引檔（.arc.idx，JSONL）記錄 i_code →（offset、length、抓取時間），開檔時讀入記憶體；
+   索引遺失或損毀時可由資料檔標頭重建（rebuild_index，既有索引中仍有效的列一併保留）
+ - 讀取以 mmap 對應資料檔，只解壓需要的那一筆，不會把整個存檔讀進記憶體
+ - 同一 i_code 內容未變（例如 304 重新驗證）時只新增索引列、沿用既有資料，證明該日看到的頁面而不重複存放
+
+ 指令列：python -m momo_tools.archive show I_CODE [--date 115/10/18]｜list｜rebuild
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .common import from_roc_date
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 未安裝時改用 zlib
+    zstandard = None
+
+DEFAULT_ARCHIVE_PATH = "momo_page_archive.arc"
+MAGIC = b"MPA1"
+_HEADER = struct.Struct(">4sII")  # magic、標頭 JSON 長度、壓縮內容長度
+ZSTD_LEVEL = 10
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+@dataclass
+class ArchiveRecord:
+    i_code: str
+    url: str
+    offset: int  # 壓縮內容在資料檔中的位置（不含標頭）
+    length: int
+    size: int  # 解壓後位元組數
+    codec: str
+    sha256: str
+    fetched_at: float
+
+
+_local = threading.local()
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        # ZstdCompressor 不可跨執行緒共用，每個 worker 各自保留一個
+        compressor = getattr(_local, "compressor", None)
+        if compressor is None:
+            compressor = _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("這筆存檔以 zstd 壓縮，請先執行 pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as fh:
+        fh.seek(-1, os.SEEK_END)
+        return fh.read(1) == b"\n"
+
+
+class PageArchive:
+    """
+    執行緒安全的頁面存檔，可由並行 worker 共用；寫入時以鎖保護檔尾與索引，
+    讀取透過唯讀 mmap，資料檔成長後自動重新對應。
+    """
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH, codec: Optional[str] = None) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        self.codec = codec or ("zstd" if zstd_available() else "zlib")
+        self.stored = 0
+        self.unchanged = 0
+        self.stored_bytes = 0
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[ArchiveRecord]] = {}
+        self._data = open(path, "ab")
+        self._index = None
+        self._map: Optional[mmap.mmap] = None
+        if not os.path.exists(self.index_path) and self._data.tell() > 0:
+            self.rebuild_index()
+        else:
+            self._load_index()
+
+    # ---- 索引 ----
+
+    def _read_index_lines(self) -> List[ArchiveRecord]:
+        records: List[ArchiveRecord] = []
+        if not os.path.exists(self.index_path):
+            return records
+        with open(self.index_path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    records.append(ArchiveRecord(**json.loads(line)))
+                except (ValueError, TypeError):
+                    continue  # 中斷時寫壞的最後一行
+        return records
+
+    def _load_index(self) -> None:
+        end = self._data.tell()
+        for record in self._read_index_lines():
+            if record.offset + record.length <= end:
+                self._records.setdefault(record.i_code, []).append(record)
+
+    def rebuild_index(self) -> int:
+        """
+        依資料檔中的紀錄標頭重建索引檔，回傳索引筆數。
+        內容未變時只有索引列（資料檔沒有對應的標頭），因此既有索引中指向有效紀錄
+        （offset、length、SHA-256 與資料檔標頭相符）的列一併保留，依抓取時間與資料紀錄合併。
+        """
+        with self._lock:
+            self._records.clear()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            entries: List[ArchiveRecord] = []
+            view = self._mapped(self._data.tell())
+            pos, end = 0, len(view) if view is not None else 0
+            while pos + _HEADER.size <= end:
+                magic, meta_len, length = _HEADER.unpack_from(view, pos)
+                start = pos + _HEADER.size + meta_len
+                if magic != MAGIC or start + length > end:
+                    break
+                meta = json.loads(bytes(view[pos + _HEADER.size : start]).decode("utf-8"))
+                entries.append(ArchiveRecord(offset=start, length=length, **meta))
+                pos = start + length
+
+            stored = {record.offset: record for record in entries}
+            seen = {tuple(asdict(record).values()) for record in entries}
+            for record in self._read_index_lines():
+                data = stored.get(record.offset)
+                if data is None or (data.length, data.sha256) != (record.length, record.sha256):
+                    continue
+                key = tuple(asdict(record).values())
+                if key not in seen:
+                    seen.add(key)
+                    entries.append(record)
+            entries.sort(key=lambda record: (record.fetched_at, record.offset))
+
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                for record in entries:
+                    fh.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+                    self._records.setdefault(record.i_code, []).append(record)
+            os.replace(tmp_path, self.index_path)
+        return len(entries)
+
+    def _append_index(self, record: ArchiveRecord) -> None:
+        if self._index is None:
+            self._index = open(self.index_path, "a", encoding="utf-8")
+            if self._index.tell() > 0 and not _ends_with_newline(self.index_path):
+                self._index.write("\n")  # 上次中斷時寫到一半的索引列不能與新的一列黏在一起
+        self._index.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        self._records.setdefault(record.i_code, []).append(record)
+
+    # ---- 寫入 ----
+
+    def _put_duplicate_locked(self, key: str, url: str, digest: str, fetched_at: float) -> Optional[ArchiveRecord]:
+        # 與該鍵最近一筆內容相同：只新增指向同一份資料的索引列
+        history = self._records.get(key)
+        if not history or history[-1].sha256 != digest:
+            return None
+        previous = history[-1]
+        record = ArchiveRecord(
+            key, url, previous.offset, previous.length, previous.size, previous.codec, digest, fetched_at
+        )
+        self._append_index(record)
+        self.unchanged += 1
+        return record
+
+    def put(self, i_code: str, url: str, body: str, fetched_at: Optional[float] = None) -> ArchiveRecord:
+        """
+        存入一次抓取的結果；與該 i_code 最近一筆內容相同時只新增索引列。
+        壓縮在鎖外進行；寫入前在同一個鎖內重新比對，同時存入相同內容（共用抓取、304 與完整下載並行）時只寫一份。
+        """
+        key = i_code or url
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        raw = body.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            record = self._put_duplicate_locked(key, url, digest, fetched_at)
+            if record is not None:
+                return record
+
+        payload = _compress(raw, self.codec)
+        meta = {
+            "i_code": key,
+            "url": url,
+            "size": len(raw),
+            "codec": self.codec,
+            "sha256": digest,
+            "fetched_at": fetched_at,
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            record = self._put_duplicate_locked(key, url, digest, fetched_at)
+            if record is not None:
+                return record
+            # 先寫資料再寫索引：中斷時最多留下索引沒有指到的資料，不會有指向半筆資料的索引
+            self._data.write(_HEADER.pack(MAGIC, len(meta_bytes), len(payload)) + meta_bytes)
+            offset = self._data.tell()
+            self._data.write(payload)
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            record = ArchiveRecord(key, url, offset, len(payload), len(raw), self.codec, digest, fetched_at)
+            self._append_index(record)
+            self.stored += 1
+            self.stored_bytes += len(payload)
+        return record
+
+    # ---- 讀取 ----
+
+    def _mapped(self, end: int) -> Optional[mmap.mmap]:
+        # 呼叫端需持有 self._lock；舊的對應不主動關閉，仍在使用中的 memoryview 不受影響
+        if end <= 0:
+            return None
+        if self._map is None or len(self._map) < end:
+            with open(self.path, "rb") as fh:
+                self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, record: ArchiveRecord) -> str:
+        """解壓並驗證單筆紀錄（SHA-256 不符時拋出 ValueError）。"""
+        with self._lock:
+            view = self._mapped(record.offset + record.length)
+        if view is None:
+            raise ValueError(f"存檔是空的：{self.path}")
+        with memoryview(view)[record.offset : record.offset + record.length] as chunk:
+            raw = _decompress(chunk, record.codec)
+        if hashlib.sha256(raw).hexdigest() != record.sha256:
+            raise ValueError(f"存檔紀錄內容與 SHA-256 不符：{record.i_code} @ {record.offset}")
+        return raw.decode("utf-8")
+
+    def history(self, i_code: str) -> List[ArchiveRecord]:
+        """該 i_code 的所有抓取紀錄（依寫入順序）。"""
+        with self._lock:
+            return list(self._records.get(i_code, ()))
+
+    def lookup(self, i_code: str, at: Optional[float] = None) -> Optional[ArchiveRecord]:
+        """at 時間點（含）以前最近一次抓取的紀錄；at 為 None 時取最新一筆。"""
+        candidates = [r for r in self.history(i_code) if at is None or r.fetched_at <= at]
+        return max(candidates, key=lambda r: r.fetched_at) if candidates else None
+
+    def get(self, i_code: str, at: Optional[float] = None) -> Optional[str]:
+        record = self.lookup(i_code, at)
+        return self.read(record) if record is not None else None
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return sorted(self._records)
+
+    def iter_pages(self) -> Iterator[Tuple[str, str, str]]:
+        """逐筆產生各 i_code 最新的（i_code、網址、頁面 HTML），介面同 PageCache.iter_pages。"""
+        for i_code in self.keys():
+            record = self.lookup(i_code)
+            if record is not None:
+                yield i_code, record.url, self.read(record)
+
+    def summary(self) -> str:
+        return (
+            f"頁面存檔：新增 {self.stored} 筆（{self.stored_bytes / 1024 / 1024:.1f} MB，{self.codec}）、"
+            f"內容未變 {self.unchanged} 筆"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._data.close()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            self._map = None
+
+
+def roc_day_end(roc_date: str) -> float:
+    """查核日期（民國年，例如 115/10/18）當天結束的時間戳記。"""
+    day = from_roc_date(roc_date)
+    day_after = datetime.datetime(day.year, day.month, day.day) + datetime.timedelta(days=1)
+    return day_after.timestamp() - 1e-6
+
+
+def _format_time(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.archive", description="查詢原始商品頁存檔")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="存檔路徑（.arc）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="輸出某 i_code 存檔的 HTML")
+    show.add_argument("i_code")
+    show.add_argument("--date", default="", help="查核日期（民國年，例如 115/10/18）：取當天（含）以前最後一次抓取的版本")
+    show.add_argument("--output", default="", help="寫入檔案（預設印到標準輸出）")
+    sub.add_parser("list", help="列出各 i_code 的抓取紀錄")
+    sub.add_parser("rebuild", help="由資料檔重建索引")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.archive):
+        raise SystemExit(f"❌ 找不到存檔：{args.archive}")
+    archive = PageArchive(args.archive)
+    try:
+        if args.command == "rebuild":
+            print(f"✅ 已重建索引：{archive.rebuild_index()} 筆")
+        elif args.command == "list":
+            for i_code in archive.keys():
+                for record in archive.history(i_code):
+                    print(f"{i_code}\t{_format_time(record.fetched_at)}\t{record.size} bytes\t{record.sha256[:12]}")
+        else:
+            try:
+                at = roc_day_end(args.date) if args.date else None
+            except ValueError:
+                raise SystemExit(f"❌ 無法辨識的查核日期：{args.date}（格式如 115/10/18）")
+            record = archive.lookup(args.i_code, at)
+            if record is None:
+                raise SystemExit(f"❌ 存檔中沒有 {args.i_code}" + (f" 在 {args.date} 以前的紀錄" if at else ""))
+            page_html = archive.read(record)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as fh:
+                    fh.write(page_html)
+                print(f"✅ {args.i_code}（{_format_time(record.fetched_at)} 抓取，SHA-256 {record.sha256}）：{args.output}")
+            else:
+                print(page_html)
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . a s y n c _ p i p e l i n e
+ asyncio 版的批次流程（cli --async）：抓取、解析、輸出拆成三個階段，以有上限的佇列串接
+
+ - 抓取：aiohttp 共用一個 TCPConnector（連線數上限 = connections），限速、熔斷、重試與快取規則同執行緒版
+ - 解析：BeautifulSoup / lxml / regex 擷取送進 ProcessPoolExecutor，不再與網路 I/O 搶同一個 GIL，可用滿所有核心
+ - 輸出：依輸入順序重新排序後逐列交給匯出端（export_to_excel 照舊以 write-only 模式逐列寫入）
+ - light=True 時解析行程先以 lightfetch 讀 JSON-LD，欄位不足才解析整頁（頁面仍完整下載，省的是解析 CPU）
+ - v6 規則在頁面中找不到商檢字號時，Area302 的 iframe 以獨立 task 同時抓取（同 fetch.area302_iframe_code），不佔用解析名額
+ - 同一商品的不同網址寫法只抓一次（同 pipeline.iter_output_rows 的 dedupe），結果分送給每個對應的序號
+ - 已讀入但尚未輸出的列數以 window 限制：前面的列卡住時讀入端會停下來等，記憶體維持平穩
+ - aiohttp 為選用套件；未安裝時 available() 回傳 False
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import config
+from .archive import PageArchive
+from .cache import IFRAME_KEY_PREFIX, PageCache
+from .checkpoint import CheckpointJournal, checkpoint_key
+from .common import canonicalize_momo_url
+from .extractors import area302_iframe_sources, extract_product_fields, iframe_bsmi_code
+from .fetch import REQUEST_HEADERS, failed_fields, fetch_target
+from .inputs import InputRecord
+from .lightfetch import extract_from_page
+from .metrics import RowTrace, RunMetrics
+from .pipeline import RecentResults, _build_output_row, is_failed_row, make_retry_policy, resumable_rows
+from .pool import HostRateLimiter
+from .retry import RetryPolicy
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - 未安裝 aiohttp 時只能使用執行緒版流程
+    aiohttp = None
+
+_DONE = object()
+
+
+def available() -> bool:
+    return aiohttp is not None
+
+
+class AsyncRetryPolicy(RetryPolicy):
+    transient_errors = RetryPolicy.transient_errors + (
+        (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+        if aiohttp is not None
+        else (asyncio.TimeoutError,)
+    )
+
+
+class _Stopped(Exception):
+    """輸出端（產生器）已被提前關閉。"""
+
+
+def _extract_worker(
+    page_html: str, rules: Optional[str], backend: str, light: bool = False, iframe_base: str = ""
+) -> Tuple[str, str, str, float, float, str, str, list, List[str]]:
+    # 在解析行程中執行：只回傳可 pickle 的結果，耗時、命中順位、擷取路徑與欄位 tier 紀錄由主行程填回 RowTrace；
+    # iframe_base 不為空且找不到商檢字號時，一併回傳 Area302 的 iframe 網址
+    trace = RowTrace()
+    if light:
+        name, prod_no, code = extract_from_page(page_html, rules or config.BSMI_RULES, trace, backend)
+    else:
+        name, prod_no, code = extract_product_fields(page_html, rules=rules, backend=backend, trace=trace)
+    iframes = area302_iframe_sources(page_html, iframe_base, backend) if iframe_base and not code else []
+    return (
+        name, prod_no, code, trace.parse_ms, trace.extract_ms, trace.tier, trace.path, trace.field_tiers, iframes
+    )
+
+
+def _trace_config():
+    # 以 aiohttp 的 TraceConfig 量測建立新連線（DNS+TCP+TLS）的時間，累加到該列的 RowTrace
+    trace_config = aiohttp.TraceConfig()
+
+    async def _on_start(session, ctx, params) -> None:
+        ctx.connect_started = time.perf_counter()
+
+    async def _on_end(session, ctx, params) -> None:
+        row_trace = ctx.trace_request_ctx
+        if row_trace is not None:
+            row_trace.connect_ms += (time.perf_counter() - ctx.connect_started) * 1000
+
+    trace_config.on_connection_create_start.append(_on_start)
+    trace_config.on_connection_create_end.append(_on_end)
+    return trace_config
+
+
+async def _wait_for(remaining) -> None:
+    # remaining() 為不阻塞的查詢（回傳還要等幾秒），以 await sleep 代替 time.sleep
+    while True:
+        wait = remaining()
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+async def _download_page_async(
+    session,
+    m_url: str,
+    i_code: str,
+    rate_limiter: Optional[HostRateLimiter],
+    cache: Optional[PageCache],
+    trace: Optional[RowTrace],
+    archive: Optional[PageArchive] = None,
+) -> str:
+    """fetch._download_page 的 asyncio 版：快取、條件式請求、存檔與 trace 欄位的規則相同。"""
+    entry = await asyncio.to_thread(cache.lookup, i_code) if cache is not None and i_code else None
+    if entry is not None and entry.is_fresh():
+        cache.record("hit")
+        if trace is not None:
+            trace.cache = "hit"
+        return entry.body
+
+    request_headers = dict(REQUEST_HEADERS)
+    if entry is not None:
+        request_headers.update(entry.conditional_headers())
+
+    if rate_limiter is not None:
+        await _wait_for(lambda: rate_limiter.try_acquire(m_url))
+    connect_before = trace.connect_ms if trace is not None else 0.0
+    start = time.perf_counter()
+    async with session.get(m_url, headers=request_headers, trace_request_ctx=trace) as res:
+        headers_at = time.perf_counter()
+        body = await res.read()
+        if trace is not None:
+            connect = trace.connect_ms - connect_before
+            trace.status = res.status
+            trace.ttfb_ms = max(0.0, (headers_at - start) * 1000 - connect)
+            trace.download_ms = (time.perf_counter() - headers_at) * 1000
+            trace.bytes += len(body)
+        if res.status == 304 and entry is not None:
+            await asyncio.to_thread(cache.refresh, i_code)
+            cache.record("revalidated")
+            if trace is not None:
+                trace.cache = "revalidated"
+            if archive is not None:
+                await asyncio.to_thread(archive.put, i_code, m_url, entry.body)
+            return entry.body
+
+        res.raise_for_status()
+        text = body.decode(res.get_encoding(), errors="replace")
+        etag = res.headers.get("ETag", "")
+        last_modified = res.headers.get("Last-Modified", "")
+
+    if archive is not None:
+        await asyncio.to_thread(archive.put, i_code, m_url, text)
+
+    if cache is not None and i_code:
+        await asyncio.to_thread(cache.put, i_code, m_url, text, etag, last_modified)
+        cache.record("miss")
+        if trace is not None:
+            trace.cache = "miss"
+    return text
+
+
+async def _area302_iframe_code_async(
+    session,
+    sources: List[str],
+    rate_limiter: Optional[HostRateLimiter],
+    cache: Optional[PageCache],
+    executor: ProcessPoolExecutor,
+    backend: str,
+) -> str:
+    """fetch.area302_iframe_code 的 asyncio 版：所有 iframe 同時抓取，依文件順序取第一個找到的字號，其餘取消。"""
+    loop = asyncio.get_running_loop()
+    tasks = [
+        asyncio.ensure_future(_download_page_async(session, src, IFRAME_KEY_PREFIX + src, rate_limiter, cache, None))
+        for src in sources
+    ]
+    try:
+        for src, task in zip(sources, tasks):
+            try:
+                code = await loop.run_in_executor(executor, iframe_bsmi_code, await task, backend)
+            except Exception as e:
+                print(f"⚠️ (iframe) 抓取失敗：{src}：{e or type(e).__name__}")
+                continue
+            if code:
+                return code
+        return ""
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _fetch_html(
+    session,
+    url: str,
+    rate_limiter: Optional[HostRateLimiter],
+    cache: Optional[PageCache],
+    policy: RetryPolicy,
+    trace: Optional[RowTrace],
+    archive: Optional[PageArchive] = None,
+    rules: Optional[str] = None,
+) -> Tuple[Optional[str], str]:
+    """含重試的抓取，回傳（頁面、錯誤訊息）；放棄時頁面為 None（與 parse_momo_simple 相同，見 fetch.failed_fields）。"""
+    i_code, key, m_url = fetch_target(url, rules)
+    error = ""
+    for attempt in range(1, config.MAX_ATTEMPTS + 1):
+        if trace is not None:
+            trace.attempts = attempt
+            trace.error = ""
+        await _wait_for(policy.pause_remaining)
+        try:
+            page_html = await _download_page_async(session, m_url, key, rate_limiter, cache, trace, archive)
+            policy.on_success()
+            return page_html, ""
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+            if trace is not None:
+                trace.error = error
+            delay = policy.on_failure(e, attempt, config.MAX_ATTEMPTS)
+            if delay is None and not policy.is_retryable(e):
+                print(f"❌ (Mobile) 發生例外：{error}")
+                return None, error
+            print(f"❌ (Mobile) 第 {attempt} 次失敗：{error}")
+            if delay is None:
+                return None, error
+            await asyncio.sleep(delay)
+        except Exception as e:
+            error = str(e)
+            if trace is not None:
+                trace.error = error
+            print(f"❌ (Mobile) 發生例外：{e}")
+            return None, error
+    return None, error
+
+
+async def _run_pipeline(
+    records: Iterable[InputRecord],
+    roc_date: str,
+    emit,
+    stop: threading.Event,
+    connections: int,
+    processes: int,
+    window: int,
+    rate_limiter: HostRateLimiter,
+    cache: Optional[PageCache],
+    completed: Dict[str, Dict[str, object]],
+    with_trace: bool,
+    rules: Optional[str],
+    backend: str,
+    archive: Optional[PageArchive] = None,
+    dedupe: bool = True,
+    light: bool = False,
+) -> None:
+    loop = asyncio.get_running_loop()
+    policy = make_retry_policy(AsyncRetryPolicy)
+    slots = asyncio.Semaphore(window)
+    fetch_q: asyncio.Queue = asyncio.Queue(maxsize=connections * 2)
+    parse_q: asyncio.Queue = asyncio.Queue(maxsize=processes * 2)
+    sink_q: asyncio.Queue = asyncio.Queue()  # 筆數已由 slots 限制在 window 以內
+    parsers = processes * 2  # 每個解析行程保持一筆排隊，避免行程閒置
+    # 去重：標準化網址 → 第一列的擷取結果；重複的列由 fan_out 等待同一個 future。
+    # 同 pipeline.SharedFetches：refs 為尚未取走結果的列數，歸零即移出，成功的結果改存進 recent
+    results: Dict[str, asyncio.Future] = {}
+    refs: Dict[str, int] = {}
+    recent = RecentResults()
+    waiters: Set[asyncio.Future] = set()
+    duplicates = [0]
+    with_iframes = config.IFRAME_FETCH and not light and (rules or config.BSMI_RULES) == "v6"
+
+    def failed_info(error: str) -> Dict[str, str]:
+        name, prod_no = failed_fields(rules, error)
+        return {"商品名稱": name, "品號": prod_no, "商檢字號": ""}
+
+    async def feed() -> None:
+        # 清單可能是會阻塞的 generator（--search 的 harvest 翻搜尋頁、讀大型 XLSX）：
+        # 每筆在執行緒中取出，事件迴圈上在途的抓取不會被卡住
+        rows = iter(records)
+        for idx in itertools.count():
+            record = await asyncio.to_thread(next, rows, None)
+            if record is None:
+                break
+            seq, url = record
+            await slots.acquire()
+            if stop.is_set():
+                break
+            done = completed.get(checkpoint_key(seq))
+            if done is not None:
+                await sink_q.put((idx, done, None, False))
+                continue
+            trace = RowTrace(seq=seq, url=url) if with_trace else None
+            if not url:
+                await sink_q.put((idx, _build_output_row(seq, url, {}, roc_date), trace, True))
+                continue
+            key = canonicalize_momo_url(url) if dedupe else ""
+            info = recent.get(key) if key else None
+            shared = results.get(key) if key else None
+            if info is not None or shared is not None:
+                duplicates[0] += 1
+                if trace is not None:
+                    trace.cache = "dedup"
+            if info is not None:
+                # 同一商品不久前已完成：直接沿用結果
+                await sink_q.put((idx, _build_output_row(seq, url, info, roc_date), trace, True))
+                continue
+            if shared is not None:
+                # 同一商品抓取中：等同一份結果，不再排進抓取佇列
+                refs[key] += 1
+                waiter = asyncio.ensure_future(fan_out(idx, seq, url, trace, key, shared))
+                waiters.add(waiter)
+                waiter.add_done_callback(waiters.discard)
+                continue
+            result = loop.create_future()
+            if key:
+                results[key] = result
+                refs[key] = 1
+                result.add_done_callback(lambda _, key=key: release(key))
+            await fetch_q.put((idx, seq, url, trace, result))
+        for _ in range(connections):
+            await fetch_q.put(None)
+
+    def release(key: str) -> None:
+        refs[key] -= 1
+        if refs[key]:
+            return
+        del refs[key]
+        future = results.pop(key)
+        if not future.cancelled() and future.exception() is None:
+            recent.put(key, future.result())
+
+    async def fan_out(
+        idx: int, seq, url: str, trace: Optional[RowTrace], key: str, shared: asyncio.Future
+    ) -> None:
+        try:
+            info = await asyncio.shield(shared)
+        finally:
+            release(key)
+        await sink_q.put((idx, _build_output_row(seq, url, info, roc_date), trace, True))
+
+    async def fetch(session) -> None:
+        while True:
+            item = await fetch_q.get()
+            if item is None:
+                return
+            idx, seq, url, trace, result = item
+            page_html, error = await _fetch_html(session, url, rate_limiter, cache, policy, trace, archive, rules)
+            if page_html is None:
+                info = failed_info(error)
+                result.set_result(info)
+                await sink_q.put((idx, _build_output_row(seq, url, info, roc_date), trace, True))
+            else:
+                await parse_q.put((idx, seq, url, page_html, trace, result))
+
+    async def parse(executor: ProcessPoolExecutor, session) -> None:
+        while True:
+            item = await parse_q.get()
+            if item is None:
+                return
+            idx, seq, url, page_html, trace, result = item
+            iframes: List[str] = []
+            iframe_base = fetch_target(url, rules)[2] if with_iframes else ""
+            try:
+                extracted = await loop.run_in_executor(
+                    executor, _extract_worker, page_html, rules, backend, light, iframe_base
+                )
+                name, prod_no, code, parse_ms, extract_ms, tier, path, field_tiers, iframes = extracted
+                info = {"商品名稱": name, "品號": prod_no, "商檢字號": code}
+                if trace is not None:
+                    trace.parse_ms, trace.extract_ms, trace.tier, trace.path = parse_ms, extract_ms, tier, path
+                    trace.field_tiers = field_tiers
+            except Exception as e:
+                print(f"❌ (Mobile) 發生例外：{e}")
+                info = failed_info(str(e))
+                if trace is not None:
+                    trace.error = str(e)
+            if iframes:
+                waiter = asyncio.ensure_future(
+                    iframe_lookup(idx, seq, url, info, trace, result, iframes[: config.IFRAME_MAX], executor, session)
+                )
+                waiters.add(waiter)
+                waiter.add_done_callback(waiters.discard)
+                continue
+            result.set_result(info)
+            await sink_q.put((idx, _build_output_row(seq, url, info, roc_date), trace, True))
+
+    async def iframe_lookup(
+        idx: int, seq, url: str, info: Dict[str, str], trace: Optional[RowTrace], result, sources, executor, session
+    ) -> None:
+        code = await _area302_iframe_code_async(session, sources, rate_limiter, cache, executor, backend)
+        if code:
+            info = dict(info, 商檢字號=code)
+            if trace is not None:
+                trace.tier = "Area302-iframe"
+        result.set_result(info)
+        await sink_q.put((idx, _build_output_row(seq, url, info, roc_date), trace, True))
+
+    async def sink() -> None:
+        # 依輸入順序輸出；emit 會在輸出端佇列滿時阻塞，因此放到執行緒中等待
+        pending: Dict[int, Tuple[Dict[str, object], Optional[RowTrace], bool]] = {}
+        next_idx = 0
+        while True:
+            item = await sink_q.get()
+            if item is _DONE:
+                return
+            idx, row, trace, fresh = item
+            pending[idx] = (row, trace, fresh)
+            while next_idx in pending:
+                row, trace, fresh = pending.pop(next_idx)
+                if trace is not None:
+                    trace.finish()
+                if not await loop.run_in_executor(None, emit, (row, trace, fresh)):
+                    raise _Stopped()
+                next_idx += 1
+                slots.release()
+
+    timeout = aiohttp.ClientTimeout(total=20)
+    connector = aiohttp.TCPConnector(limit=connections, limit_per_host=connections, ttl_dns_cache=300)
+    # spawn：事件迴圈執行緒中 fork 不安全，解析行程一律重新啟動直譯器
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=mp_context) as executor:
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout, headers=REQUEST_HEADERS, trace_configs=[_trace_config()]
+        ) as session:
+
+            async def produce() -> None:
+                await asyncio.gather(feed(), *(fetch(session) for _ in range(connections)))
+                for _ in range(parsers):
+                    await parse_q.put(None)
+
+            async def drive() -> None:
+                await asyncio.gather(produce(), *(parse(executor, session) for _ in range(parsers)))
+                await asyncio.gather(*waiters)
+                await sink_q.put(_DONE)
+
+            tasks = [asyncio.ensure_future(drive()), asyncio.ensure_future(sink())]
+            try:
+                await asyncio.gather(*tasks)
+            except _Stopped:
+                pass
+            finally:
+                # 任一階段失敗或輸出端提前關閉時，取消其餘階段（讀入端可能正等著 slots）
+                pending = tasks + list(waiters)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+    if duplicates[0]:
+        print(f"🔁 重複的商品網址 {duplicates[0]} 列，沿用同一次抓取結果")
+
+
+def iter_output_rows_async(
+    records: Iterable[InputRecord],
+    roc_date: str,
+    connections: int = config.MAX_WORKERS,
+    processes: int = config.PARSE_PROCESSES,
+    window: int = config.ASYNC_WINDOW,
+    rate_per_host: float = config.RATE_PER_HOST,
+    burst: int = config.RATE_BURST,
+    cache: Optional[PageCache] = None,
+    journal: Optional[CheckpointJournal] = None,
+    completed: Optional[Dict[str, Dict[str, object]]] = None,
+    metrics: Optional[RunMetrics] = None,
+    rules: Optional[str] = None,
+    archive: Optional[PageArchive] = None,
+    dedupe: bool = True,
+    light: bool = False,
+) -> Iterator[Dict[str, object]]:
+    """
+    與 pipeline.iter_output_rows 相同的介面與輸出（依輸入順序 yield 輸出列），改以 asyncio 流程執行：
+    事件迴圈在背景執行緒中負責抓取與排程，解析在 processes 個行程中進行，本產生器只負責交出結果。
+    """
+    if not available():
+        raise RuntimeError("asyncio 模式需要 aiohttp，請先執行 pip install aiohttp")
+    connections = max(1, int(connections))
+    processes = max(1, int(processes or os.cpu_count() or 1))
+    window = max(connections + processes, int(window))
+    completed = resumable_rows(completed)
+    if completed:
+        print(f"續跑：檢查點日誌已有 {len(completed)} 列完成紀錄，這些序號將直接沿用")
+
+    out_q: queue.Queue = queue.Queue(maxsize=window)
+    stop = threading.Event()
+    errors = []
+
+    def emit(item) -> bool:
+        while not stop.is_set():
+            try:
+                out_q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run() -> None:
+        try:
+            asyncio.run(
+                _run_pipeline(
+                    records,
+                    roc_date,
+                    emit,
+                    stop,
+                    connections=connections,
+                    processes=processes,
+                    window=window,
+                    rate_limiter=HostRateLimiter(rate=rate_per_host, burst=burst),
+                    cache=cache,
+                    completed=completed,
+                    with_trace=metrics is not None,
+                    rules=rules,
+                    backend=config.PARSER_BACKEND,
+                    archive=archive,
+                    dedupe=dedupe,
+                    light=light,
+                )
+            )
+        except BaseException as exc:  # 交給產生器在呼叫端拋出
+            errors.append(exc)
+        finally:
+            emit(_DONE)
+
+    worker = threading.Thread(target=run, name="momo-async-pipeline", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = out_q.get()
+            if item is _DONE:
+                break
+            row, trace, fresh = item
+            # 檢查點與 trace 在本執行緒寫入，fsync 不會卡住事件迴圈；續跑沿用的列不重複寫入，抓取失敗的列不寫入
+            if trace is not None:
+                metrics.record(trace)
+            if journal is not None and fresh and not is_failed_row(row):
+                journal.append(row)
+            yield row
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . b e n c h
+ 以存檔的商品頁（bench_fixtures/）量測解析與整體流程效能：python -m momo_tools.bench
+
+ - fixtures：手機版 Area504 / Area101 / Area302、桌機版 panel-2、無商檢字號、品號全文 fallback 等版型，
+   manifest.json 記錄每頁以 v6 規則應擷取出的欄位，執行前先核對，結果不符時不輸出數字
+ - 解析：各解析後端 × 規則版本的 pages/sec，另外單獨量測 _find_bsmi_code（逐段與整批）與品號 fallback 鏈
+ - 端到端：本機 stub HTTP 伺服器輪流回應 fixtures，量測 build_output_rows（或 --async 流程）的 rows/sec
+ - 記憶體：每個階段結束時的 peak RSS（ru_maxrss 只增不減；要分開比較請用 --stage 單獨執行）
+ - 以 --json 輸出結果，調整解析器或並行設定前後各跑一次即可比較
+ - --export-cache 可把本機頁面快取（cache）中實際抓過的頁面匯出成 fixtures 目錄
+"""
+
+import argparse
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+MANIFEST_NAME = "manifest.json"
+PARSE_CASES: List[Tuple[str, str]] = [("lxml", "v6"), ("html.parser", "v6"), ("html.parser", "v5")]
+
+
+@dataclass
+class Fixture:
+    name: str
+    html: str = field(repr=False)
+    expected: Optional[Dict[str, str]] = None
+    rules: str = "v6"
+
+
+def load_fixtures(path: str = FIXTURE_DIR) -> List[Fixture]:
+    """讀入目錄中所有 .html；有 manifest.json 時一併帶入預期欄位。"""
+    manifest: Dict[str, Dict[str, object]] = {}
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = {item["file"]: item for item in json.load(fh)}
+
+    fixtures: List[Fixture] = []
+    for name in sorted(os.listdir(path)):
+        if not name.endswith((".html", ".htm")):
+            continue
+        with open(os.path.join(path, name), encoding="utf-8") as fh:
+            html = fh.read()
+        item = manifest.get(name, {})
+        fixtures.append(Fixture(name, html, item.get("expected"), item.get("rules", "v6")))
+    if not fixtures:
+        raise FileNotFoundError(f"{path} 中沒有 .html fixture")
+    return fixtures
+
+
+def check_fixtures(fixtures: Sequence[Fixture]) -> List[str]:
+    """以 manifest 的預期值核對每個解析後端的擷取結果，回傳不符的說明。"""
+    from .extractors import extract_product_fields
+
+    problems: List[str] = []
+    for fx in fixtures:
+        if not fx.expected:
+            continue
+        want = (fx.expected["商品名稱"], fx.expected["品號"], fx.expected["商檢字號"])
+        for backend in ("lxml", "html.parser"):
+            got = extract_product_fields(fx.html, rules=fx.rules, backend=backend)
+            if got != want:
+                problems.append(f"{fx.name}（{backend}）：預期 {want}，實際 {got}")
+    return problems
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows 沒有 resource 模組
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _rate(func: Callable[[], int], min_seconds: float) -> Tuple[float, int]:
+    """重複執行 func（每次回傳處理的件數）直到超過 min_seconds，回傳（每秒件數、總件數）。"""
+    func()  # 暖身：載入模組、編譯 regex / XPath
+    count = 0
+    start = time.perf_counter()
+    while True:
+        count += func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return count / elapsed, count
+
+
+def bench_parse(fixtures: Sequence[Fixture], min_seconds: float = 1.0) -> Dict[str, object]:
+    from bs4 import BeautifulSoup
+
+    from .bsmi import _find_bsmi_code, find_bsmi_codes
+    from .extractors import _extract_name_prod_no, extract_product_fields
+
+    results: Dict[str, object] = {}
+    for backend, rules in PARSE_CASES:
+
+        def _run(backend=backend, rules=rules) -> int:
+            for fx in fixtures:
+                extract_product_fields(fx.html, rules=rules, backend=backend)
+            return len(fixtures)
+
+        pages_per_sec, _ = _rate(_run, min_seconds)
+        results[f"parse[{backend}/{rules}]"] = round(pages_per_sec, 1)
+
+    # 只量測規則本身：文字與 soup 先準備好，不計入 HTML 解析時間
+    soups = [BeautifulSoup(fx.html, "html.parser") for fx in fixtures]
+    texts = [soup.get_text(" ", strip=True) for soup in soups]
+
+    def _codes() -> int:
+        for text in texts:
+            _find_bsmi_code(text)
+        return len(texts)
+
+    def _codes_batch() -> int:
+        find_bsmi_codes(texts)
+        return len(texts)
+
+    def _prod_no() -> int:
+        for soup in soups:
+            _extract_name_prod_no(soup)
+        return len(soups)
+
+    results["_find_bsmi_code[page text]"] = round(_rate(_codes, min_seconds)[0], 1)
+    results["find_bsmi_codes[page text batch]"] = round(_rate(_codes_batch, min_seconds)[0], 1)
+    results["品號 fallback chain[soup]"] = round(_rate(_prod_no, min_seconds)[0], 1)
+    return results
+
+
+class _FixtureHandler(http.server.BaseHTTPRequestHandler):
+    fixtures: Sequence[Fixture] = ()
+    latency = 0.0
+
+    def do_GET(self) -> None:
+        qs = parse_qs(urlparse(self.path).query)
+        idx = int(qs.get("id", ["0"])[0] or 0)
+        body = self.fixtures[idx % len(self.fixtures)].html.encode("utf-8")
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:  # noqa: A002 - 不輸出每個請求的 log
+        pass
+
+
+class StubServer:
+    """在本機隨機埠輪流回應 fixtures；/goods.momo?id=N 回傳第 N % len(fixtures) 頁。"""
+
+    def __init__(self, fixtures: Sequence[Fixture], latency_ms: float = 0.0) -> None:
+        handler = type("Handler", (_FixtureHandler,), {"fixtures": list(fixtures), "latency": latency_ms / 1000})
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, idx: int) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/goods.momo?id={idx}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_pipeline(
+    fixtures: Sequence[Fixture],
+    rows: int = 200,
+    workers: int = 4,
+    rules: str = "v6",
+    latency_ms: float = 0.0,
+    use_async: bool = False,
+    processes: int = 0,
+) -> Dict[str, object]:
+    from . import config
+    from .pipeline import build_output_rows
+    from .session import configure_session
+
+    configure_session(pool_size=max(config.POOL_SIZE, workers))
+    mode = f"async {workers} conns/{processes or os.cpu_count()} procs" if use_async else f"{workers} workers"
+    with StubServer(fixtures, latency_ms=latency_ms) as server:
+        records = ((i, server.url(i)) for i in range(1, rows + 1))
+        start = time.perf_counter()
+        # 限速調到不會成為瓶頸，量到的是抓取 + 解析 + 組列本身的吞吐量
+        if use_async:
+            from .async_pipeline import iter_output_rows_async
+
+            out = list(
+                iter_output_rows_async(
+                    records, "0/0/0", connections=workers, processes=processes, rate_per_host=1e6, burst=workers,
+                    rules=rules,
+                )
+            )
+        else:
+            out = build_output_rows(
+                records, "0/0/0", max_workers=workers, rate_per_host=1e6, burst=workers, rules=rules
+            ).to_dict("records")
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for row in out if row["調查結果"] or row["商品名稱"] == "未取得")
+    return {
+        f"e2e rows/sec[{mode}, {latency_ms:g} ms]": round(rows / elapsed, 1),
+        "e2e failed rows": failed,
+    }
+
+
+def export_cache_fixtures(cache_path: str, out_dir: str, limit: int = 50) -> int:
+    """把頁面快取中的手機版商品頁寫成 fixtures（檔名為 i_code.html），回傳匯出的頁數。"""
+    from .cache import DESKTOP_KEY_PREFIX, PageCache
+
+    os.makedirs(out_dir, exist_ok=True)
+    cache = PageCache(cache_path)
+    count = 0
+    try:
+        for i_code, _url, body in cache.iter_pages():
+            if count >= limit:
+                break
+            if i_code.startswith(DESKTOP_KEY_PREFIX):
+                continue
+            with open(os.path.join(out_dir, f"{i_code}.html"), "w", encoding="utf-8") as fh:
+                fh.write(body)
+            count += 1
+    finally:
+        cache.close()
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.bench", description="momo 商品頁解析與流程效能基準")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="fixture 目錄（預設為套件內附的 bench_fixtures）")
+    parser.add_argument("--stage", choices=("all", "parse", "e2e"), default="all", help="只執行指定階段")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每項解析量測至少執行的秒數")
+    parser.add_argument("--rows", type=int, default=200, help="端到端量測的列數")
+    parser.add_argument("--workers", type=int, default=4, help="端到端量測的同時在途請求數")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub 伺服器每個回應的模擬延遲")
+    parser.add_argument("--rules", default="v6", help="端到端量測使用的商檢字號規則版本")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="端到端改量測 asyncio 流程")
+    parser.add_argument("--processes", type=int, default=0, help="--async 時的解析行程數（0 為 CPU 核心數）")
+    parser.add_argument("--json", default="", help="另存結果為 JSON")
+    parser.add_argument("--export-cache", default="", help="從頁面快取匯出 fixtures 到 --fixtures 目錄後結束")
+    parser.add_argument("--limit", type=int, default=50, help="--export-cache 最多匯出的頁數")
+    args = parser.parse_args(argv)
+
+    if args.export_cache:
+        count = export_cache_fixtures(args.export_cache, args.fixtures, limit=args.limit)
+        print(f"✅ 已從 {args.export_cache} 匯出 {count} 頁到 {args.fixtures}")
+        return
+
+    fixtures = load_fixtures(args.fixtures)
+    problems = check_fixtures(fixtures)
+    if problems:
+        print("❌ fixture 擷取結果與 manifest 不符：")
+        for line in problems:
+            print(f"   {line}")
+        raise SystemExit(1)
+    print(f"📄 {len(fixtures)} 個 fixture，擷取結果與 manifest 相符")
+
+    results: Dict[str, object] = {"fixtures": len(fixtures)}
+    if args.stage in ("all", "parse"):
+        results.update(bench_parse(fixtures, min_seconds=args.seconds))
+        results["peak RSS MB[parse]"] = peak_rss_mb()
+    if args.stage in ("all", "e2e"):
+        results.update(
+            bench_pipeline(
+                fixtures,
+                rows=args.rows,
+                workers=args.workers,
+                rules=args.rules,
+                latency_ms=args.latency_ms,
+                use_async=args.use_async,
+                processes=args.processes,
+            )
+        )
+        results["peak RSS MB[e2e]"] = peak_rss_mb()
+
+    width = max(len(k) for k in results)
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:,.1f}"
+        print(f"   {key.ljust(width)}  {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+        print(f"已輸出：{args.json}")
+
+
+if __name__ == "__main__":
+    main()
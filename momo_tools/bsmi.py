@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . b s m i
+ 商檢字號判定規則（v6 版），供 BeautifulSoup 與 lxml 兩種解析路徑共用：
+
+ - 收緊商檢字號格式（首碼 MRDT，後 5 碼英數，單字邊界）
+ - 以 BSMI_KEYWORDS 定位商檢相關文字，只從關鍵字之後的內容找字號
+ - 字號的合理性檢查（至少 1 碼數字、至多 1 碼英文、前面不是 #）直接寫進單一 regex（BSMI_CODE_PATTERN），
+   find_bsmi_codes 可一次檢查整批文字，或整欄 pandas Series / pyarrow 字串陣列
+"""
+
+import re
+from typing import Iterable, List
+
+MRDT_REGEX = re.compile(r"(?<![A-Za-z0-9])[MRDT][A-Za-z0-9]{5}(?![A-Za-z0-9])", re.IGNORECASE)
+
+BSMI_KEYWORDS: List[str] = [
+    "商檢字號",
+    "BSMI認證字號",
+    "BSMI認證",
+    "認證字號",
+    "商品檢驗標識",
+    "商品檢驗標示",
+    "商品認證",
+]
+
+# 所有關鍵字合併成單一交替式 regex：一次掃描即可找到最早出現的關鍵字
+KEYWORD_REGEX = re.compile("|".join(re.escape(k) for k in BSMI_KEYWORDS))
+# 零寬 lookahead 版本：在每個位置回報「最短」的關鍵字，用於在整頁文字流中列出所有（含重疊）出現位置
+KEYWORD_SCAN_REGEX = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in sorted(BSMI_KEYWORDS, key=len)) + "))"
+)
+
+# 合理字號：M/R/D/T + 5 碼，5 碼中至多 1 碼英文（其餘為數字，因此至少 4 碼數字），前後不接英數字、前面也不是 '#'
+_CODE_TAIL = (
+    "(?:[0-9]{5}|[A-Za-z][0-9]{4}|[0-9][A-Za-z][0-9]{3}|[0-9]{2}[A-Za-z][0-9]{2}|[0-9]{3}[A-Za-z][0-9]|[0-9]{4}[A-Za-z])"
+)
+_CODE = "[MRDT]" + _CODE_TAIL
+# Python re 用：以 [MRDT] 開頭（re 可快速略過不可能的位置），前一字元的檢查放在首碼之後的 lookbehind
+BSMI_CODE_REGEX = re.compile(
+    "(?P<code>[MRDT](?<![A-Za-z0-9#][MRDT])" + _CODE_TAIL + ")(?![A-Za-z0-9])", re.IGNORECASE
+)
+# 整欄處理用：只用 RE2 也支援的語法（不用 lookaround），pyarrow.compute.extract_regex 與 pandas 都能使用
+BSMI_CODE_PATTERN = "(?i:(?:^|[^A-Za-z0-9#])(?P<code>" + _CODE + ")(?:$|[^A-Za-z0-9]))"
+# 同上，但只找第一個商檢關鍵字之後的字號（與 code_after_keyword 相同；關鍵字區分大小寫）。
+# 關鍵字皆以中文字結尾，字號可緊接在關鍵字之後
+KEYWORD_CODE_PATTERN = (
+    "(?:" + "|".join(re.escape(k) for k in BSMI_KEYWORDS) + ")"
+    "(?i:(?:[\\s\\S]*?[^A-Za-z0-9#])??(?P<code>" + _CODE + ")(?:$|[^A-Za-z0-9]))"
+)
+
+
+def _find_bsmi_code(text: str) -> str:
+    """
+    從文字中找出第一組「合理的」商檢字號：
+    - 基本格式：M/R/D/T + 5 碼英數字（單字邊界）
+    - 後 5 碼需同時符合：至少 1 碼數字、至多 1 碼英文字
+    - 前一個字元若是 '#'(例如 #D62872 搜尋用 tag) 則略過
+    以上條件都在 BSMI_CODE_REGEX 中，一次 search 即完成，不逐一檢查候選字號
+    """
+    if not text:
+        return ""
+    m = BSMI_CODE_REGEX.search(text)
+    return m.group("code").upper() if m else ""
+
+
+def keyword_position(text: str) -> int:
+    """回傳任一商檢關鍵字在 text 中最早出現的位置，找不到時回傳 -1。"""
+    m = KEYWORD_REGEX.search(text or "")
+    return m.start() if m else -1
+
+
+def code_after_keyword(text: str) -> str:
+    """text 含商檢關鍵字時，從關鍵字位置往後找第一組合理字號。"""
+    pos = keyword_position(text)
+    if pos == -1:
+        return ""
+    return _find_bsmi_code(text[pos:])
+
+
+def _is_arrow(values: object) -> bool:
+    # 以型別所屬模組判斷，避免只為了 isinstance 就載入 pyarrow
+    return type(values).__module__.startswith("pyarrow")
+
+
+def find_bsmi_codes(texts: Iterable[str], after_keyword: bool = False):
+    """
+    整批找出每段文字的第一組合理字號（大寫），找不到為空字串；after_keyword=True 時同 code_after_keyword。
+    - pandas Series（含 string[pyarrow]）：以 Series.str.extract 整欄處理，回傳同 index 的 Series
+    - pyarrow Array / ChunkedArray：以 pyarrow.compute.extract_regex 處理，回傳 pyarrow 字串陣列
+    - 其他可迭代物件：回傳 list；非字串元素（None、NaN）視為空字串
+    """
+    if _is_arrow(texts):
+        import pyarrow.compute as pc
+
+        pattern = KEYWORD_CODE_PATTERN if after_keyword else BSMI_CODE_PATTERN
+        codes = pc.struct_field(pc.extract_regex(texts, pattern=pattern), [0])
+        return pc.fill_null(pc.utf8_upper(codes), "")
+    if hasattr(texts, "str") and hasattr(texts, "index"):
+        pattern = KEYWORD_CODE_PATTERN if after_keyword else BSMI_CODE_PATTERN
+        return texts.str.extract(pattern, expand=False).fillna("").str.upper()
+    find = code_after_keyword if after_keyword else _find_bsmi_code
+    return [find(text) if isinstance(text, str) else "" for text in texts]
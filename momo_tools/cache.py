@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . c a c h e
+ 以 i_code 為鍵的本機商品頁快取（SQLite）：
+
+ - 每筆資料有各自的 TTL，未過期直接使用快取內容，不發出請求
+ - 過期但有 ETag / Last-Modified 時改發條件式請求，伺服器回 304 即沿用快取內容
+ - 依最後存取時間做 LRU 淘汰，總容量超過 max_bytes 時刪除最久未用的頁面
+ - 頁面以 zlib 壓縮後存放；hits / revalidated / misses 計數供執行報告使用
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+DEFAULT_CACHE_PATH = "momo_page_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 商品頁以外的附屬頁面（Area302 的 iframe）以「前綴 + 網址」為鍵存放，iter_pages 不列出
+IFRAME_KEY_PREFIX = "iframe:"
+# none / v1–v4 規則抓取的桌機版商品頁以「前綴 + i_code」為鍵，與同一商品的手機版頁面分開存放
+DESKTOP_KEY_PREFIX = "desktop:"
+
+
+@dataclass
+class CacheEntry:
+    body: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+    expires_at: float
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    執行緒安全的頁面快取（單一 SQLite 連線 + 鎖），可由並行 worker 共用。
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                i_code TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        self._total_bytes = int(row[0])
+
+    def lookup(self, i_code: str) -> Optional[CacheEntry]:
+        """取出快取項目（不論是否過期），並更新最後存取時間。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at, expires_at FROM pages WHERE i_code = ?",
+                (i_code,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE i_code = ?", (time.time(), i_code))
+            self._conn.commit()
+        body, etag, last_modified, fetched_at, expires_at = row
+        return CacheEntry(zlib.decompress(body).decode("utf-8"), etag, last_modified, fetched_at, expires_at)
+
+    def put(self, i_code: str, url: str, body: str, etag: str = "", last_modified: str = "") -> None:
+        now = time.time()
+        blob = zlib.compress(body.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM pages WHERE i_code = ?", (i_code,)).fetchone()
+            if old is not None:
+                self._total_bytes -= int(old[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(i_code, url, body, size, etag, last_modified, fetched_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (i_code, url, blob, len(blob), etag or "", last_modified or "", now, now + self.ttl_seconds, now),
+            )
+            self._total_bytes += len(blob)
+            self._evict_locked()
+            self._conn.commit()
+
+    def refresh(self, i_code: str) -> None:
+        """伺服器回 304 後延長 TTL。"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET expires_at = ?, accessed_at = ? WHERE i_code = ?",
+                (now + self.ttl_seconds, now, i_code),
+            )
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute("SELECT i_code, size FROM pages ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                self._total_bytes = 0
+                break
+            self._conn.execute("DELETE FROM pages WHERE i_code = ?", (row[0],))
+            self._total_bytes -= int(row[1])
+
+    def iter_pages(self) -> Iterator[Tuple[str, str, str]]:
+        """逐筆產生商品頁的（i_code、網址、頁面 HTML），不更新存取時間；供基準測試與離線重新解析使用。"""
+        with self._lock:
+            keys = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT i_code FROM pages WHERE substr(i_code, 1, ?) != ? ORDER BY i_code",
+                    (len(IFRAME_KEY_PREFIX), IFRAME_KEY_PREFIX),
+                )
+            ]
+        for i_code in keys:
+            with self._lock:
+                row = self._conn.execute("SELECT url, body FROM pages WHERE i_code = ?", (i_code,)).fetchone()
+            if row is not None:
+                yield i_code, row[0], zlib.decompress(row[1]).decode("utf-8")
+
+    def record(self, outcome: str) -> None:
+        """累計 hit / revalidated / miss 次數。"""
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+
+    def summary(self) -> str:
+        return f"頁面快取：命中 {self.hits}、304 重新驗證 {self.revalidated}、未命中 {self.misses}"
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
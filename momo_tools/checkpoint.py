@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . c h e c k p o i n t
+ 批次執行的 append-only 檢查點日誌（JSONL）：
+
+ - 每完成一列就寫入一行 JSON 並 flush + fsync，Colab 中斷也不會遺失已完成的列
+ - 續跑時以「編號」（即輸入的「序號」）判斷哪些列已完成
+ - 最後一行若因中斷而寫壞，載入時會略過
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict
+
+DEFAULT_CHECKPOINT_PATH = "momo_check_checkpoint.jsonl"
+
+
+def json_default(value: Any) -> Any:
+    # pandas / numpy 純量（例如 numpy.int64）轉回 Python 內建型別
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def checkpoint_key(seq: Any) -> str:
+    if hasattr(seq, "item"):
+        seq = seq.item()
+    if isinstance(seq, float) and seq.is_integer():
+        seq = int(seq)
+    return str(seq).strip()
+
+
+class CheckpointJournal:
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, key_field: str = "編號") -> None:
+        self.path = path
+        self.key_field = key_field
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """讀回已完成的列（以 checkpoint_key 為鍵；同一鍵以最後一筆為準）。"""
+        done: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                done[checkpoint_key(row.get(self.key_field, ""))] = row
+        return done
+
+    def reset(self) -> None:
+        """開始新的一輪：既有日誌改名為 .bak 保留，避免誤刪上次未完成的結果。"""
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path + ".bak")
+
+    def append(self, row: Dict[str, Any]) -> None:
+        line = json.dumps(row, ensure_ascii=False, default=json_default)
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . c l i
+ 指令列入口：python -m momo_tools [--rules v6] [--input 清單.csv] [--resume] ...
+
+ - 批次模式：讀查核清單（CSV / XLSX）→ 並行抓取 → 匯出 Excel
+ - --search 關鍵字或搜尋頁網址：以 harvest 收集搜尋結果的商品網址，直接當作查核清單（不需先匯出 CSV）
+ - 批次查核完成的商品記入共用的商品歷史（history），之後 --search / harvest 不會再收錄
+ - 單網址模式（--url）：只抓一頁、印出擷取結果，不載入 pandas / openpyxl
+ - --async：改用 async_pipeline（aiohttp 抓取、多行程解析、依序輸出），輸出與預設模式相同
+ - --recheck 上次輸出.xlsx：增量再查核（recheck），只檢查過期的列，以探測請求判斷下架與變動
+ - 已存檔頁面（HTML 目錄、壓縮檔、頁面快取）的離線重新解析請用 python -m momo_tools.reparse
+ - 數萬列的大量查核可改用 python -m momo_tools.workqueue（coordinator / worker，多行程或多主機分工）
+ - momo_check_v1 ~ v6、momo_colab_export 皆改為以對應的 --rules 呼叫本入口
+"""
+
+import argparse
+import datetime
+from collections import Counter
+from typing import List, Optional, Sequence
+
+from . import config
+from .extractors import RULESETS
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="momo_tools", description="momo 商品頁查核（CSV 匯入、Excel 匯出）")
+    parser.add_argument(
+        "--rules",
+        default=config.BSMI_RULES,
+        choices=sorted(RULESETS),
+        help="商檢字號判定規則版本（預設 %(default)s；none 表示不擷取商檢字號；v5 / v6 抓手機版頁面，其餘抓原網址）",
+    )
+    parser.add_argument("--input", default="", help="查核清單路徑（CSV / XLSX）；未指定時於 Colab 上傳或互動輸入")
+    parser.add_argument("--url", action="append", default=[], help="只查核指定網址並印出結果（可重複指定）")
+    parser.add_argument(
+        "--search", action="append", default=[], help="改以搜尋結果為查核清單：關鍵字或搜尋 / 列表頁網址（可重複指定）"
+    )
+    parser.add_argument("--search-rules", default="", help="--search 的標題關鍵字規則檔（TXT：+包含、-排除）")
+    parser.add_argument("--search-exclude", action="append", default=[], help="--search 排除用的歷史 URL.csv")
+    parser.add_argument("--search-max", type=int, default=0, help="--search 最多收錄幾筆（0 表示抓到最後一頁）")
+    parser.add_argument(
+        "--no-history", action="store_true", help="不讀寫商品歷史（--search 不排除看過的商品，查核完成也不記錄）"
+    )
+    parser.add_argument("--workers", type=int, default=config.MAX_WORKERS, help="同時在途的請求數")
+    parser.add_argument(
+        "--parser", default=config.PARSER_BACKEND, choices=("lxml", "html.parser"), help="HTML 解析後端"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不使用本機頁面快取")
+    parser.add_argument(
+        "--light", action="store_true", help="輕量抓取：先讀商品 JSON / JSON-LD，欄位不足才解析整頁（見 lightfetch）"
+    )
+    parser.add_argument("--no-archive", action="store_true", help="不把抓到的原始頁面寫入存檔")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="改用 asyncio 流程：aiohttp 抓取 + 多行程解析（需安裝 aiohttp）",
+    )
+    parser.add_argument(
+        "--processes", type=int, default=config.PARSE_PROCESSES, help="--async 時的解析行程數（0 為 CPU 核心數）"
+    )
+    parser.add_argument("--recheck", default="", help="以上一輪的輸出活頁簿做增量再查核（只檢查過期的列）")
+    parser.add_argument(
+        "--max-age-days",
+        type=int,
+        default=config.RECHECK_MAX_AGE_DAYS,
+        help="--recheck 時，再查核日期距今達此天數的列才重新檢查（0 表示全部）",
+    )
+    parser.add_argument("--include-delisted", action="store_true", help="--recheck 時連已判定下架的列也重新檢查")
+    parser.add_argument("--resume", action="store_true", help="從檢查點日誌續跑，略過已完成的序號")
+    parser.add_argument("--checkpoint", default=config.CHECKPOINT_PATH, help="檢查點日誌路徑（JSONL）")
+    return parser
+
+
+def _open_cache(args: argparse.Namespace):
+    if args.no_cache or not config.CACHE_PATH:
+        return None
+    from .cache import PageCache
+
+    return PageCache(config.CACHE_PATH, ttl_seconds=config.CACHE_TTL_SECONDS, max_bytes=config.CACHE_MAX_BYTES)
+
+
+def _open_archive(args: argparse.Namespace):
+    if args.no_archive or not config.ARCHIVE_PATH:
+        return None
+    from .archive import PageArchive
+
+    return PageArchive(config.ARCHIVE_PATH)
+
+
+def check_urls(urls: Sequence[str], rules: Optional[str] = None, light: bool = False) -> None:
+    """單網址快速查核：不經過清單讀取與 Excel 匯出。"""
+    from .fetch import fetch_momo_product
+
+    for url in urls:
+        info = fetch_momo_product(url, rules=rules, light=light)
+        print(f"🔎 {url}")
+        print(f"   商品名稱：{info['商品名稱']}")
+        print(f"   品號：{info['品號']}")
+        print(f"   商檢字號：{info['商檢字號'] or '（未找到）'}")
+
+
+def _recheck(args: argparse.Namespace) -> None:
+    from .recheck import run_recheck
+
+    cache = _open_cache(args)
+    archive = _open_archive(args)
+    try:
+        run_recheck(
+            args.recheck,
+            max_age_days=args.max_age_days,
+            include_delisted=args.include_delisted,
+            max_workers=args.workers,
+            cache=cache,
+            archive=archive,
+            rules=args.rules,
+        )
+    finally:
+        if archive is not None:
+            archive.close()
+        if cache is not None:
+            cache.close()
+
+
+def _search_records(args: argparse.Namespace, stats, history):
+    from . import harvest
+    from .keywords import KeywordRules
+
+    start_urls = [s.strip() if "://" in s else harvest.keyword_url(s) for s in args.search if s.strip()]
+    rules = KeywordRules.from_file(args.search_rules) if args.search_rules else KeywordRules()
+    exclude = set()
+    for path in args.search_exclude:
+        exclude |= harvest.load_url_set(path)
+    products = harvest.harvest_products(
+        start_urls, rules=rules, exclude=exclude, history=history, max_items=args.search_max, stats=stats
+    )
+    return harvest.harvest_records(products)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    # Colab / Jupyter 會帶入自己的參數（例如 -f kernel.json），未知參數一律忽略
+    args, _ = _build_parser().parse_known_args(argv)
+    config.PARSER_BACKEND = args.parser
+
+    from .session import configure_session
+
+    configure_session(pool_size=max(config.POOL_SIZE, args.workers))
+    if args.use_async and not args.url:
+        from . import async_pipeline
+
+        if not async_pipeline.available():
+            raise SystemExit("❌ --async 需要 aiohttp，請先執行 pip install aiohttp（或不加 --async 使用執行緒模式）")
+    if args.url:
+        check_urls(args.url, rules=args.rules, light=args.light)
+        return
+    if args.recheck:
+        _recheck(args)
+        return
+    if args.search and args.resume:
+        raise SystemExit("❌ --search 每次收集的結果不同，無法 --resume；請先以 python -m momo_tools.harvest 存成清單")
+
+    from .checkpoint import CheckpointJournal
+    from .common import to_roc_date
+    from .metrics import RunMetrics
+    from .pipeline import export_to_excel, iter_output_rows, load_input_records
+
+    cache = _open_cache(args)
+    archive = _open_archive(args)
+    if args.light and archive is not None:
+        print("⚠️ --light 搭配原始頁面存檔：每頁仍會完整下載以便存檔，不會提前結束；不需要存檔時請加上 --no-archive")
+    journal = CheckpointJournal(args.checkpoint)
+    if args.resume:
+        completed = journal.load()
+    else:
+        journal.reset()
+        completed = {}
+
+    search_stats = Counter()
+    history = None
+    if config.HISTORY_PATH and not args.no_history:
+        from .history import HistoryStore
+
+        history = HistoryStore(config.HISTORY_PATH)
+    if args.search:
+        records = _search_records(args, search_stats, history)
+    else:
+        records = load_input_records(args.input or None)
+    roc_date = to_roc_date(datetime.date.today())
+    metrics = RunMetrics(config.TRACE_PATH, append=args.resume)
+    common = dict(
+        rate_per_host=config.RATE_PER_HOST,
+        burst=config.RATE_BURST,
+        cache=cache,
+        journal=journal,
+        completed=completed,
+        metrics=metrics,
+        rules=args.rules,
+        archive=archive,
+        light=args.light,
+    )
+    try:
+        if args.use_async:
+            from .async_pipeline import iter_output_rows_async
+
+            rows = iter_output_rows_async(
+                records, roc_date, connections=args.workers, processes=args.processes, **common
+            )
+        else:
+            rows = iter_output_rows(records, roc_date, max_workers=args.workers, **common)
+        if history is not None:
+            rows = history.record_rows(rows)
+        export_to_excel(rows, roc_date)
+    finally:
+        journal.close()
+        metrics.close()
+        if history is not None:
+            history.close()
+    if args.search:
+        from .harvest import summarize
+
+        print(summarize(search_stats))
+    print(metrics.summary())
+    if history is not None:
+        print(history.summary())
+    if archive is not None:
+        print(archive.summary())
+        archive.close()
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . c o m m o n
+ 各版本共用的小工具（不依賴任何第三方套件）
+"""
+
+import datetime
+import html
+import re
+from typing import List
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+
+MOMO_GOODS_URL = "https://www.momoshop.com.tw/goods/GoodsDetail.jsp"
+_TP_GOODS_REGEX = re.compile(r"^/TP/TP\d+/goodsDetail/[^/?#]+", re.IGNORECASE)
+# 站內追蹤用參數：不影響頁面內容，標準化時去掉
+TRACKING_PARAMS = {"area", "mdiv", "oid", "cid", "ctype", "sourcepagetype", "fbclid", "gclid", "osm"}
+
+
+# ➤ 擷取網址並處理 &amp; 解碼（保留以防後續擴充使用）
+def extract_urls_from_text(text: str) -> List[str]:
+    clean = html.unescape(html.unescape(text))
+    urls = re.findall(r"https?://[^\s\]]+", clean)
+    return list(dict.fromkeys(urls))
+
+
+def to_roc_date(date_obj: datetime.date) -> str:
+    roc_year = date_obj.year - 1911
+    return f"{roc_year}/{date_obj.month}/{date_obj.day}"
+
+
+def from_roc_date(text: str) -> datetime.date:
+    """to_roc_date 的反向轉換：115/10/18 → 2026-10-18（格式不符時拋出 ValueError）。"""
+    year, month, day = (int(part) for part in str(text).strip().split("/"))
+    return datetime.date(year + 1911, month, day)
+
+
+def _extract_i_code(url: str) -> str:
+    try:
+        parsed = urlparse(url)
+        qs = parse_qs(parsed.query)
+        if "i_code" in qs and qs["i_code"]:
+            return qs["i_code"][0]
+    except Exception:
+        pass
+    return ""
+
+
+# ➤ 商品網址標準化（同 web_seek 的 canonicalizeMomoUrl）：同一商品的追蹤參數、桌機 / 手機版網址收斂成同一個鍵
+def canonicalize_momo_url(url: str) -> str:
+    """
+    - 有 i_code（/goods/GoodsDetail.jsp、m.momoshop.com.tw/goods.momo 等）→ 桌機版 GoodsDetail.jsp?i_code=…
+    - TP 型態（/TP/TP0002639/goodsDetail/TP00026390001044?…）→ 去掉參數的 www 網址
+    - 其他 momo 網址：https + 主機 + 路徑，參數去掉追蹤用參數後排序；非 momo 網址原樣（去掉前後空白）回傳
+    """
+    url = html.unescape(str(url or "").strip())
+    if not url:
+        return ""
+    i_code = _extract_i_code(url).strip()
+    try:
+        parsed = urlparse(url if "://" in url else "https://" + url)
+    except ValueError:
+        return url
+    host = (parsed.hostname or "").lower()
+    if not (host == "momoshop.com.tw" or host.endswith(".momoshop.com.tw")):
+        return url
+    if i_code:
+        return f"{MOMO_GOODS_URL}?i_code={i_code}"
+    tp = _TP_GOODS_REGEX.match(parsed.path)
+    if tp:
+        return "https://www.momoshop.com.tw" + tp.group(0)
+    params = sorted(
+        (k, v)
+        for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    return f"https://{host}{parsed.path}" + (f"?{urlencode(params)}" if params else "")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . c o n f i g
+ 查核流程的預設設定（cli 參數未指定時使用；也可在 Colab 中直接修改本模組的值）
+"""
+
+# 並行抓取設定：同時在途請求數、每主機每秒請求數與可累積的突發量
+MAX_WORKERS = 4
+RATE_PER_HOST = 2.0
+RATE_BURST = 2
+# 共用 Session 的連線池大小（不小於 MAX_WORKERS，才能讓每個 worker 都重用連線）
+POOL_SIZE = 10
+# 本機頁面快取（以 i_code 為鍵）；CACHE_PATH 設為空字串即停用
+CACHE_PATH = "momo_page_cache.sqlite3"
+CACHE_TTL_SECONDS = 24 * 60 * 60
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 原始頁面存檔（append-only，逐筆壓縮）：保留查核當天抓到的 HTML 供稽核；設為空字串即停用
+ARCHIVE_PATH = "momo_page_archive.arc"
+# 檢查點日誌：每完成一列即寫入，中斷後可用 --resume 續跑
+CHECKPOINT_PATH = "momo_check_checkpoint.jsonl"
+# 逐列效能紀錄（JSONL）；設為空字串則只輸出結束摘要
+TRACE_PATH = "momo_check_trace.jsonl"
+# 重試策略：單列最多嘗試次數、指數退避（秒）、整輪重試額度，以及熔斷器門檻與暫停秒數
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+RETRY_BUDGET = 500
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+# HTML 解析後端："lxml"（有安裝時使用預先編譯的 XPath 快速路徑，僅 v6 規則）或 "html.parser"
+PARSER_BACKEND = "lxml"
+# v6 規則在商品頁找不到商檢字號時，另外抓取 Area302（詳情 tab）中的 iframe 再找一次（--light 不抓）：
+# 是否啟用、每頁最多幾個、每頁同時抓取數
+IFRAME_FETCH = True
+IFRAME_MAX = 4
+IFRAME_WORKERS = 4
+# 輕量抓取路徑（--light，見 lightfetch）：商品 JSON API 網址樣板（含 {i_code}），空字串表示只用頁面中的 JSON-LD
+PRODUCT_JSON_URL = ""
+# 商檢字號判定規則版本："v6"（預設）、"v5"、"v4"、"v3" 或 "none"（v1/v2：不擷取商檢字號）
+BSMI_RULES = "v6"
+# 再查核（--recheck）：再查核日期（或查核日期）距今達此天數的列才重新檢查
+RECHECK_MAX_AGE_DAYS = 7
+# asyncio 模式（--async）：解析用的行程數（0 表示 CPU 核心數），以及同時在途（已讀入、尚未輸出）的列數上限
+PARSE_PROCESSES = 0
+ASYNC_WINDOW = 64
+# 同一商品只抓一次（dedupe）：抓取完成、已沒有列在等待的結果最多保留幾筆，供之後的重複網址沿用（記憶體不隨列數成長）
+DEDUPE_RECENT = 4096
+# 分散式工作佇列（python -m momo_tools.workqueue）：佇列檔（SQLite）、租約逾時秒數、單列最多派發次數、每次租用列數
+QUEUE_PATH = "momo_work_queue.sqlite3"
+QUEUE_VISIBILITY_TIMEOUT = 300.0
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_BATCH_SIZE = 8
+# 搜尋結果收集（python -m momo_tools.harvest、cli --search）：每個起始網址最多翻幾頁、搜尋 / 列表頁的頁碼參數
+HARVEST_MAX_PAGES = 200
+HARVEST_PAGE_PARAM = "curPage"
+# 已看過的商品歷史（history，SQLite，以 i_code 為鍵）：harvest 不再收錄看過的商品，批次查核完成的商品也會記錄；
+# 空字串即停用。另設記憶體 Bloom filter 的預估筆數與誤判率
+HISTORY_PATH = "momo_seen_history.sqlite3"
+HISTORY_EXPECTED_ITEMS = 1_000_000
+HISTORY_BLOOM_ERROR_RATE = 0.01
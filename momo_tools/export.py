@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . e x p o r t
+ 一次寫完的 Excel 匯出器（openpyxl write-only 模式）：
+
+ - 欄寬與換行格式在寫入任何資料前先設定成欄格式，不再「寫出 → 重新開檔 → 逐格套樣式 → 再存檔」
+ - 資料列逐列 append，記憶體用量與列數無關
+ - 需換行的欄位使用共用的 WriteOnlyCell 樣式，其餘儲存格直接寫值
+"""
+
+import math
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+_THIN = Side(style="thin")
+# 比照 pandas.to_excel 的表頭樣式（粗體、細框線、置中）
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+WRAP_ALIGNMENT = Alignment(wrap_text=True)
+
+
+def _clean(value: object) -> object:
+    # pandas 的 NaN 與 None 一律寫成空白儲存格
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def write_rows_xlsx(
+    filename: str,
+    rows: Iterable[Mapping[str, object]],
+    columns: Sequence[str],
+    column_widths: Optional[Sequence[float]] = None,
+    wrap_columns: Iterable[int] = (),
+    sheet_title: str = "Sheet1",
+) -> int:
+    """
+    將 rows（以欄名為鍵的 dict）逐列寫入 filename，回傳寫入的資料列數。
+    - column_widths：依 columns 順序的欄寬
+    - wrap_columns：需自動換行的欄位（1 起算的欄號）
+    """
+    wrap = set(wrap_columns)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    for idx, width in enumerate(column_widths or [], start=1):
+        dim = ws.column_dimensions[get_column_letter(idx)]
+        dim.width = width
+        if idx in wrap:
+            dim.alignment = WRAP_ALIGNMENT
+
+    header: List[WriteOnlyCell] = []
+    for idx, col in enumerate(columns, start=1):
+        cell = WriteOnlyCell(ws, value=col)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = WRAP_ALIGNMENT if idx in wrap else HEADER_ALIGNMENT
+        header.append(cell)
+    ws.append(header)
+
+    count = 0
+    for row in rows:
+        values: List[object] = []
+        for idx, col in enumerate(columns, start=1):
+            value = _clean(row.get(col))
+            if idx in wrap and value is not None:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.alignment = WRAP_ALIGNMENT
+                values.append(cell)
+            else:
+                values.append(value)
+        ws.append(values)
+        count += 1
+
+    wb.save(filename)
+    return count
+
+
+def dataframe_rows(df) -> Iterable[Dict[str, object]]:
+    """把 DataFrame 轉成逐列 dict，供舊的 DataFrame 呼叫端沿用 write_rows_xlsx。"""
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(columns, values))
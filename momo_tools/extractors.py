@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . e x t r a c t o r s
+ 商品頁欄位擷取（商品名稱、品號、商檢字號），商檢字號規則可依版本切換：
+
+ - "v6"：Area504 → 規格條列（含關鍵字的行）→ Area302，收緊字號格式，無整頁 fallback（預設）
+ - "v5"：「認證字號」區塊 → 「商檢字號」區塊 → panel-2 → 整頁全文
+ - "v4"：panel-2 的「商檢字號」欄 → panel-2 全文 → 整頁全文（\b 單字邊界）
+ - "v3"：整頁全文找「商檢字號」後的 M/R + 5 碼數字，再退回任一 M/R + 5 碼數字
+ - "none"：不擷取商檢字號（v1/v2）
+
+ 新規則以 @register_rules("名稱") 註冊即可由 --rules 選用。
+ bs4 只在走 html.parser 路徑時才載入；v6 + lxml 的組合完全不需要 bs4。
+"""
+
+import re
+import time
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from . import config
+from .bsmi import MRDT_REGEX, _find_bsmi_code, code_after_keyword
+from .tiers import PROD_NO_LABEL, PROD_NO_REGEX, PageContext, Tier, prod_no_near_label, run_tiers
+
+BsmiRule = Callable[[object], Tuple[str, str]]
+
+RULESETS: Dict[str, BsmiRule] = {}
+
+MRDT_REGEX_V4 = re.compile(r"\b[MRDT][A-Za-z0-9]{5}\b", re.IGNORECASE)
+MRDT_REGEX_V5 = re.compile(r"[MRDT][A-Za-z0-9]{5}", re.IGNORECASE)
+IFRAME_REGEX = re.compile(r"<iframe", re.IGNORECASE)
+IFRAME_SRC_ATTRS = ("src", "data-src")  # data-src：延遲載入的 iframe
+
+
+def register_rules(name: str) -> Callable[[BsmiRule], BsmiRule]:
+    def _decorator(func: BsmiRule) -> BsmiRule:
+        RULESETS[name] = func
+        return func
+
+    return _decorator
+
+
+def get_rules(name: str) -> BsmiRule:
+    try:
+        return RULESETS[name]
+    except KeyError:
+        raise ValueError(f"未知的商檢字號規則版本：{name}（可用：{', '.join(sorted(RULESETS))}）") from None
+
+
+@register_rules("v6")
+def _parse_bsmi_with_tier(soup) -> Tuple[str, str]:
+    """回傳（商檢字號、命中順位）；命中順位為 "Area504"、"spec"、"Area302" 或空字串。"""
+    from .textindex import SoupTextIndex
+
+    # 三個順位共用同一次走訪建立的文字索引（textindex），不再各自 find_all + get_text
+    index = SoupTextIndex(soup)
+
+    # 第一順位：Area504 商品認證區
+    for block in index.area504:
+        code = code_after_keyword(index.text(block))
+        if code:
+            return code, "Area504"
+
+    # 第二順位：規格條列區塊（含商檢關鍵字的行）
+    for node in index.spec_candidates():
+        code = code_after_keyword(index.text(node))
+        if code:
+            return code, "spec"
+        sibling = node.find_next_sibling()
+        if sibling is not None:
+            code = code_after_keyword(index.text(sibling))
+            if code:
+                return code, "spec"
+
+    # 第三順位：詳情 tab 內容（含商檢關鍵字才處理）；其中 iframe 的內容不在頁面裡，
+    # 三個順位都沒找到時由 fetch 另外抓取（area302_iframe_sources → iframe_bsmi_code，命中順位 Area302-iframe）
+    for block in index.area302:
+        code = code_after_keyword(index.text(block))
+        if code:
+            return code, "Area302"
+
+    return "", ""
+
+
+def _parse_bsmi_from_soup(soup) -> str:
+    return _parse_bsmi_with_tier(soup)[0]
+
+
+def _find_bsmi_code_v5(text: str) -> str:
+    """
+    v5 版字號判定：
+    - 基本格式：M/R/D/T + 5 碼英數字
+    - 後 5 碼至少要含 1 個數字，避免誤抓純英文
+    - 前一個字元若是 '#'（例如 #D62872 搜尋用 tag）則略過
+    """
+    if not text:
+        return ""
+
+    for m in MRDT_REGEX_V5.finditer(text):
+        start = m.start()
+        code = m.group(0).upper()
+
+        if start > 0 and text[start - 1] == "#":
+            continue
+
+        tail = code[1:]
+        if not any(ch.isdigit() for ch in tail):
+            continue
+
+        return code
+
+    return ""
+
+
+def _panel2_label_value(soup, find_code: Callable[[str], str]) -> Tuple[str, str]:
+    spec_panel = soup.find("div", id="panel-2")
+    if spec_panel is None:
+        return "", ""
+    label_div = spec_panel.find(lambda tag: tag.name == "div" and tag.get_text(strip=True) == "商檢字號")
+    if label_div is not None:
+        value_div = label_div.find_next_sibling("div")
+        if value_div is not None:
+            code = find_code(value_div.get_text(" ", strip=True))
+            if code:
+                return code, "panel-2"
+    code = find_code(spec_panel.get_text(" ", strip=True))
+    return (code, "panel-2") if code else ("", "")
+
+
+@register_rules("v5")
+def _parse_bsmi_v5(soup) -> Tuple[str, str]:
+    # 1) 含「認證字號」文字的區塊；2) 含「商檢字號」文字的區塊
+    for label, names in (
+        ("認證字號", ("th", "td", "div", "li")),
+        ("商檢字號", ("th", "td", "li", "div", "span", "p")),
+    ):
+        block = soup.find(lambda tag: tag.name in names and label in tag.get_text(strip=True))
+        if block is None:
+            continue
+        code = _find_bsmi_code_v5(block.get_text(" ", strip=True))
+        if not code:
+            sib = block.find_next_sibling()
+            if sib is not None:
+                code = _find_bsmi_code_v5(sib.get_text(" ", strip=True))
+        if code:
+            return code, label
+
+    # 3) 舊的 panel-2 規格區塊邏輯保留
+    code, tier = _panel2_label_value(soup, _find_bsmi_code_v5)
+    if code:
+        return code, tier
+
+    # 4) 整頁全文 fallback
+    code = _find_bsmi_code_v5(soup.get_text(" ", strip=True))
+    return (code, "full-page") if code else ("", "")
+
+
+def _first_v4(text: str) -> str:
+    m = MRDT_REGEX_V4.search(text)
+    return m.group(0).upper() if m else ""
+
+
+@register_rules("v4")
+def _parse_bsmi_v4(soup) -> Tuple[str, str]:
+    code, tier = _panel2_label_value(soup, _first_v4)
+    if code:
+        return code, tier
+    code = _first_v4(soup.get_text(" ", strip=True))
+    return (code, "full-page") if code else ("", "")
+
+
+@register_rules("v3")
+def _parse_bsmi_v3(soup) -> Tuple[str, str]:
+    page_text = soup.get_text(" ", strip=True)
+    zhigui_match = re.search(r"商檢字號[:：]?\s*([MR]\d{5})", page_text)
+    if zhigui_match:
+        return zhigui_match.group(1).strip(), "商檢字號"
+    fallback_match = re.search(r"[MR]\d{5}", page_text)
+    return (fallback_match.group(0), "full-page") if fallback_match else ("", "")
+
+
+@register_rules("none")
+def _parse_bsmi_none(soup) -> Tuple[str, str]:
+    return "", ""
+
+
+def _og_title_tier(page: PageContext) -> str:
+    name_tag = page.root.select_one("meta[property='og:title']")
+    return name_tag["content"].strip() if name_tag else ""
+
+
+def _osm_prd_no_tier(page: PageContext) -> str:
+    tag = page.root.select_one("#osmPrdNo")
+    return tag.text.strip() if tag else ""
+
+
+def _goods_code_li_tier(page: PageContext) -> str:
+    for tag in page.root.select("li.tvlogo, li.goods-code-container"):
+        if "品號：" in tag.text:
+            return tag.text.split("品號：")[-1].strip()
+    return ""
+
+
+def _meta_keywords_tier(page: PageContext) -> str:
+    meta_code = page.root.select_one("meta[name='keywords']")
+    if meta_code and "品號：" in meta_code.get("content", ""):
+        return meta_code["content"].split("品號：")[-1].split(",")[0].strip()
+    return ""
+
+
+def _label_region_tier(page: PageContext) -> str:
+    from bs4 import CData, NavigableString
+
+    # soup.strings 與 soup.get_text() 走訪相同的字串（NavigableString / CData），依文件順序惰性產生，找到品號即停
+    def following(node) -> Iterator[str]:
+        return (str(s) for s in node.next_elements if type(s) in (NavigableString, CData))
+
+    return prod_no_near_label((str(s), partial(following, s)) for s in page.root.strings if PROD_NO_LABEL in s)
+
+
+def _full_text_tier(page: PageContext) -> str:
+    match = PROD_NO_REGEX.search(page.text)
+    return match.group(1).strip() if match else ""
+
+
+NAME_TIERS: List[Tier] = [Tier("og:title", _og_title_tier)]
+PROD_NO_TIERS: List[Tier] = [
+    Tier("osmPrdNo", _osm_prd_no_tier),
+    Tier("goods-code-li", _goods_code_li_tier),
+    Tier("meta-keywords", _meta_keywords_tier),
+    Tier("label-region", _label_region_tier),
+    Tier("full-text", _full_text_tier),
+]
+
+
+def _extract_name_prod_no(soup, trace=None) -> Tuple[str, str]:
+    """依 NAME_TIERS / PROD_NO_TIERS 擷取（商品名稱、品號）；整頁 get_text 只在全文 tier 被用到時才計算。"""
+    page = PageContext(soup, lambda root: root.get_text())
+    name, _ = run_tiers("商品名稱", NAME_TIERS, page, trace)
+    prod_no, _ = run_tiers("品號", PROD_NO_TIERS, page, trace)
+    return name or "未取得", prod_no or "未取得"
+
+
+def _extract_fields_bs4(page_html: str, rules: str = "v6", trace=None) -> Tuple[str, str, str]:
+    """以 BeautifulSoup(html.parser) 擷取（商品名稱、品號、商檢字號）。"""
+    from bs4 import BeautifulSoup
+
+    bsmi_rule = get_rules(rules)
+    start = time.perf_counter()
+    soup = BeautifulSoup(page_html, "html.parser")
+    parsed = time.perf_counter()
+
+    name, prod_no = _extract_name_prod_no(soup, trace)
+    zhigui_value, tier = bsmi_rule(soup)
+    if trace is not None:
+        trace.parse_ms = (parsed - start) * 1000
+        trace.extract_ms = (time.perf_counter() - parsed) * 1000
+        trace.tier = tier
+    return name, prod_no, zhigui_value
+
+
+def extract_product_fields(
+    page_html: str, rules: Optional[str] = None, backend: Optional[str] = None, trace=None
+) -> Tuple[str, str, str]:
+    """
+    擷取（商品名稱、品號、商檢字號）：
+    - rules 為 v6 且 backend="lxml"、環境有安裝 lxml 時走預先編譯 XPath 的快速路徑（lxml_backend）
+    - 其餘情況使用 BeautifulSoup(html.parser) 搭配指定版本的商檢字號規則
+    """
+    rules = rules or config.BSMI_RULES
+    backend = backend or config.PARSER_BACKEND
+    if rules == "v6" and backend == "lxml":
+        from . import lxml_backend
+
+        if lxml_backend.available():
+            return lxml_backend.extract_fields(page_html, trace=trace)
+    return _extract_fields_bs4(page_html, rules=rules, trace=trace)
+
+
+def bsmi_code_with_tier(page_html: str, backend: Optional[str] = None) -> Tuple[str, str]:
+    """v6 規則的（商檢字號、命中順位），不擷取商品名稱與品號；lightfetch 以此判定串流讀到的前段頁面。"""
+    backend = backend or config.PARSER_BACKEND
+    if backend == "lxml":
+        from . import lxml_backend
+
+        if lxml_backend.available():
+            return lxml_backend.page_bsmi(page_html)
+    from bs4 import BeautifulSoup
+
+    return _parse_bsmi_with_tier(BeautifulSoup(page_html, "html.parser"))
+
+
+def _resolve_sources(sources: List[str], base_url: str) -> List[str]:
+    resolved: List[str] = []
+    for src in sources:
+        url = urljoin(base_url, src.strip()) if src and src.strip() else ""
+        if url.startswith(("http://", "https://")) and url not in resolved:
+            resolved.append(url)
+    return resolved
+
+
+def area302_iframe_sources(page_html: str, base_url: str = "", backend: Optional[str] = None) -> List[str]:
+    """
+    Area302（詳情 tab）中 iframe 的網址：依文件順序、以 base_url 轉為絕對網址、去除重複與非 http(s) 網址。
+    頁面沒有 <iframe 字樣時直接回傳空串列，不解析 HTML。
+    """
+    if not IFRAME_REGEX.search(page_html or ""):
+        return []
+    backend = backend or config.PARSER_BACKEND
+    if backend == "lxml":
+        from . import lxml_backend
+
+        if lxml_backend.available():
+            return _resolve_sources(lxml_backend.area302_iframe_sources(page_html), base_url)
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_html, "html.parser")
+    sources = [
+        str(iframe.get(attr) or "")
+        for iframe in soup.select(".Area302 iframe")
+        for attr in IFRAME_SRC_ATTRS
+        if iframe.get(attr)
+    ]
+    return _resolve_sources(sources, base_url)
+
+
+def iframe_bsmi_code(iframe_html: str, backend: Optional[str] = None) -> str:
+    """iframe 文件（詳情內容）全文中，商檢關鍵字之後的第一組合理字號（與 Area302 順位相同的判定）。"""
+    backend = backend or config.PARSER_BACKEND
+    if backend == "lxml":
+        from . import lxml_backend
+
+        if lxml_backend.available():
+            return lxml_backend.document_bsmi_code(iframe_html)
+    from bs4 import BeautifulSoup
+
+    return code_after_keyword(BeautifulSoup(iframe_html, "html.parser").get_text(" ", strip=True))
+
+
+__all__ = [
+    "MRDT_REGEX",
+    "RULESETS",
+    "_find_bsmi_code",
+    "_parse_bsmi_from_soup",
+    "area302_iframe_sources",
+    "bsmi_code_with_tier",
+    "extract_product_fields",
+    "iframe_bsmi_code",
+    "get_rules",
+    "register_rules",
+]
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . f e t c h
+ 抓取 momo 商品頁（共用 Session、快取、限速、重試策略、逐列 trace），再交給 extractors 擷取欄位；
+ v5 / v6 規則改抓手機版商品頁，none / v1–v4 同舊版腳本照原網址抓桌機版頁面（fetch_target）；
+ 傳入 archive 時每次實際連線取得的頁面（含 304 沿用快取的內容）都會寫進原始頁面存檔；
+ light=True 時改走 lightfetch 的輕量路徑（JSON API / JSON-LD 優先）；
+ v6 規則在頁面中找不到商檢字號時，另外並行抓取 Area302 的 iframe（area302_iframe_code）
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from . import config
+from .archive import PageArchive
+from .cache import DESKTOP_KEY_PREFIX, IFRAME_KEY_PREFIX, PageCache
+from .common import _extract_i_code
+from .extractors import area302_iframe_sources, extract_product_fields, iframe_bsmi_code
+from .lightfetch import fetch_light
+from .metrics import RowTrace
+from .pool import HostRateLimiter
+from .retry import RetryPolicy
+from .session import get_session, pop_connect_seconds
+
+MOBILE_GOODS_URL = "https://m.momoshop.com.tw/goods.momo"
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+# 以手機版商品頁為準的規則版本；其餘版本（none / v1–v4）讀取桌機版頁面，例如 v4 的 div#panel-2 只有桌機版才有
+MOBILE_RULES = ("v5", "v6")
+
+
+def mobile_target(url: str) -> Tuple[str, str]:
+    """回傳（i_code、實際要抓的網址）：有 i_code 時一律改抓手機版商品頁。"""
+    i_code = _extract_i_code(url)
+    return i_code, (f"{MOBILE_GOODS_URL}?i_code={i_code}" if i_code else url)
+
+
+def fetch_target(url: str, rules: Optional[str] = None) -> Tuple[str, str, str]:
+    """
+    依規則版本回傳（i_code、快取與存檔的鍵、實際要抓的網址）：
+    v5 / v6 同 mobile_target；none / v1–v4 照原網址抓取，鍵加上 DESKTOP_KEY_PREFIX，不與手機版頁面混用。
+    """
+    if (rules or config.BSMI_RULES) in MOBILE_RULES:
+        i_code, m_url = mobile_target(url)
+        return i_code, i_code, m_url
+    i_code = _extract_i_code(url)
+    return i_code, (DESKTOP_KEY_PREFIX + i_code if i_code else ""), url
+
+
+def failed_fields(rules: Optional[str], error: str) -> Tuple[str, str]:
+    """
+    放棄抓取時的（商品名稱、品號）：none / v1–v4 同舊版腳本填「錯誤：訊息」與「錯誤」（輸出列改寫進調查結果），
+    v5 / v6 為「未取得」。
+    """
+    if (rules or config.BSMI_RULES) in MOBILE_RULES:
+        return "未取得", "未取得"
+    return f"錯誤：{error or '抓取失敗'}", "錯誤"
+
+
+def fetch_failed(product_info: Dict[str, str]) -> bool:
+    """parse_momo_simple 的結果是否為抓取失敗（沒有商品名稱、「未取得」或「錯誤：」開頭）。"""
+    name = product_info.get("商品名稱", "")
+    return not name or name == "未取得" or name.startswith("錯誤：")
+
+
+def _download_page(
+    m_url: str,
+    i_code: str,
+    headers: Dict[str, str],
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    trace: Optional[RowTrace] = None,
+    archive: Optional[PageArchive] = None,
+) -> str:
+    """
+    取得商品頁 HTML：
+    - 快取未過期：直接回傳，不發出請求
+    - 快取已過期：帶 If-None-Match / If-Modified-Since 發條件式請求，304 時沿用快取
+    - 其餘情況：完整下載並寫回快取
+    - archive：有發出請求時把這次得到的頁面存檔（快取命中沒有連線，不另外存檔）
+    """
+    entry = cache.lookup(i_code) if cache is not None and i_code else None
+    if entry is not None and entry.is_fresh():
+        cache.record("hit")
+        if trace is not None:
+            trace.cache = "hit"
+        return entry.body
+
+    request_headers = dict(headers)
+    if entry is not None:
+        request_headers.update(entry.conditional_headers())
+
+    if rate_limiter is not None:
+        rate_limiter.acquire(m_url)
+    pop_connect_seconds()
+    start = time.perf_counter()
+    res = get_session().get(m_url, headers=request_headers, timeout=20)
+    if trace is not None:
+        # elapsed：送出請求到收到回應標頭（含建立連線）；其後到讀完內容為下載時間
+        connect = pop_connect_seconds()
+        elapsed = res.elapsed.total_seconds()
+        trace.status = res.status_code
+        trace.connect_ms += connect * 1000
+        trace.ttfb_ms = max(0.0, elapsed - connect) * 1000
+        trace.download_ms = max(0.0, time.perf_counter() - start - elapsed) * 1000
+        trace.bytes += len(res.content)
+    if res.status_code == 304 and entry is not None:
+        cache.refresh(i_code)
+        cache.record("revalidated")
+        if trace is not None:
+            trace.cache = "revalidated"
+        if archive is not None:
+            archive.put(i_code, m_url, entry.body)
+        return entry.body
+
+    res.raise_for_status()
+    if archive is not None:
+        archive.put(i_code, m_url, res.text)
+    if cache is not None and i_code:
+        cache.put(
+            i_code,
+            m_url,
+            res.text,
+            etag=res.headers.get("ETag", ""),
+            last_modified=res.headers.get("Last-Modified", ""),
+        )
+        cache.record("miss")
+        if trace is not None:
+            trace.cache = "miss"
+    return res.text
+
+
+def _fetch_iframe_code(src: str, rate_limiter: Optional[HostRateLimiter], cache: Optional[PageCache]) -> str:
+    page_html = _download_page(src, IFRAME_KEY_PREFIX + src, REQUEST_HEADERS, rate_limiter=rate_limiter, cache=cache)
+    return iframe_bsmi_code(page_html)
+
+
+def area302_iframe_code(
+    page_html: str,
+    page_url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    trace: Optional[RowTrace] = None,
+) -> str:
+    """
+    同時抓取 Area302 中的 iframe（最多 config.IFRAME_MAX 個），依文件順序取第一個找到的商檢字號；
+    前面的 iframe 已找到字號時立即回傳：尚未開始的請求取消，已送出的請求留在背景結束，不拖慢這一列。
+    每列各用一個小執行緒池，避免某一列卡住的 iframe 佔住其他列的名額；請求速率仍由 rate_limiter 控制。
+    iframe 抓取失敗不影響該列，視為沒有字號。
+    """
+    sources = area302_iframe_sources(page_html, page_url)[: config.IFRAME_MAX]
+    if not sources:
+        return ""
+    executor = ThreadPoolExecutor(max_workers=min(len(sources), config.IFRAME_WORKERS), thread_name_prefix="iframe")
+    futures = [executor.submit(_fetch_iframe_code, src, rate_limiter, cache) for src in sources]
+    try:
+        for src, future in zip(sources, futures):
+            try:
+                code = future.result()
+            except Exception as e:
+                print(f"⚠️ (iframe) 抓取失敗：{src}：{e}")
+                continue
+            if code:
+                if trace is not None:
+                    trace.tier = "Area302-iframe"
+                return code
+        return ""
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_page_fields(
+    page_html: str,
+    page_url: str,
+    rules: Optional[str] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    trace: Optional[RowTrace] = None,
+) -> Tuple[str, str, str]:
+    """擷取（商品名稱、品號、商檢字號）；v6 規則在頁面中找不到字號時再查 Area302 的 iframe（config.IFRAME_FETCH）。"""
+    name, prod_no, code = extract_product_fields(page_html, rules=rules, trace=trace)
+    if not code and config.IFRAME_FETCH and (rules or config.BSMI_RULES) == "v6":
+        code = area302_iframe_code(page_html, page_url, rate_limiter=rate_limiter, cache=cache, trace=trace)
+    return name, prod_no, code
+
+
+# ➤ 對 MOMO 商品進行 retry + timeout 的簡易爬蟲（專抓手機版）
+def parse_momo_simple(
+    url: str,
+    max_retries: int = config.MAX_ATTEMPTS,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    trace: Optional[RowTrace] = None,
+    rules: Optional[str] = None,
+    archive: Optional[PageArchive] = None,
+    light: bool = False,
+) -> Dict[str, str]:
+    headers = REQUEST_HEADERS
+    policy = retry_policy or RetryPolicy()
+    name = ""
+    prod_no = ""
+    zhigui_value = ""
+    error = ""
+
+    i_code, key, m_url = fetch_target(url, rules)
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            if trace is not None:
+                trace.attempts = attempt
+                trace.error = ""
+            policy.before_request()
+            if light:
+                # 輕量路徑：結構化資料優先，欄位不足才解析整頁（lightfetch）
+                name, prod_no, zhigui_value = fetch_light(
+                    m_url,
+                    i_code,
+                    headers,
+                    rules,
+                    rate_limiter=rate_limiter,
+                    cache=cache,
+                    trace=trace,
+                    archive=archive,
+                    cache_key=key,
+                )
+                policy.on_success()
+                break
+            page_html = _download_page(
+                m_url, key, headers, rate_limiter=rate_limiter, cache=cache, trace=trace, archive=archive
+            )
+            policy.on_success()
+            name, prod_no, zhigui_value = extract_page_fields(
+                page_html, m_url, rules=rules, rate_limiter=rate_limiter, cache=cache, trace=trace
+            )
+            break
+
+        except requests.RequestException as e:
+            error = str(e)
+            if trace is not None:
+                trace.error = error
+            delay = policy.on_failure(e, attempt, max_retries)
+            if delay is None and not policy.is_retryable(e):
+                print(f"❌ (Mobile) 發生例外：{e}")
+                break
+            print(f"❌ (Mobile) 第 {attempt} 次失敗：{e}")
+            if delay is None:
+                break
+            time.sleep(delay)
+        except Exception as e:
+            error = str(e)
+            if trace is not None:
+                trace.error = error
+            print(f"❌ (Mobile) 發生例外：{e}")
+            break
+
+    if not name:
+        name, prod_no = failed_fields(rules, error)
+    return {"商品名稱": name, "品號": prod_no, "商檢字號": zhigui_value, "網址": url}
+
+
+def fetch_momo_product(
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    trace: Optional[RowTrace] = None,
+    rules: Optional[str] = None,
+    archive: Optional[PageArchive] = None,
+    light: bool = False,
+) -> Dict[str, str]:
+    return parse_momo_simple(
+        url,
+        max_retries=config.MAX_ATTEMPTS,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        retry_policy=retry_policy,
+        trace=trace,
+        rules=rules,
+        archive=archive,
+        light=light,
+    )
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . h a r v e s t
+ 搜尋結果 / 列表頁的商品網址收集（取代 web_seek/momo_keyword_crawler_v4.0.js 的瀏覽器腳本）：
+
+ - 直接抓搜尋頁 HTML，讀 <script type="application/ld+json"> 的 ItemList（同 extractProductsFromJsonLd），
+   不開瀏覽器分頁；頁碼以 config.HARVEST_PAGE_PARAM 帶入，多頁並行抓取（共用 Session、每主機限速與重試策略）
+ - 關鍵字規則檔同腳本：「+關鍵字」為白名單（有設定就必須命中其一）、「-關鍵字」為黑名單，# 開頭為註解；
+   比對由 keywords.KeywordRules 負責（Aho-Corasick 自動機，不分大小寫與全形半形）
+ - 排除清單：外部匯入的歷史 URL.csv（任一欄是網址即可）與共用的商品歷史（history.HistoryStore；單獨執行時收錄即寫回，
+   cli --search 只讀取，查核成功的商品才由 cli 記錄）
+ - 網址以 common.canonicalize_momo_url 標準化後去重；結果依頁序逐筆 yield，
+   harvest_records 直接產生 (序號, 商品網址)，可交給 pipeline.iter_output_rows（cli --search）
+ - 單獨執行時輸出「序號,商品網址」CSV（及選用的「序號,商品名稱」CSV）：python -m momo_tools.harvest --keyword 吹風機
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import requests
+
+from . import config
+from .common import canonicalize_momo_url
+from .history import HistoryStore
+from .inputs import InputRecord
+from .keywords import KeywordRules
+from .lightfetch import _LD_JSON_REGEX
+from .pipeline import make_retry_policy
+from .pool import HostRateLimiter, imap_ordered
+from .retry import RetryPolicy
+from .session import get_session
+
+SEARCH_URL = "https://www.momoshop.com.tw/search/searchShop.jsp"
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_TP_GOODS_PATH_REGEX = re.compile(r"^/TP/TP\d+/goodsDetail/", re.IGNORECASE)
+# 「下一頁」按鈕：<div class="page-btn page-next"><a>下一頁</a></div>，最後一頁時 class 含 disabled
+_NEXT_PAGE_REGEX = re.compile(r"class=[\"']([^\"']*\bpage-next\b[^\"']*)[\"']", re.IGNORECASE)
+_UNDEFINED_REGEX = re.compile(r"\bundefined\b")
+_TRAILING_COMMA_REGEX = re.compile(r",\s*([}\]])")
+_HTTP_REGEX = re.compile(r"^https?://", re.IGNORECASE)
+
+
+class SearchProduct(NamedTuple):
+    url: str
+    title: str
+
+
+def load_url_set(path: str) -> Set[str]:
+    """
+    讀取歷史 URL.csv（同腳本的 parseHistoryCsvText）：每列取第一個 http(s) 開頭的欄位，略過「序號,」表頭；
+    網址以 canonicalize_momo_url 標準化。檔案不存在時回傳空集合。
+    """
+    urls: Set[str] = set()
+    if not path or not os.path.exists(path):
+        return urls
+    with open(path, "r", encoding="utf-8-sig", newline="") as fh:
+        for row in csv.reader(fh):
+            for cell in row:
+                cell = cell.strip().strip('"')
+                if _HTTP_REGEX.match(cell):
+                    urls.add(canonicalize_momo_url(cell))
+                    break
+    return urls
+
+
+def safe_parse_ld_json(raw: str) -> Optional[object]:
+    """同腳本的 safeParseLdJson：去掉 BOM、undefined 換成 null、移除尾端多餘逗號後再解析，失敗時回傳 None。"""
+    text = (raw or "").strip().lstrip("\ufeff")
+    if not text:
+        return None
+    text = _TRAILING_COMMA_REGEX.sub(r"\1", _UNDEFINED_REGEX.sub("null", text))
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def search_page_products(page_html: str) -> List[SearchProduct]:
+    """搜尋 / 列表頁 JSON-LD 中 mainEntity（ItemList）的商品（網址、名稱），依頁面順序；網址為頁面上的原始值。"""
+    products: List[SearchProduct] = []
+    for raw in _LD_JSON_REGEX.findall(page_html or ""):
+        data = safe_parse_ld_json(raw)
+        for item in data if isinstance(data, list) else [data]:
+            main = item.get("mainEntity") if isinstance(item, dict) else None
+            if not isinstance(main, dict) or main.get("@type") != "ItemList":
+                continue
+            elements = main.get("itemListElement")
+            for product in elements if isinstance(elements, list) else []:
+                if not isinstance(product, dict) or product.get("@type") != "Product":
+                    continue
+                url = re.sub(r"\s+", "", str(product.get("url") or ""))
+                title = str(product.get("name") or "").strip()
+                if url and title:
+                    products.append(SearchProduct(url, title))
+    return products
+
+
+def has_next_page(page_html: str) -> bool:
+    """頁面上有可點的「下一頁」按鈕（同腳本的 getNextPageLink）。"""
+    for m in _NEXT_PAGE_REGEX.finditer(page_html or ""):
+        if "disabled" not in m.group(1).split():
+            return True
+    return False
+
+
+def keyword_url(keyword: str) -> str:
+    return f"{SEARCH_URL}?{urlencode({'keyword': keyword.strip()})}"
+
+
+def page_url(url: str, page: int) -> str:
+    """把搜尋 / 列表頁網址的頁碼參數（config.HARVEST_PAGE_PARAM）設為 page。"""
+    parsed = urlparse(url)
+    params = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k != config.HARVEST_PAGE_PARAM]
+    params.append((config.HARVEST_PAGE_PARAM, str(page)))
+    return urlunparse(parsed._replace(query=urlencode(params)))
+
+
+def _start_page(url: str) -> int:
+    value = dict(parse_qsl(urlparse(url).query)).get(config.HARVEST_PAGE_PARAM, "")
+    return int(value) if value.isdigit() and int(value) > 0 else 1
+
+
+def _product_url(raw: str, page: str) -> str:
+    # 相對網址以搜尋頁補齊；只收 momo 網域（同腳本 canonicalizeMomoUrl 對其他網域回傳 null）
+    url = canonicalize_momo_url(urljoin(page, raw))
+    host = (urlparse(url).hostname or "").lower()
+    return url if host == "momoshop.com.tw" or host.endswith(".momoshop.com.tw") else ""
+
+
+def fetch_search_page(
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    max_attempts: int = config.MAX_ATTEMPTS,
+) -> str:
+    """抓取一頁搜尋結果 HTML；重試用盡或不可重試的錯誤時印出原因並回傳空字串。"""
+    policy = retry_policy or RetryPolicy()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            policy.before_request()
+            if rate_limiter is not None:
+                rate_limiter.acquire(url)
+            res = get_session().get(url, headers=REQUEST_HEADERS, timeout=20)
+            res.raise_for_status()
+            policy.on_success()
+            return res.text
+        except requests.RequestException as e:
+            delay = policy.on_failure(e, attempt, max_attempts)
+            if delay is None:
+                print(f"❌ (搜尋頁) 發生例外：{url}：{e}")
+                return ""
+            print(f"❌ (搜尋頁) 第 {attempt} 次失敗：{e}")
+            time.sleep(delay)
+    return ""
+
+
+def _seen_before(history: HistoryStore, product_url: str, record: bool) -> bool:
+    # 寫回時以 add 同時判斷與記錄（看過的商品只更新最後看到的時間），每筆只查一次歷史
+    return not history.add(product_url) if record else product_url in history
+
+
+def harvest_products(
+    start_urls: Iterable[str],
+    rules: Optional[KeywordRules] = None,
+    exclude: Optional[Set[str]] = None,
+    history: Optional[HistoryStore] = None,
+    record_history: bool = False,
+    max_items: int = 0,
+    max_pages: int = config.HARVEST_MAX_PAGES,
+    exclude_tp: bool = False,
+    max_workers: int = config.MAX_WORKERS,
+    rate_per_host: float = config.RATE_PER_HOST,
+    burst: int = config.RATE_BURST,
+    stats: Optional[Counter] = None,
+) -> Iterator[SearchProduct]:
+    """
+    依序收集每個起始網址（搜尋 / 列表頁）的商品，逐筆 yield 通過篩選、標準化且未重複的商品：
+    - 每個起始網址從其頁碼開始往後翻，同時在途 max_workers 頁，結果依頁序處理；
+      遇到沒有 ItemList 的頁、沒有「下一頁」按鈕的頁或達 max_pages 頁即停止
+    - rules：標題關鍵字規則；exclude：排除的網址（已標準化）；history：商品歷史，看過的商品略過
+    - record_history：收錄時即寫回 history（單獨收集網址時使用）；cli --search 不寫回，
+      改由查核完成後的 HistoryStore.record_rows 記錄，查核失敗或中斷的商品下次仍會被收錄
+    - max_items > 0 時收滿即停止（同腳本的「目標最多 N 筆」）；exclude_tp：略過 TP 型態的商品網址
+    - stats（Counter）會累加頁數、商品數與各種略過原因
+    """
+    rules = rules or KeywordRules()
+    exclude = exclude if exclude is not None else set()
+    stats = stats if stats is not None else Counter()
+    rate_limiter = HostRateLimiter(rate=rate_per_host, burst=burst)
+    policy = make_retry_policy()
+    seen: Set[str] = set()
+    for start in start_urls:
+        first = _start_page(start)
+        stop = threading.Event()
+
+        def _pages() -> Iterator[str]:
+            # 惰性產生頁碼：確定已到最後一頁後不再送出新請求（已在途的最多 max_workers 頁）
+            for page in range(first, first + max_pages):
+                if stop.is_set():
+                    return
+                yield page_url(start, page)
+
+        def _fetch(url: str) -> Tuple[str, str]:
+            return url, ("" if stop.is_set() else fetch_search_page(url, rate_limiter, policy))
+
+        for url, page_html in imap_ordered(_fetch, _pages(), max_workers=max_workers, max_pending=max_workers):
+            products = search_page_products(page_html)
+            if not products:
+                if page_html:
+                    print(f"⚠️ {url} 沒有 JSON-LD 商品清單，停止翻頁")
+                stop.set()
+                break
+            stats["頁數"] += 1
+            stats["商品"] += len(products)
+            for raw, title in products:
+                product_url = _product_url(raw, url)
+                if not product_url or (exclude_tp and _TP_GOODS_PATH_REGEX.match(urlparse(product_url).path)):
+                    stats["非商品網址"] += 1
+                    continue
+                if not rules.matches(title):
+                    stats["關鍵字排除"] += 1
+                    continue
+                if product_url in seen:
+                    stats["重複"] += 1
+                    continue
+                if product_url in exclude or (
+                    history is not None and _seen_before(history, product_url, record_history)
+                ):
+                    stats["歷史排除"] += 1
+                    continue
+                seen.add(product_url)
+                stats["收錄"] += 1
+                yield SearchProduct(product_url, title)
+                if max_items and len(seen) >= max_items:
+                    stop.set()
+                    return
+            if not has_next_page(page_html):
+                stop.set()
+                break
+
+
+def harvest_records(products: Iterable[SearchProduct]) -> Iterator[InputRecord]:
+    """把收集結果編成 (序號, 商品網址)，序號從 1 起算；可直接交給 pipeline.iter_output_rows。"""
+    for seq, product in enumerate(products, 1):
+        yield seq, product.url
+
+
+def summarize(stats: Counter) -> str:
+    return (
+        f"🔎 搜尋頁 {stats['頁數']} 頁，商品 {stats['商品']} 筆，收錄 {stats['收錄']} 筆"
+        f"（關鍵字排除 {stats['關鍵字排除']}、歷史排除 {stats['歷史排除']}、重複 {stats['重複']}、"
+        f"非商品網址 {stats['非商品網址']}）"
+    )
+
+
+def write_csv(products: Iterable[SearchProduct], path: str, titles_path: str = "") -> int:
+    """
+    逐筆寫出「序號,商品網址」CSV（UTF-8 BOM，同腳本下載的格式）；titles_path 不為空時另寫「序號,商品名稱」。
+    回傳寫出筆數。
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as fh:
+        title_fh = open(titles_path, "w", encoding="utf-8-sig", newline="") if titles_path else None
+        try:
+            writer = csv.writer(fh)
+            writer.writerow(["序號", "商品網址"])
+            title_writer = csv.writer(title_fh, quoting=csv.QUOTE_NONNUMERIC) if title_fh is not None else None
+            if title_writer is not None:
+                title_writer.writerow(["序號", "商品名稱"])
+            for count, product in enumerate(products, 1):
+                writer.writerow([count, product.url])
+                if title_writer is not None:
+                    title_writer.writerow([count, product.title])
+        finally:
+            if title_fh is not None:
+                title_fh.close()
+    return count
+
+
+def start_urls_from_args(keywords: Sequence[str], urls: Sequence[str]) -> List[str]:
+    return [keyword_url(k) for k in keywords if k.strip()] + [u.strip() for u in urls if u.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.harvest", description="收集 momo 搜尋結果 / 列表頁的商品網址")
+    parser.add_argument("--keyword", action="append", default=[], help="搜尋關鍵字（可重複指定）")
+    parser.add_argument("--url", action="append", default=[], help="搜尋結果或列表頁網址（可重複指定）")
+    parser.add_argument("--rules", default="", help="標題關鍵字規則檔（TXT：+包含、-排除）")
+    parser.add_argument("--exclude", action="append", default=[], help="排除用的歷史 URL.csv（可重複指定）")
+    parser.add_argument(
+        "--history", default=config.HISTORY_PATH, help="商品歷史（SQLite）：排除看過的商品並記錄新收錄的商品"
+    )
+    parser.add_argument("--no-history", action="store_true", help="不使用商品歷史")
+    parser.add_argument("--max", type=int, default=0, help="最多收錄幾筆（0 表示抓到最後一頁）")
+    parser.add_argument("--max-pages", type=int, default=config.HARVEST_MAX_PAGES, help="每個起始網址最多翻幾頁")
+    parser.add_argument("--exclude-tp", action="store_true", help="略過 TP 型態的商品網址")
+    parser.add_argument("--workers", type=int, default=config.MAX_WORKERS, help="同時抓取的搜尋頁數")
+    parser.add_argument("--output", default="", help="輸出 CSV（預設 momo_search_urls_<時間>.csv）")
+    parser.add_argument("--titles", default="", help="另外輸出「序號,商品名稱」CSV 的路徑")
+    args = parser.parse_args(argv)
+
+    start_urls = start_urls_from_args(args.keyword, args.url)
+    if not start_urls:
+        raise SystemExit("❌ 請以 --keyword 或 --url 指定要收集的搜尋結果")
+    rules = KeywordRules.from_file(args.rules) if args.rules else KeywordRules()
+    exclude: Set[str] = set()
+    for path in args.exclude:
+        if not os.path.exists(path):
+            raise SystemExit(f"❌ 找不到排除清單：{path}")
+        exclude |= load_url_set(path)
+    history = HistoryStore(args.history) if args.history and not args.no_history else None
+    print(
+        f"📋 關鍵字規則：{rules.describe()}；排除清單 {len(exclude)} 筆"
+        + (f"、商品歷史 {len(history)} 筆" if history is not None else "")
+    )
+
+    from .session import configure_session
+
+    configure_session(pool_size=max(config.POOL_SIZE, args.workers))
+    output = args.output or time.strftime("momo_search_urls_%Y%m%d_%H%M%S.csv")
+    stats: Counter = Counter()
+    try:
+        products = harvest_products(
+            start_urls,
+            rules=rules,
+            exclude=exclude,
+            history=history,
+            record_history=True,
+            max_items=args.max,
+            max_pages=args.max_pages,
+            exclude_tp=args.exclude_tp,
+            max_workers=args.workers,
+            stats=stats,
+        )
+        count = write_csv(products, output, titles_path=args.titles)
+    finally:
+        if history is not None:
+            history.close()
+    print(summarize(stats))
+    if history is not None:
+        print(history.summary())
+    print(f"✅ 已輸出 {count} 筆至 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . h i s t o r y
+ 已看過的商品歷史（取代瀏覽器腳本的 localStorage momo_search_seen_urls_v1 與各自保存的歷史 URL.csv）：
+
+ - SQLite 檔以 i_code 為鍵（沒有 i_code 的網址以 canonicalize_momo_url 的結果為鍵），harvest 收集到的網址與
+   查核完成的商品都記在同一份歷史，每筆只新增一列，不必每次重寫整份清單
+ - 記憶體中另有 Bloom filter：大部分「沒看過」的網址在記憶體內就能判定，只有 Bloom filter 命中時才查 SQLite 確認，
+   數百萬筆歷史也不需要整份載入記憶體；關閉時把 Bloom filter 存回 SQLite，下次開啟直接載入，筆數有變才重建
+ - 新增的紀錄每 COMMIT_EVERY 筆提交一次（關閉時全部提交）
+ - python -m momo_tools.history import 歷史URL.csv / 腳本匯出的 JSON：匯入既有清單；status：顯示筆數
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from . import config
+from .common import _extract_i_code, canonicalize_momo_url
+
+COMMIT_EVERY = 256
+
+
+def history_key(url: str) -> str:
+    """歷史紀錄的鍵：商品的 i_code；沒有 i_code 時（TP 型態等）為標準化後的網址。"""
+    canonical = canonicalize_momo_url(url)
+    return _extract_i_code(canonical) or canonical
+
+
+class BloomFilter:
+    """固定大小的 Bloom filter：以 blake2b 的兩個 64 位元值做 double hashing 產生 k 個位置。"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(1, int(capacity))
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.capacity = capacity
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class HistoryStore:
+    """
+    執行緒安全的歷史紀錄（單一 SQLite 連線 + 鎖）。
+    url in store 判斷是否看過；add 記錄一筆並回傳是否為新商品；record_rows 在查核輸出列通過時記錄成功的列。
+    """
+
+    def __init__(
+        self,
+        path: str = config.HISTORY_PATH,
+        expected_items: int = config.HISTORY_EXPECTED_ITEMS,
+        error_rate: float = config.HISTORY_BLOOM_ERROR_RATE,
+    ) -> None:
+        self.path = path
+        self.error_rate = error_rate
+        self.stats: Dict[str, int] = {"lookups": 0, "bloom_negative": 0, "false_positive": 0, "added": 0}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seen (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                source TEXT NOT NULL DEFAULT '',
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB)")
+        self._conn.commit()
+        self._count = int(self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0])
+        self.bloom = self._load_bloom(expected_items) or self._build_bloom(expected_items)
+
+    def _meta(self, name: str) -> Optional[object]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _load_bloom(self, expected_items: int) -> Optional[BloomFilter]:
+        # 上次關閉時存下的 Bloom filter：筆數相同、容量仍足夠時直接沿用
+        info = self._meta("bloom_info")
+        bits = self._meta("bloom_bits")
+        if info is None or bits is None:
+            return None
+        info = json.loads(info)
+        if info.get("count") != self._count or info.get("capacity", 0) < max(expected_items, self._count):
+            return None
+        bloom = BloomFilter(info["capacity"], info["error_rate"])
+        if len(bits) != len(bloom.bits) or bloom.hashes != info.get("hashes"):
+            return None
+        bloom.bits = bytearray(bits)
+        return bloom
+
+    def _build_bloom(self, expected_items: int) -> BloomFilter:
+        # 容量預留目前筆數的兩倍，本輪新增的紀錄不會讓誤判率明顯上升；以游標逐列讀鍵，不把整份清單載入記憶體
+        bloom = BloomFilter(max(expected_items, self._count * 2), self.error_rate)
+        for (key,) in self._conn.execute("SELECT key FROM seen"):
+            bloom.add(key)
+        return bloom
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _contains_key_locked(self, key: str) -> bool:
+        self.stats["lookups"] += 1
+        if key not in self.bloom:
+            self.stats["bloom_negative"] += 1
+            return False
+        found = self._conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+        if not found:
+            self.stats["false_positive"] += 1
+        return found
+
+    def __contains__(self, url: str) -> bool:
+        key = history_key(url)
+        with self._lock:
+            return self._contains_key_locked(key)
+
+    def _insert_locked(self, key: str, url: str, source: str, now: float) -> None:
+        self._conn.execute(
+            "INSERT INTO seen (key, url, source, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+            (key, canonicalize_momo_url(url), source, now, now),
+        )
+        self.bloom.add(key)
+        self._count += 1
+        self.stats["added"] += 1
+        self._written_locked()
+
+    def add(self, url: str, source: str = "harvest") -> bool:
+        """記錄一筆網址；回傳是否為新商品（已存在時只更新最後看到的時間與網址）。"""
+        key = history_key(url)
+        now = time.time()
+        with self._lock:
+            if not self._contains_key_locked(key):
+                self._insert_locked(key, url, source, now)
+                return True
+            self._conn.execute(
+                "UPDATE seen SET url = ?, last_seen = ? WHERE key = ?", (canonicalize_momo_url(url), now, key)
+            )
+            self._written_locked()
+        return False
+
+    def import_urls(self, urls: Iterable[str], source: str = "import") -> int:
+        """匯入既有清單（已存在的紀錄不更新），回傳新增筆數。"""
+        added = 0
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                key = history_key(url) if url else ""
+                if key and not self._contains_key_locked(key):
+                    self._insert_locked(key, url, source, now)
+                    added += 1
+            self._commit_locked()
+        return added
+
+    def record_rows(self, rows: Iterable[Dict[str, object]], source: str = "check") -> Iterator[Dict[str, object]]:
+        """查核輸出列通過時記錄成功查核的商品（調查結果為空、取得商品名稱的列），列本身原樣 yield。"""
+        for row in rows:
+            url = str(row.get("網址/地址") or "")
+            if url and not row.get("調查結果") and row.get("商品名稱") not in ("", None, "未取得"):
+                self.add(url, source=source)
+            yield row
+
+    def _written_locked(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._commit_locked()
+
+    def _commit_locked(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._commit_locked()
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"🧾 歷史紀錄 {self._count} 筆；本輪查詢 {s['lookups']} 次，Bloom filter 直接排除 {s['bloom_negative']} 次，"
+            f"查 SQLite {s['lookups'] - s['bloom_negative']} 次（誤判 {s['false_positive']} 次），新增 {s['added']} 筆"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            info = {
+                "count": self._count,
+                "capacity": self.bloom.capacity,
+                "error_rate": self.error_rate,
+                "hashes": self.bloom.hashes,
+            }
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('bloom_info', ?)", (json.dumps(info),)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('bloom_bits', ?)", (bytes(self.bloom.bits),)
+            )
+            self._commit_locked()
+            self._conn.close()
+            self._conn = None
+
+
+def _read_urls(path: str) -> List[str]:
+    # 腳本「下載歷史網址.csv」或外部歷史 URL.csv（任一欄是網址即可）；.json 為 localStorage 匯出的網址陣列
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8-sig") as fh:
+            data = json.load(fh)
+        return [str(u) for u in data if u] if isinstance(data, list) else []
+    from .harvest import load_url_set
+
+    return sorted(load_url_set(path))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.history", description="已看過的商品歷史（SQLite + Bloom filter）")
+    parser.add_argument("--path", default=config.HISTORY_PATH, help="歷史紀錄檔路徑（SQLite）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import", help="匯入歷史 URL.csv 或 localStorage 匯出的 JSON 網址陣列")
+    importer.add_argument("files", nargs="+", help="CSV / JSON 檔")
+    sub.add_parser("status", help="顯示歷史筆數")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.path)
+    try:
+        if args.command == "import":
+            for path in args.files:
+                added = store.import_urls(_read_urls(path))
+                print(f"✅ {path}：新增 {added} 筆")
+        print(store.summary())
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . i n p u t s
+ 串流讀取查核清單（CSV / XLSX），逐列產生 (序號, 商品網址)：
+
+ - 開檔時只讀表頭就驗證欄位，缺欄位立即丟出 ValueError
+ - 之後逐列 yield，不把整份檔案載入 DataFrame，數十萬列的清單記憶體用量也維持固定
+ - XLSX 以 openpyxl read_only 模式讀取
+ - open_output_rows 以同樣方式讀回先前匯出的查核結果（逐列 dict），供再查核使用
+"""
+
+import csv
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+REQUIRED_COLUMNS = ("序號", "商品網址")
+XLSX_SUFFIXES = (".xlsx", ".xlsm")
+
+InputRecord = Tuple[object, str]
+
+_INT_REGEX = re.compile(r"-?\d+")
+
+
+def _coerce_seq(value: object) -> object:
+    # 與 pandas 讀入的行為接近：純整數的序號轉成 int，其餘保留原字串
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if _INT_REGEX.fullmatch(value):
+            return int(value)
+    return "" if value is None else value
+
+
+def _column_indexes(header: Sequence[object]) -> Tuple[int, int]:
+    names: List[str] = [str(h).strip() if h is not None else "" for h in header]
+    if any(col not in names for col in REQUIRED_COLUMNS):
+        raise ValueError("CSV 必須包含『序號』與『商品網址』欄位")
+    return names.index("序號"), names.index("商品網址")
+
+
+def _cell(row: Sequence[object], idx: int) -> Optional[object]:
+    return row[idx] if idx < len(row) else None
+
+
+def _iter_rows(rows: Iterator[Sequence[object]], seq_idx: int, url_idx: int) -> Iterator[InputRecord]:
+    for row in rows:
+        if not row or all(v in (None, "") for v in row):
+            continue
+        url = _cell(row, url_idx)
+        yield _coerce_seq(_cell(row, seq_idx)), ("" if url is None else str(url).strip())
+
+
+def _open_table(path: str) -> Tuple[Iterator[Sequence[object]], Callable[[], None]]:
+    # 回傳（逐列 iterator、關檔函式）；副檔名為 .xlsx / .xlsm 時讀取第一個工作表，其餘一律視為 UTF-8 CSV
+    if path.lower().endswith(XLSX_SUFFIXES):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        return wb.active.iter_rows(values_only=True), wb.close
+    fh = open(path, "r", encoding="utf-8-sig", newline="")
+    return csv.reader(fh), fh.close
+
+
+def open_input_records(path: str) -> Iterator[InputRecord]:
+    """
+    開啟查核清單並驗證表頭，回傳逐列產生 (序號, 商品網址) 的 iterator。
+    副檔名為 .xlsx / .xlsm 時讀取第一個工作表，其餘一律視為 UTF-8 CSV。
+    """
+    rows, close = _open_table(path)
+    try:
+        seq_idx, url_idx = _column_indexes(next(rows, ()))
+    except Exception:
+        close()
+        raise
+
+    def _gen() -> Iterator[InputRecord]:
+        try:
+            yield from _iter_rows(rows, seq_idx, url_idx)
+        finally:
+            close()
+
+    return _gen()
+
+
+def open_output_rows(path: str, required: Sequence[str] = ("網址/地址",)) -> Iterator[Dict[str, object]]:
+    """
+    開啟先前匯出的查核結果（export_to_excel 的 XLSX 或另存的 CSV），逐列產生以表頭欄名為鍵的 dict；
+    表頭缺少 required 欄位時立即丟出 ValueError。供再查核（recheck）讀回上一輪的輸出。
+    """
+    rows, close = _open_table(path)
+    try:
+        names = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        missing = [col for col in required if col not in names]
+        if missing:
+            raise ValueError("查核結果檔缺少欄位：" + "、".join(f"『{col}』" for col in missing))
+    except Exception:
+        close()
+        raise
+
+    def _gen() -> Iterator[Dict[str, object]]:
+        try:
+            for row in rows:
+                if not row or all(v in (None, "") for v in row):
+                    continue
+                yield {name: _cell(row, idx) for idx, name in enumerate(names) if name}
+        finally:
+            close()
+
+    return _gen()
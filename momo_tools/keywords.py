@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . k e y w o r d s
+ 標題關鍵字規則（同腳本的 parseRulesText / matchesTitleFilter，TXT：+包含、-排除、# 註解）：
+
+ - 規則與標題都先做 NFKC + casefold 正規化：全形英數與符號轉半形、大小寫不分（「ＡＢＣ」「abc」視為相同）
+ - 所有 + / - 關鍵字編成一個 Aho-Corasick 自動機，每個標題只掃描一次，比對成本與關鍵字數量無關
+   （腳本是對每個關鍵字各做一次 includes，規則檔有上千個關鍵字時每個標題要掃上千次）
+ - match 回傳命中的規則（含規則檔行號），可說明每個標題為何被收錄或排除；match_many 批次比對並共用相同標題的結果
+ - python -m momo_tools.keywords 規則.txt 檔案.xlsx|csv：對 harvest 的商品名稱 CSV 或查核輸出的「商品名稱」欄
+   批次比對，輸出加上「關鍵字判定」「命中規則」兩欄的活頁簿
+"""
+
+import argparse
+import itertools
+import os
+import unicodedata
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+INCLUDE = "+"
+EXCLUDE = "-"
+VERDICT_COLUMN = "關鍵字判定"
+RULE_COLUMN = "命中規則"
+
+
+def normalize_text(text: str) -> str:
+    """比對用的正規化：NFKC（全形轉半形）後 casefold（不分大小寫）。"""
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+class KeywordRule(NamedTuple):
+    kind: str  # INCLUDE / EXCLUDE
+    keyword: str  # 已正規化
+    line: int  # 規則檔行號（1 起算）
+
+    def describe(self) -> str:
+        return f"{self.kind}{self.keyword}（第 {self.line} 行）"
+
+
+class KeywordMatch(NamedTuple):
+    accepted: bool
+    include: Tuple[KeywordRule, ...] = ()
+    exclude: Tuple[KeywordRule, ...] = ()
+
+    def reason(self) -> str:
+        """命中規則的說明：排除時列出命中的 - 規則，收錄時列出命中的 + 規則。"""
+        if self.exclude:
+            return "、".join(rule.describe() for rule in self.exclude)
+        if not self.accepted:
+            return "未含任何包含(+)關鍵字"
+        return "、".join(rule.describe() for rule in self.include)
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 自動機：keywords 建成 trie 後以 BFS 補上失敗連結，輸出集合沿失敗連結合併，
+    find 掃描一次文字即可取得所有出現過的關鍵字索引。
+    """
+
+    def __init__(self, keywords: Sequence[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        outputs: List[Set[int]] = [set()]
+        for idx, keyword in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    outputs.append(set())
+                state = nxt
+            if state:
+                outputs[state].add(idx)
+
+        self._fail = [0] * len(self._goto)
+        # 根節點的子節點失敗連結皆為根，從下一層開始計算
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                outputs[nxt] |= outputs[self._fail[nxt]]
+        self._out: List[Tuple[int, ...]] = [tuple(sorted(out)) for out in outputs]
+
+    def find(self, text: str) -> Set[int]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+@dataclass
+class KeywordRules:
+    """標題關鍵字規則：有 + 規則時標題須命中其中之一，命中任一 - 規則即排除。"""
+
+    rules: List[KeywordRule] = field(default_factory=list)
+    _automaton: Optional[KeywordAutomaton] = field(default=None, init=False, repr=False, compare=False)
+    _has_include: bool = field(default=False, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_text(cls, text: str) -> "KeywordRules":
+        rules = cls()
+        for lineno, line in enumerate(text.splitlines(), 1):
+            # 先正規化，全形的「＋」「－」也視為規則前綴
+            line = normalize_text(line).strip()
+            if not line or line.startswith("#"):
+                continue
+            keyword = line[1:].strip()
+            if keyword and line[0] in (INCLUDE, EXCLUDE):
+                rules.rules.append(KeywordRule(line[0], keyword, lineno))
+        return rules
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordRules":
+        with open(path, "r", encoding="utf-8-sig") as fh:
+            return cls.from_text(fh.read())
+
+    @property
+    def include(self) -> List[str]:
+        return [rule.keyword for rule in self.rules if rule.kind == INCLUDE]
+
+    @property
+    def exclude(self) -> List[str]:
+        return [rule.keyword for rule in self.rules if rule.kind == EXCLUDE]
+
+    def compile(self) -> KeywordAutomaton:
+        """建立（或取回已建立的）自動機；之後修改 rules 需再呼叫 invalidate。"""
+        if self._automaton is None:
+            self._automaton = KeywordAutomaton([rule.keyword for rule in self.rules])
+            self._has_include = any(rule.kind == INCLUDE for rule in self.rules)
+        return self._automaton
+
+    def invalidate(self) -> None:
+        self._automaton = None
+
+    def match(self, title: str) -> KeywordMatch:
+        if not self.rules:
+            return KeywordMatch(True)
+        automaton = self.compile()
+        hits = [self.rules[idx] for idx in sorted(automaton.find(normalize_text(title)))]
+        include = tuple(rule for rule in hits if rule.kind == INCLUDE)
+        exclude = tuple(rule for rule in hits if rule.kind == EXCLUDE)
+        return KeywordMatch(bool(include or not self._has_include) and not exclude, include, exclude)
+
+    def matches(self, title: str) -> bool:
+        return self.match(title).accepted
+
+    def _cached_match(self, cache: Dict[str, KeywordMatch], title: str) -> KeywordMatch:
+        result = cache.get(title)
+        if result is None:
+            result = cache[title] = self.match(title)
+        return result
+
+    def match_many(self, titles: Iterable[str]) -> List[KeywordMatch]:
+        """批次比對；相同的標題（搜尋結果與查核輸出常見重複商品名稱）只比對一次。"""
+        cache: Dict[str, KeywordMatch] = {}
+        return [self._cached_match(cache, title or "") for title in titles]
+
+    def annotate_rows(
+        self, rows: Iterable[Dict[str, object]], column: str = "商品名稱", keep_all: bool = False
+    ) -> Iterator[Dict[str, object]]:
+        """逐列比對 column 欄，加上「關鍵字判定」「命中規則」；keep_all 為 False 時只輸出收錄的列。"""
+        cache: Dict[str, KeywordMatch] = {}
+        for row in rows:
+            result = self._cached_match(cache, str(row.get(column) or ""))
+            if not (result.accepted or keep_all):
+                continue
+            row = dict(row)
+            row[VERDICT_COLUMN] = "收錄" if result.accepted else "排除"
+            row[RULE_COLUMN] = result.reason()
+            yield row
+
+    def describe(self) -> str:
+        parts = []
+        if self.include:
+            parts.append("包含(+)：" + "、".join(self.include))
+        if self.exclude:
+            parts.append("排除(-)：" + "、".join(self.exclude))
+        return "；".join(parts) or "（無關鍵字規則）"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="momo_tools.keywords", description="以關鍵字規則批次篩選商品名稱（harvest 商品名稱 CSV 或查核輸出）"
+    )
+    parser.add_argument("rules", help="關鍵字規則檔（TXT：+包含、-排除）")
+    parser.add_argument("path", help="含商品名稱欄的 CSV / XLSX")
+    parser.add_argument("--column", default="商品名稱", help="要比對的欄位")
+    parser.add_argument("--output", default="", help="輸出活頁簿（預設為 輸入檔名_keywords.xlsx）")
+    parser.add_argument("--all", dest="keep_all", action="store_true", help="連同被排除的列一起輸出")
+    args = parser.parse_args(argv)
+
+    from .export import write_rows_xlsx
+    from .inputs import open_output_rows
+
+    rules = KeywordRules.from_file(args.rules)
+    print(f"📋 關鍵字規則 {len(rules.rules)} 條：+ {len(rules.include)}、- {len(rules.exclude)}")
+    rows = open_output_rows(args.path, required=(args.column,))
+    first = next(rows, None)
+    if first is None:
+        print(f"⚠️ {args.path} 沒有資料列")
+        return
+    columns = [name for name in first if name not in (VERDICT_COLUMN, RULE_COLUMN)] + [VERDICT_COLUMN, RULE_COLUMN]
+    stats: Counter = Counter()
+
+    def _selected(annotated: Iterable[Dict[str, object]]) -> Iterator[Dict[str, object]]:
+        for row in annotated:
+            stats[row[VERDICT_COLUMN]] += 1
+            if args.keep_all or row[VERDICT_COLUMN] == "收錄":
+                yield row
+
+    output = args.output or os.path.splitext(args.path)[0] + "_keywords.xlsx"
+    annotated = rules.annotate_rows(itertools.chain([first], rows), column=args.column, keep_all=True)
+    written = write_rows_xlsx(output, _selected(annotated), columns)
+    print(f"✅ 收錄 {stats['收錄']} 列、排除 {stats['排除']} 列；已輸出 {written} 列至 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . l e g a c y _ w o r d
+ v1/v2 的舊版流程（raw_text → Word 報告），預設不會在 cli 中呼叫；python-docx 只在產生報告時載入
+"""
+
+import re
+import time
+from typing import List
+
+from .common import extract_urls_from_text
+from .fetch import parse_momo_simple
+
+# 這裡保留空字串：v1 的範例資料如需使用，請自行填入。
+raw_text = ""
+
+
+def split_blocks(text: str) -> List[str]:
+    parts = re.split(r"(?=收文號：\d+)", text)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def extract_filename(text_block: str) -> str:
+    match = re.search(r"收文號：(\d+)", text_block)
+    return f"收文號{match.group(1)}-查核報告" if match else "查核報告"
+
+
+def legacy_word_report(text: str = "") -> str:  # pragma: no cover - 僅供需要時手動呼叫
+    try:
+        from docx import Document
+        from docx.shared import Cm, Pt, RGBColor
+    except Exception:  # Colab 環境缺少 docx 時給出明確訊息
+        raise ImportError("python-docx 未安裝，無法產生 Word 報告") from None
+    text = text or raw_text
+    if not text.strip():
+        raise ValueError("raw_text 為空，請填入原始內容後再執行")
+
+    doc = Document()
+    for sec in doc.sections:
+        sec.top_margin = Cm(1.27)
+        sec.bottom_margin = Cm(1.27)
+        sec.left_margin = Cm(1.85)
+        sec.right_margin = Cm(1.27)
+
+    blocks = split_blocks(text)
+    global_index = 1
+
+    for block in blocks:
+        lines = block.strip().split("\n")
+        urls = extract_urls_from_text(block)
+
+        results = []
+        for url in urls:
+            r = parse_momo_simple(url, rules="none")
+            r["編號"] = global_index
+            global_index += 1
+            results.append(r)
+            time.sleep(5)
+
+        for line in lines:
+            doc.add_paragraph(line.strip())
+            if line.strip().startswith("正本："):
+                for row in results:
+                    i, name, prod, url = row["編號"], row["商品名稱"], row["品號"], row["網址"]
+
+                    p1 = doc.add_paragraph()
+                    r1 = p1.add_run(f"{i}. {name}")
+                    r1.font.color.rgb = RGBColor(255, 0, 0)
+                    r1.font.size = Pt(12)
+
+                    p2 = doc.add_paragraph()
+                    r2 = p2.add_run("(查無商品檢驗標識)")
+                    r2.font.color.rgb = RGBColor(255, 0, 0)
+                    r2.font.size = Pt(12)
+
+                    doc.add_paragraph(f"品號: {prod}")
+                    doc.add_paragraph(f"網址: {url}")
+                    doc.add_paragraph()
+
+    fname = extract_filename(blocks[0]) + ".docx"
+    doc.save(fname)
+    print("✅ 已產出 Word 檔案：", fname)
+    return fname
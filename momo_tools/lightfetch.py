@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . l i g h t f e t c h
+ 輕量抓取路徑（cli --light）：先讀結構化資料，欄位不足時才交給 HTML 擷取器
+
+ - JSON API：config.PRODUCT_JSON_URL 有設定（含 {i_code}）時先抓這個小的 JSON 回應
+ - JSON-LD / meta：商品頁以 stream 模式分段讀取，每讀一段就用 regex 找 <script type="application/ld+json">
+   的 Product（name、sku / productID）、og:title 與 #osmPrdNo，不建 DOM；
+   每段只從上次掃到的位置接著找（_StreamScanner），已讀過的內容不重新掃描。
+   串流中商品名稱與品號須來自 og:title、#osmPrdNo 才算找到，JSON-LD 的 name / sku 只在讀完整頁後補缺
+ - 商檢字號一律依 v6 的 HTML 順位（Area504 → 規格條列 → Area302）判定，不採用 JSON-LD description 中的字號，
+   結果與一般查核相同。串流中已讀到完整的第一個 Area504 區塊且其中有字號時，該字號即為 v6 的結果
+   （之後的內容不會改變第一順位），此時名稱與品號也已找到就關閉連線，頁面後半段不再下載；
+   none 規則在名稱與品號找到後即可結束
+ - 欄位不足時才用已讀完的整頁 HTML 走 extractors.extract_product_fields，只補缺的欄位，不重新連線
+ - 使用的路徑記在 RowTrace.path（json-api、json-ld、json-ld+html、html），執行報告會統計
+ - 提前結束的頁面只讀了一部分，無法寫入頁面快取與原始頁面存檔：傳入 archive 時一律讀完整頁（不提前結束），
+   存檔與快取照常寫入
+"""
+
+import codecs
+import html
+import json
+import re
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+
+from . import config
+from .archive import PageArchive
+from .bsmi import BSMI_CODE_REGEX, code_after_keyword
+from .cache import PageCache
+from .extractors import bsmi_code_with_tier, extract_product_fields
+from .metrics import RowTrace
+from .pool import HostRateLimiter
+from .session import get_session, pop_connect_seconds
+
+Fields = Tuple[str, str, str]
+
+CHUNK_SIZE = 16 * 1024
+_LD_JSON_REGEX = re.compile(
+    r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL
+)
+_OG_TITLE_REGEX = re.compile(
+    r"<meta[^>]*property=[\"']og:title[\"'][^>]*content=[\"']([^\"']*)[\"']"
+    r"|<meta[^>]*content=[\"']([^\"']*)[\"'][^>]*property=[\"']og:title[\"']",
+    re.IGNORECASE,
+)
+_OSM_PRD_NO_REGEX = re.compile(r"id=[\"']osmPrdNo[\"'][^>]*>\s*([^<\s][^<]*?)\s*<", re.IGNORECASE)
+_LD_OPEN_REGEX = re.compile(r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>", re.IGNORECASE)
+_SCRIPT_CLOSE_REGEX = re.compile(r"</script>", re.IGNORECASE)
+_SCRIPT_CLOSE_LEN = len("</script>")
+_AREA504_REGEX = re.compile(r"class=[\"'][^\"']*\bArea504\b", re.IGNORECASE)
+_CODE_LEN = 6  # M/R/D/T + 5 碼
+# JSON API / JSON-LD 中可能的欄位名稱（依序嘗試）
+NAME_KEYS = ("name", "goodsName", "goods_name")
+PROD_NO_KEYS = ("sku", "productID", "goodsCode", "goods_code", "mpn")
+DESCRIPTION_KEYS = ("description", "goodsSpec", "spec")
+
+
+def _first_value(data: Dict[str, object], keys: Tuple[str, ...]) -> str:
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, (str, int)) and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+def _iter_products(data: object) -> Iterator[Dict[str, object]]:
+    # JSON-LD 可能是單一物件、陣列或 @graph；只取 @type 含 Product 的物件
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_products(item)
+    elif isinstance(data, dict):
+        kind = data.get("@type")
+        kinds = kind if isinstance(kind, list) else [kind]
+        if "Product" in kinds:
+            yield data
+        if "@graph" in data:
+            yield from _iter_products(data["@graph"])
+
+
+def _fields_from_product(data: Dict[str, object], with_code: bool) -> Fields:
+    name = html.unescape(_first_value(data, NAME_KEYS))
+    prod_no = _first_value(data, PROD_NO_KEYS)
+    code = code_after_keyword(html.unescape(_first_value(data, DESCRIPTION_KEYS))) if with_code else ""
+    return name, prod_no, code
+
+
+def _merge(found: Fields, more: Fields) -> Fields:
+    return tuple(a or b for a, b in zip(found, more))  # type: ignore[return-value]
+
+
+def structured_fields(page_html: str, with_code: bool = True) -> Fields:
+    """
+    只用 regex 從（可能不完整的）HTML 取出結構化欄位，回傳（商品名稱、品號、商檢字號），找不到的欄位為空字串。
+    商品名稱與品號以 og:title、#osmPrdNo 優先（與 HTML 擷取器相同），JSON-LD Product 補上缺的欄位與商檢字號。
+    """
+    m = _OG_TITLE_REGEX.search(page_html)
+    name = html.unescape(m.group(1) or m.group(2) or "").strip() if m else ""
+    m = _OSM_PRD_NO_REGEX.search(page_html)
+    found: Fields = (name, m.group(1).strip() if m else "", "")
+    for m in _LD_JSON_REGEX.finditer(page_html):
+        found = _merge(found, _ld_fields(m.group(1), with_code))
+    return found
+
+
+def _ld_fields(body: str, with_code: bool) -> Fields:
+    found: Fields = ("", "", "")
+    try:
+        data = json.loads(body.strip())
+    except ValueError:
+        return found
+    for product in _iter_products(data):
+        found = _merge(found, _fields_from_product(product, with_code))
+    return found
+
+
+class _StreamScanner:
+    """
+    串流讀取時的增量擷取：每段新內容只從上次的位置接著找，整頁累計的掃描量與頁面大小成正比。
+    - og:title、#osmPrdNo 在標籤內比對：沒找到時下次從最後一個「<」（可能尚未讀完的標籤）開始
+    - JSON-LD：找到開頭的 <script> 後只往後找 </script>，區塊完整才解析
+    - Area504：出現 class 含 Area504 的標籤、其後有字號且字號後已讀到下一個標籤時，才以 v6 順位解析一次前段頁面（area504_code）
+    fields() 的名稱與品號與對目前內容呼叫 structured_fields 相同，商檢字號為 area504_code 判定的結果。
+    """
+
+    def __init__(self, with_code: bool) -> None:
+        self.with_code = with_code
+        self.text = ""
+        self.name = ""
+        self.prod_no = ""
+        self.code = ""
+        self.ld: Fields = ("", "", "")
+        self._tag_pos = 0
+        self._ld_pos = 0
+        self._ld_body: Optional[int] = None
+        self._area504_found = False
+        self._area504_pos = 0
+        self._area504_checked = False
+
+    def feed(self, piece: str) -> None:
+        self.text += piece
+        text = self.text
+        if not (self.name and self.prod_no):
+            if not self.name:
+                m = _OG_TITLE_REGEX.search(text, self._tag_pos)
+                self.name = html.unescape(m.group(1) or m.group(2) or "").strip() if m else ""
+            if not self.prod_no:
+                m = _OSM_PRD_NO_REGEX.search(text, self._tag_pos)
+                self.prod_no = m.group(1).strip() if m else ""
+            self._tag_pos = max(self._tag_pos, text.rfind("<"))
+        while True:
+            if self._ld_body is None:
+                m = _LD_OPEN_REGEX.search(text, self._ld_pos)
+                if not m:
+                    self._ld_pos = max(self._ld_pos, text.rfind("<"))
+                    return
+                self._ld_body = self._ld_pos = m.end()
+            m = _SCRIPT_CLOSE_REGEX.search(text, self._ld_pos)
+            if not m:
+                # 結尾標籤可能被切在兩段之間：下次從倒數 len("</script>") - 1 個字元開始找
+                self._ld_pos = max(self._ld_body, len(text) - _SCRIPT_CLOSE_LEN + 1)
+                return
+            self.ld = _merge(self.ld, _ld_fields(text[self._ld_body : m.start()], self.with_code))
+            self._ld_body = None
+            self._ld_pos = m.end()
+
+    def area504_code(self) -> str:
+        """
+        前段頁面依 v6 順位在 Area504 命中時回傳該字號：第一個 Area504 區塊之前的內容已完整讀到，
+        之後的內容不會改變第一順位的結果。解析只在前段頁面看起來含有字號時進行，每頁最多一次；
+        結果不是 Area504 時（區塊尚未讀完、字號在其他順位）即不再嘗試，改為讀完整頁。
+        """
+        if self.code or self._area504_checked:
+            return self.code
+        text = self.text
+        if not self._area504_found:
+            m = _AREA504_REGEX.search(text, self._area504_pos)
+            if not m:
+                self._area504_pos = max(self._area504_pos, text.rfind("<"))
+                return ""
+            self._area504_found = True
+            self._area504_pos = m.end()
+        m = BSMI_CODE_REGEX.search(text, self._area504_pos)
+        cut = text.rfind("<")
+        if not m or cut < m.end():
+            # 字號可能還沒讀到或被切在兩段之間：下次從這段結尾前幾個字元接著找
+            self._area504_pos = max(self._area504_pos, len(text) - _CODE_LEN)
+            return ""
+        # 只解析到最後一個「<」之前：最後一段文字節點已完整，字號不會被截斷
+        self._area504_checked = True
+        code, tier = bsmi_code_with_tier(text[:cut])
+        if tier == "Area504":
+            self.code = code
+        return self.code
+
+    def fields(self) -> Fields:
+        return _merge((self.name, self.prod_no, self.code), self.ld)
+
+    def complete(self, rules: str) -> bool:
+        # 串流尚未結束：名稱與品號只認 og:title、#osmPrdNo（JSON-LD 的值可能被後面的這兩者取代）
+        if not (self.name and self.prod_no):
+            return False
+        return rules == "none" or (rules == "v6" and bool(self.area504_code()))
+
+
+def _complete(found: Fields, rules: str) -> bool:
+    if rules == "none":
+        return bool(found[0] and found[1])
+    return rules == "v6" and all(found)
+
+
+def _fill_from_html(
+    found: Fields, page_html: str, rules: str, trace: Optional[RowTrace], backend: Optional[str] = None
+) -> Fields:
+    # 結構化資料不足：以完整 HTML 擷取，只補缺的欄位
+    name, prod_no, code = extract_product_fields(page_html, rules=rules, backend=backend, trace=trace)
+    filled = (found[0] or name, found[1] or prod_no, found[2] or code)
+    if trace is not None:
+        trace.path = "json-ld+html" if any(found) else "html"
+    return filled
+
+
+def extract_from_page(
+    page_html: str, rules: str, trace: Optional[RowTrace] = None, backend: Optional[str] = None
+) -> Fields:
+    """
+    已有完整頁面時（快取、304、asyncio 模式）的輕量擷取：none 規則的結構化欄位齊全就不解析整頁；
+    v6 的商檢字號依 HTML 順位判定，一律交給 HTML 擷取器。
+    """
+    start = time.perf_counter()
+    found = structured_fields(page_html, with_code=False)
+    if _complete(found, rules):
+        if trace is not None:
+            trace.path = "json-ld"
+            trace.extract_ms = (time.perf_counter() - start) * 1000
+            trace.tier = ""
+        return found
+    return _fill_from_html(found, page_html, rules, trace, backend)
+
+
+def fetch_json_api(i_code: str, rate_limiter: Optional[HostRateLimiter] = None) -> Fields:
+    """config.PRODUCT_JSON_URL 有設定時，從 JSON API 取欄位；未設定或失敗時回傳空欄位。"""
+    if not config.PRODUCT_JSON_URL or not i_code:
+        return "", "", ""
+    url = config.PRODUCT_JSON_URL.format(i_code=i_code)
+    if rate_limiter is not None:
+        rate_limiter.acquire(url)
+    try:
+        res = get_session().get(url, headers={"User-Agent": "Mozilla/5.0", "Accept": "application/json"}, timeout=20)
+        res.raise_for_status()
+        data = res.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ 商品 JSON API 失敗，改讀商品頁：{e}")
+        return "", "", ""
+    products = list(_iter_products(data)) or ([data] if isinstance(data, dict) else [])
+    found: Fields = ("", "", "")
+    for product in products:
+        found = _merge(found, _fields_from_product(product, with_code=True))
+    return found
+
+
+def fetch_light(
+    m_url: str,
+    i_code: str,
+    headers: Dict[str, str],
+    rules: Optional[str] = None,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    trace: Optional[RowTrace] = None,
+    archive: Optional[PageArchive] = None,
+    cache_key: Optional[str] = None,
+) -> Fields:
+    """
+    fetch._download_page + extract_product_fields 的輕量版，回傳（商品名稱、品號、商檢字號）。
+    cache_key：快取與存檔的鍵（見 fetch.fetch_target），預設為 i_code。
+    網路錯誤照常拋出，由 parse_momo_simple 的重試迴圈處理。
+    """
+    rules = rules or config.BSMI_RULES
+    key = i_code if cache_key is None else cache_key
+    if config.PRODUCT_JSON_URL and rules in ("v6", "none"):
+        found = fetch_json_api(i_code, rate_limiter)
+        if rules == "none":
+            found = (found[0], found[1], "")
+        if _complete(found, rules):
+            if trace is not None:
+                trace.path = "json-api"
+                trace.tier = "JSON-API" if found[2] else ""
+            return found
+
+    entry = cache.lookup(key) if cache is not None and key else None
+    if entry is not None and entry.is_fresh():
+        cache.record("hit")
+        if trace is not None:
+            trace.cache = "hit"
+        return extract_from_page(entry.body, rules, trace)
+
+    request_headers = dict(headers)
+    if entry is not None:
+        request_headers.update(entry.conditional_headers())
+    if rate_limiter is not None:
+        rate_limiter.acquire(m_url)
+    pop_connect_seconds()
+    start = time.perf_counter()
+    with get_session().get(m_url, headers=request_headers, timeout=20, stream=True) as res:
+        if trace is not None:
+            connect = pop_connect_seconds()
+            elapsed = res.elapsed.total_seconds()
+            trace.status = res.status_code
+            trace.connect_ms += connect * 1000
+            trace.ttfb_ms = max(0.0, elapsed - connect) * 1000
+        if res.status_code == 304 and entry is not None:
+            cache.refresh(key)
+            cache.record("revalidated")
+            if trace is not None:
+                trace.cache = "revalidated"
+            if archive is not None:
+                archive.put(key, m_url, entry.body)
+            return extract_from_page(entry.body, rules, trace)
+        res.raise_for_status()
+
+        decoder = codecs.getincrementaldecoder(res.encoding or "utf-8")(errors="replace")
+        scanner = _StreamScanner(with_code=False)
+        # 有原始頁面存檔時讀完整頁：提前結束的頁面無法存檔
+        stop_early = archive is None
+        complete = False
+        extract_ms = 0.0
+        for chunk in res.iter_content(CHUNK_SIZE):
+            if trace is not None:
+                trace.bytes += len(chunk)
+            scan_start = time.perf_counter()
+            scanner.feed(decoder.decode(chunk))
+            complete = stop_early and scanner.complete(rules)
+            extract_ms += (time.perf_counter() - scan_start) * 1000
+            if complete:
+                break
+        if not complete:
+            scanner.feed(decoder.decode(b"", final=True))
+        etag = res.headers.get("ETag", "")
+        last_modified = res.headers.get("Last-Modified", "")
+    if trace is not None:
+        trace.download_ms = max(0.0, time.perf_counter() - start - res.elapsed.total_seconds()) * 1000
+
+    found = scanner.fields()
+    page_html = scanner.text
+    if not complete:
+        # 讀完整頁才寫入快取與存檔；提前結束的頁面只有前半段
+        if archive is not None:
+            archive.put(key, m_url, page_html)
+        if cache is not None and key:
+            cache.put(key, m_url, page_html, etag=etag, last_modified=last_modified)
+            cache.record("miss")
+            if trace is not None:
+                trace.cache = "miss"
+    # 讀完整頁時同 extract_from_page：JSON-LD 的 name / sku 補上缺的欄位後已齊全（v6 另須已在 Area504 找到字號），
+    # 也不解析整頁
+    if complete or _complete(found, rules):
+        if trace is not None:
+            trace.path = "json-ld"
+            trace.extract_ms = extract_ms
+            trace.tier = "Area504" if found[2] else ""
+        return found
+    return _fill_from_html(found, page_html, rules, trace)
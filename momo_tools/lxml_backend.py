@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . l x m l _ b a c k e n d
+ 以 lxml 解析 momo 商品頁的快速路徑（選用；未安裝 lxml 時 available() 回傳 False）：
+
+ - 所有定位條件（og:title、#osmPrdNo、品號 li、Area504/Area101/Area302）皆為模組載入時預先編譯的 XPath
+ - 商檢字號的規格條列與 Area302 順位共用 LxmlTextIndex：整頁文字走訪一次、關鍵字掃描一次，不再逐個候選節點重組文字
+ - 文字擷取規則比照 BeautifulSoup.get_text：略過 script/style/template/rt/rp 與註解
+ - 擷取邏輯與 extractors 的 html.parser 路徑（v6 規則）一致，輸出相同的（商品名稱、品號、商檢字號）
+"""
+
+import time
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
+
+from .bsmi import code_after_keyword
+from .textindex import SPEC_TAG_NAMES, TextSpanIndex
+from .tiers import PROD_NO_LABEL, PROD_NO_REGEX, PageContext, Tier, prod_no_near_label, run_tiers
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - 未安裝 lxml 時改用 html.parser 路徑
+    etree = None
+    lxml_html = None
+
+_SKIP_TAGS = ("script", "style", "template", "rt", "rp")
+_TEXT_FILTER = "not(" + " or ".join(f"ancestor::{tag}" for tag in _SKIP_TAGS) + ")"
+# 文字節點之後的文字：元素本身文字（.text）接子孫與其後的節點；tail 文字接所屬節點之後的節點。兩者第一筆皆為自己。
+# tail 所屬節點可能是註解（預先編譯的 XPath 只接受元素），而且只在品號值被切到下一個節點時才用到，因此不預先編譯
+_AFTER_TEXT = f"(descendant::text() | following::text())[{_TEXT_FILTER}]"
+_AFTER_TAIL = f"following::text()[{_TEXT_FILTER}]"
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    _PARSER = lxml_html.HTMLParser(encoding="utf-8")
+    _XP_TEXT = etree.XPath(f".//text()[{_TEXT_FILTER}]")
+    _XP_OG_TITLE = etree.XPath("//meta[@property='og:title']")
+    _XP_OSM_PRD_NO = etree.XPath("//*[@id='osmPrdNo']")
+    _XP_PROD_NO_LI = etree.XPath(f"//li[{_has_class('tvlogo')} or {_has_class('goods-code-container')}]")
+    _XP_META_KEYWORDS = etree.XPath("//meta[@name='keywords']")
+    _XP_PROD_NO_LABEL_TEXT = etree.XPath(f"//text()[contains(., '{PROD_NO_LABEL}')][{_TEXT_FILTER}]")
+    _XP_AREA504 = etree.XPath(f"//*[{_has_class('Area504')}]")
+    _XP_AREA302_IFRAMES = etree.XPath(f"//*[{_has_class('Area302')}]//iframe")
+
+
+def available() -> bool:
+    return etree is not None
+
+
+def _text(node, sep: str = "", strip: bool = False) -> str:
+    parts = [str(t) for t in _XP_TEXT(node)]
+    if strip:
+        parts = [t.strip() for t in parts]
+        parts = [t for t in parts if t]
+    return sep.join(parts)
+
+
+class LxmlTextIndex(TextSpanIndex):
+    """
+    textindex.SoupTextIndex 的 lxml 版：走訪一次樹，依 _XP_TEXT 的規則（略過 _SKIP_TAGS 內與註解本身的文字，
+    註解的 tail 照收）收集 strip 後的字串；text(node, sep) 等同 _text(node, sep, strip=True)。
+    """
+
+    def __init__(self, root) -> None:
+        super().__init__()
+        self._walk(root)
+        self._build()
+
+    def _walk(self, root) -> None:
+        # iterwalk 依文件順序送出 start / end（元素）與 comment / pi 事件；元素與註解的 tail 屬於父層，在 end 時收集。
+        # 只有規格條列候選與 Area302 會查範圍，只記錄這些元素（其他元素的 text 退回 _text）
+        strings = self.strings
+        starts: List[int] = []
+        tracked: List[bool] = []
+        skipped = 0  # 目前位於幾層 _SKIP_TAGS 之內
+        for event, node in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+            if event == "start":
+                starts.append(len(strings))
+                tag = node.tag
+                track = tag in SPEC_TAG_NAMES
+                if track:
+                    self.spec_tags.append(node)
+                classes = node.get("class")
+                if classes and "Area302" in classes.split():
+                    self.area302.append(node)
+                    track = True
+                tracked.append(track)
+                if tag in _SKIP_TAGS:
+                    skipped += 1
+                elif not skipped:
+                    text = node.text
+                    if text:
+                        text = text.strip()
+                        if text:
+                            strings.append(text)
+                continue
+            if event == "end":
+                if node.tag in _SKIP_TAGS:
+                    skipped -= 1
+                start = starts.pop()
+                if tracked.pop():
+                    self.spans[node] = (start, len(strings))
+            if not skipped and node is not root:
+                text = node.tail
+                if text:
+                    text = text.strip()
+                    if text:
+                        strings.append(text)
+
+    def text(self, node, separator: str = " ") -> str:
+        span = self.span_of(node)
+        if span is None:
+            return _text(node, separator, strip=True)
+        return self._span_text(span, separator)
+
+
+def _next_element(node):
+    sibling = node.getnext()
+    while sibling is not None and not isinstance(sibling.tag, str):
+        sibling = sibling.getnext()
+    return sibling
+
+
+def _first(nodes) -> Optional[object]:
+    return nodes[0] if nodes else None
+
+
+def _og_title_tier(page: PageContext) -> str:
+    name_tag = _first(_XP_OG_TITLE(page.root))
+    return name_tag.attrib["content"].strip() if name_tag is not None else ""
+
+
+def _osm_prd_no_tier(page: PageContext) -> str:
+    tag = _first(_XP_OSM_PRD_NO(page.root))
+    return _text(tag).strip() if tag is not None else ""
+
+
+def _goods_code_li_tier(page: PageContext) -> str:
+    for tag in _XP_PROD_NO_LI(page.root):
+        tag_text = _text(tag)
+        if "品號：" in tag_text:
+            return tag_text.split("品號：")[-1].strip()
+    return ""
+
+
+def _meta_keywords_tier(page: PageContext) -> str:
+    meta_code = _first(_XP_META_KEYWORDS(page.root))
+    if meta_code is not None and "品號：" in meta_code.get("content", ""):
+        return meta_code.attrib["content"].split("品號：")[-1].split(",")[0].strip()
+    return ""
+
+
+def _following_texts(text) -> Iterator[str]:
+    after = text.getparent().xpath(_AFTER_TAIL if text.is_tail else _AFTER_TEXT)
+    return (str(t) for t in after[1:])
+
+
+def _label_region_tier(page: PageContext) -> str:
+    return prod_no_near_label(
+        (str(text), partial(_following_texts, text)) for text in _XP_PROD_NO_LABEL_TEXT(page.root)
+    )
+
+
+def _full_text_tier(page: PageContext) -> str:
+    match = PROD_NO_REGEX.search(page.text)
+    return match.group(1).strip() if match else ""
+
+
+NAME_TIERS: List[Tier] = [Tier("og:title", _og_title_tier)]
+PROD_NO_TIERS: List[Tier] = [
+    Tier("osmPrdNo", _osm_prd_no_tier),
+    Tier("goods-code-li", _goods_code_li_tier),
+    Tier("meta-keywords", _meta_keywords_tier),
+    Tier("label-region", _label_region_tier),
+    Tier("full-text", _full_text_tier),
+]
+
+
+def parse_bsmi(root) -> Tuple[str, str]:
+    """回傳（商檢字號、命中順位）；命中順位為 "Area504"、"spec"、"Area302" 或空字串。"""
+    # 第一順位：Area504 商品認證區（區塊少、通常直接命中，不必先建索引）
+    for block in _XP_AREA504(root):
+        code = code_after_keyword(_text(block, " ", strip=True))
+        if code:
+            return code, "Area504"
+
+    # 第二、三順位共用一次走訪建立的文字索引
+    index = LxmlTextIndex(root)
+
+    # 第二順位：規格條列區塊（含商檢關鍵字的行）
+    for node in index.spec_candidates():
+        code = code_after_keyword(index.text(node))
+        if code:
+            return code, "spec"
+        sibling = _next_element(node)
+        if sibling is not None:
+            code = code_after_keyword(index.text(sibling))
+            if code:
+                return code, "spec"
+
+    # 第三順位：詳情 tab 內容（iframe 內容由 fetch 另外抓取，見 extractors.area302_iframe_sources）
+    for block in index.area302:
+        code = code_after_keyword(index.text(block))
+        if code:
+            return code, "Area302"
+
+    return "", ""
+
+
+def _parse(page_html: str):
+    return lxml_html.document_fromstring(page_html.encode("utf-8"), parser=_PARSER)
+
+
+def area302_iframe_sources(page_html: str) -> List[str]:
+    """Area302 中 iframe 的 src / data-src（原始值、依文件順序），供 extractors.area302_iframe_sources 使用。"""
+    try:
+        root = _parse(page_html)
+    except etree.ParserError:
+        return []
+    return [
+        iframe.get(attr) for iframe in _XP_AREA302_IFRAMES(root) for attr in ("src", "data-src") if iframe.get(attr)
+    ]
+
+
+def page_bsmi(page_html: str) -> Tuple[str, str]:
+    """整份（或前段）頁面依 v6 順位的（商檢字號、命中順位），不擷取商品名稱與品號。"""
+    try:
+        root = _parse(page_html)
+    except etree.ParserError:
+        return "", ""
+    return parse_bsmi(root)
+
+
+def document_bsmi_code(page_html: str) -> str:
+    """整份文件全文中，商檢關鍵字之後的第一組合理字號。"""
+    try:
+        root = _parse(page_html)
+    except etree.ParserError:
+        return ""
+    return code_after_keyword(_text(root, " ", strip=True))
+
+
+def extract_fields(page_html: str, trace=None) -> Tuple[str, str, str]:
+    """
+    回傳（商品名稱、品號、商檢字號），規則同 extractors 的 html.parser 路徑（v6 規則）。
+    trace（metrics.RowTrace）不為 None 時一併記錄解析/擷取耗時與命中順位。
+    """
+    start = time.perf_counter()
+    try:
+        root = _parse(page_html)
+    except etree.ParserError:
+        return "未取得", "未取得", ""
+    parsed = time.perf_counter()
+
+    page = PageContext(root, _text)
+    name, _ = run_tiers("商品名稱", NAME_TIERS, page, trace)
+    prod_no, _ = run_tiers("品號", PROD_NO_TIERS, page, trace)
+    name, prod_no = name or "未取得", prod_no or "未取得"
+
+    zhigui_value, tier = parse_bsmi(root)
+    if trace is not None:
+        trace.parse_ms = (parsed - start) * 1000
+        trace.extract_ms = (time.perf_counter() - parsed) * 1000
+        trace.tier = tier
+    return name, prod_no, zhigui_value
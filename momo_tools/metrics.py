@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . m e t r i c s
+ 逐列效能紀錄與執行報告：
+
+ - RowTrace：單列的連線（DNS+TCP+TLS，重用連線時為 0）、TTFB、下載時間與位元組數、
+   HTML 解析時間、欄位擷取時間、命中的商檢字號順位（Area504 / spec / Area302）與快取結果，
+   以及商品名稱 / 品號各擷取 tier（tiers 模組）的嘗試結果與耗時
+ - RunMetrics：把每列紀錄寫成 JSONL trace，結束時輸出 p50/p95/p99 延遲與吞吐量摘要，
+   用來判斷瓶頸在網路還是 _parse_bsmi_from_soup；各欄位 tier 的命中率與平均耗時用來判斷哪些 tier 值得保留
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .checkpoint import json_default
+
+
+@dataclass
+class RowTrace:
+    seq: object = ""
+    url: str = ""
+    attempts: int = 0
+    status: Optional[int] = None
+    cache: str = ""
+    path: str = ""  # 輕量抓取路徑（lightfetch）：json-api、json-ld、json-ld+html、html
+    connect_ms: float = 0.0
+    ttfb_ms: float = 0.0
+    download_ms: float = 0.0
+    bytes: int = 0
+    parse_ms: float = 0.0
+    extract_ms: float = 0.0
+    tier: str = ""
+    total_ms: float = 0.0
+    error: str = ""
+    # （欄位、tier、是否命中、耗時 ms），依嘗試順序
+    field_tiers: List[Tuple[str, str, bool, float]] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def finish(self) -> None:
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> Dict[str, object]:
+        data = asdict(self)
+        data.pop("started", None)
+        return data
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """nearest-rank 百分位數；values 為空時回傳 0。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RunMetrics:
+    def __init__(self, trace_path: str = "", append: bool = False) -> None:
+        self.trace_path = trace_path
+        self.started = time.perf_counter()
+        self.total_ms: List[float] = []
+        self.network_ms: List[float] = []
+        self.cpu_ms: List[float] = []
+        self.bytes = 0
+        self.tiers: Counter = Counter()
+        self.cache: Counter = Counter()
+        self.paths: Counter = Counter()
+        # （欄位、tier）→ [嘗試次數、命中次數、累計耗時 ms]
+        self.field_tiers: Dict[Tuple[str, str], List[float]] = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        # append：續跑（--resume）時接在中斷那一輪的 trace 後面寫，不覆蓋已記錄的列
+        self._fh = open(trace_path, "a" if append else "w", encoding="utf-8") if trace_path else None
+
+    def record(self, trace: RowTrace) -> None:
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=json_default) if self._fh else ""
+        with self._lock:
+            self.total_ms.append(trace.total_ms)
+            self.network_ms.append(trace.connect_ms + trace.ttfb_ms + trace.download_ms)
+            self.cpu_ms.append(trace.parse_ms + trace.extract_ms)
+            self.bytes += trace.bytes
+            self.tiers[trace.tier or "未命中"] += 1
+            if trace.cache:
+                self.cache[trace.cache] += 1
+            if trace.path:
+                self.paths[trace.path] += 1
+            for name, tier, hit, ms in trace.field_tiers:
+                stats = self.field_tiers.setdefault((name, tier), [0, 0, 0.0])
+                stats[0] += 1
+                stats[1] += hit
+                stats[2] += ms
+            if trace.error:
+                self.errors += 1
+            if self._fh is not None:
+                self._fh.write(line + "\n")
+
+    def summary(self) -> str:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            rows = len(self.total_ms)
+            lines = [
+                f"📊 共 {rows} 列，耗時 {elapsed:.1f} 秒，吞吐量 {rows / elapsed if elapsed > 0 else 0:.2f} 列/秒，"
+                f"下載 {self.bytes / 1024 / 1024:.1f} MB，失敗 {self.errors} 列",
+            ]
+            for label, values in (("單列總延遲", self.total_ms), ("網路", self.network_ms), ("解析+擷取", self.cpu_ms)):
+                lines.append(
+                    f"   {label}：p50 {percentile(values, 50):.0f} ms / p95 {percentile(values, 95):.0f} ms"
+                    f" / p99 {percentile(values, 99):.0f} ms"
+                )
+            lines.append("   商檢字號命中順位：" + "、".join(f"{k} {v}" for k, v in self.tiers.most_common()))
+            if self.cache:
+                lines.append("   頁面快取：" + "、".join(f"{k} {v}" for k, v in self.cache.most_common()))
+            if self.paths:
+                lines.append("   擷取路徑：" + "、".join(f"{k} {v}" for k, v in self.paths.most_common()))
+            by_field: Dict[str, List[str]] = {}
+            for (name, tier), (tries, hits, ms) in self.field_tiers.items():
+                by_field.setdefault(name, []).append(f"{tier} {hits}/{tries} 命中 {ms / tries:.2f} ms")
+            for name, parts in by_field.items():
+                lines.append(f"   {name} tier（命中/嘗試、平均耗時）：" + "、".join(parts))
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
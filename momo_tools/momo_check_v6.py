@@ -11,301 +11,39 @@
    3) 「詳情」tab 內含商檢關鍵字的內容（iframe 目前留待未來擴充）
  - 收緊商檢字號格式（首碼 MRDT，後 5 碼英數，單字邊界）
  - 移除整頁全文 fallback，避免誤判
+ - 批次抓取改為並行（執行緒池，保持 MAX_WORKERS 個請求在途），
+   以每主機 token bucket 限速取代每列固定 sleep，輸出仍依原始「序號」順序
+ - 所有請求走共用的 keep-alive Session 連線池（session），不再每次重新握手
+ - 商品頁以 i_code 存入本機快取（cache），未過期直接使用、過期則以 ETag/Last-Modified 重新驗證
+ - 每完成一列即寫入檢查點日誌（checkpoint），中斷後以 --resume 續跑並合併進最終活頁簿
+ - 查核清單改為串流讀取（inputs，CSV / XLSX），只驗證表頭，邊讀邊送進抓取流程
+ - 匯出改用 openpyxl write-only 模式（export），欄寬與換行先設為欄格式，抓完一列寫一列
+ - 重試改為共用策略（retry）：指數退避 + jitter、遵守 Retry-After、429/5xx 也會重試、整輪重試額度，
+   momo 開始限流時由熔斷器暫停整個 worker 池
+ - 逐列記錄連線、TTFB、下載、解析與擷取耗時及商檢字號命中順位（metrics），
+   輸出 JSONL trace 與 p50/p95/p99 延遲、吞吐量摘要
+ - 可選用 lxml 解析後端（lxml_backend），以預先編譯的 XPath 擷取 Area504/Area101/Area302，結果與 html.parser 相同
+
+ 已合併進 momo_tools 套件，本檔僅保留為相容入口：等同 python -m momo_tools --rules v6
 """
 
-import datetime
-import html
-import re
-import time
-from typing import Dict, List
-from urllib.parse import parse_qs, urlparse
+import os
+import sys
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from openpyxl.styles import Alignment
-from openpyxl.utils import get_column_letter
+if not __package__:
+    # 直接以 python momo_tools/momo_check_v6.py 執行時，讓上一層目錄可以 import momo_tools
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-MRDT_REGEX = re.compile(r"(?<![A-Za-z0-9])[MRDT][A-Za-z0-9]{5}(?![A-Za-z0-9])", re.IGNORECASE)
+import momo_tools
 
 
-def _find_bsmi_code(text: str) -> str:
-    """
-    從文字中找出第一組「合理的」商檢字號：
-    - 基本格式：M/R/D/T + 5 碼英數字（單字邊界）
-    - 後 5 碼需同時符合：至少 1 碼數字、至多 1 碼英文字
-    - 前一個字元若是 '#'(例如 #D62872 搜尋用 tag) 則略過
-    """
-    if not text:
-        return ""
-
-    for m in MRDT_REGEX.finditer(text):
-        start = m.start()
-        code = m.group(0).upper()
-
-        if start > 0 and text[start - 1] == "#":
-            continue
-
-        tail = code[1:]
-        digits = sum(ch.isdigit() for ch in tail)
-        letters = sum(ch.isalpha() for ch in tail)
-        if digits == 0 or letters > 1:
-            continue
-
-        return code
-
-    return ""
-
-
-def _extract_i_code(url: str) -> str:
-    try:
-        parsed = urlparse(url)
-        qs = parse_qs(parsed.query)
-        if "i_code" in qs and qs["i_code"]:
-            return qs["i_code"][0]
-    except Exception:
-        pass
-    return ""
-
-
-def _parse_bsmi_from_soup(soup: BeautifulSoup) -> str:
-    keywords = [
-        "商檢字號",
-        "BSMI認證字號",
-        "BSMI認證",
-        "認證字號",
-        "商品檢驗標識",
-        "商品檢驗標示",
-        "商品認證",
-    ]
-
-    def _contains_keyword(text: str) -> int:
-        text = text or ""
-        positions = [text.find(k) for k in keywords if k in text]
-        return min(positions) if positions else -1
-
-    # 第一順位：Area504 商品認證區
-    area504_list = soup.find_all(lambda tag: tag.has_attr("class") and "Area504" in tag.get("class", []))
-    for block in area504_list:
-        text = block.get_text(" ", strip=True)
-        pos = _contains_keyword(text)
-        if pos != -1:
-            sliced = text[pos:]
-            code = _find_bsmi_code(sliced)
-            if code:
-                return code
-
-    # 第二順位：規格條列區塊（含商檢關鍵字的行）
-    spec_candidates = soup.find_all(
-        lambda tag: tag.name in ("div", "span", "li", "p", "td", "th")
-        and any(k in tag.get_text(strip=True) for k in keywords)
-    )
-    for node in spec_candidates:
-        text = node.get_text(" ", strip=True)
-        pos = _contains_keyword(text)
-        if pos != -1:
-            sliced = text[pos:]
-            code = _find_bsmi_code(sliced)
-            if code:
-                return code
-        sibling = node.find_next_sibling()
-        if sibling is not None:
-            s_text = sibling.get_text(" ", strip=True)
-            pos2 = _contains_keyword(s_text)
-            if pos2 != -1:
-                sliced2 = s_text[pos2:]
-                code = _find_bsmi_code(sliced2)
-                if code:
-                    return code
-
-    # 第三順位：詳情 tab 內容（含商檢關鍵字才處理；iframe 留待未來擴充）
-    detail_blocks = soup.find_all(lambda tag: tag.has_attr("class") and "Area302" in tag.get("class", []))
-    for block in detail_blocks:
-        text = block.get_text(" ", strip=True)
-        pos = _contains_keyword(text)
-        if pos != -1:
-            sliced = text[pos:]
-            code = _find_bsmi_code(sliced)
-            if code:
-                return code
-        # TODO: 若未來需要，可在此解析 iframe 內容後再用同樣邏輯搜尋
-
-    return ""
-
-
-# ➤ 對 MOMO 商品進行 retry + timeout 的簡易爬蟲（專抓手機版）
-def parse_momo_simple(url: str, max_retries: int = 5) -> Dict[str, str]:
-    headers = {"User-Agent": "Mozilla/5.0"}
-    name = "未取得"
-    prod_no = "未取得"
-    zhigui_value = ""
-
-    i_code = _extract_i_code(url)
-    m_url = f"https://m.momoshop.com.tw/goods.momo?i_code={i_code}" if i_code else url
-
-    for attempt in range(1, max_retries + 1):
-        try:
-            res = requests.get(m_url, headers=headers, timeout=20)
-            res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            name_tag = soup.select_one("meta[property='og:title']")
-            name = name_tag["content"].strip() if name_tag else "未取得"
-
-            prod_no = None
-            tag = soup.select_one("#osmPrdNo")
-            if tag:
-                prod_no = tag.text.strip()
-            if not prod_no:
-                li_tags = soup.select("li.tvlogo, li.goods-code-container")
-                for tag in li_tags:
-                    if "品號：" in tag.text:
-                        prod_no = tag.text.split("品號：")[-1].strip()
-                        break
-            if not prod_no:
-                meta_code = soup.select_one("meta[name='keywords']")
-                if meta_code and "品號：" in meta_code.get("content", ""):
-                    prod_no = meta_code["content"].split("品號：")[-1].split(",")[0].strip()
-            if not prod_no:
-                match = re.search(r"品號[:： ]?\s*(\w+)", soup.get_text())
-                prod_no = match.group(1).strip() if match else "未取得"
-
-            zhigui_value = _parse_bsmi_from_soup(soup)
-            break
-
-        except (requests.Timeout, requests.ConnectionError) as e:
-            print(f"❌ (Mobile) 第 {attempt} 次失敗：{e}")
-            if attempt < max_retries:
-                time.sleep(3)
-            else:
-                pass
-        except Exception as e:
-            print(f"❌ (Mobile) 發生例外：{e}")
-            break
-
-    return {"商品名稱": name, "品號": prod_no, "商檢字號": zhigui_value, "網址": url}
-
-
-# ➤ 擷取網址並處理 &amp; 解碼（保留以防後續擴充使用）
-def extract_urls_from_text(text: str) -> List[str]:
-    clean = html.unescape(html.unescape(text))
-    urls = re.findall(r"https?://[^\s\]]+", clean)
-    return list(dict.fromkeys(urls))
-
-
-def to_roc_date(date_obj: datetime.date) -> str:
-    roc_year = date_obj.year - 1911
-    return f"{roc_year}/{date_obj.month}/{date_obj.day}"
-
-
-def fetch_momo_product(url: str) -> Dict[str, str]:
-    return parse_momo_simple(url, max_retries=5)
-
-
-def load_input_csv() -> pd.DataFrame:
-    try:
-        from google.colab import files  # type: ignore
-
-        uploaded = files.upload()
-        if not uploaded:
-            raise FileNotFoundError("No file uploaded.")
-        filename = next(iter(uploaded))
-    except Exception:
-        filename = input("請輸入 CSV 檔名：").strip()
-    df = pd.read_csv(filename)
-    if "序號" not in df.columns or "商品網址" not in df.columns:
-        raise ValueError("CSV 必須包含『序號』與『商品網址』欄位")
-    return df
-
-
-def build_output_rows(df: pd.DataFrame, roc_date: str) -> pd.DataFrame:
-    rows: List[Dict[str, str]] = []
-    for _, row in df.iterrows():
-        url = str(row.get("商品網址", "")).strip()
-        product_info = fetch_momo_product(url) if url else {}
-
-        name = product_info.get("商品名稱", "") if isinstance(product_info, dict) else ""
-        prod_no = product_info.get("品號", "") if isinstance(product_info, dict) else ""
-        zhigui = product_info.get("商檢字號", "") if isinstance(product_info, dict) else ""
-        error_msg = ""
-        if not name or name.startswith("錯誤："):
-            error_msg = name.replace("錯誤：", "").strip() if name else "抓取失敗"
-            name = ""
-
-        rows.append(
-            {
-                "編號": row.get("序號", ""),
-                "檢查案號": "",
-                "查核日期": roc_date,
-                "網路名稱/店家名稱": "momo購物網",
-                "賣家帳號或拍賣代碼": prod_no,
-                "商品名稱": name,
-                "再查核日期": "",
-                "是否下架": "",
-                "是否改正": "",
-                "調查結果": error_msg,
-                "網址/地址": url,
-                "商檢標識": zhigui,
-                "已宣導": "",
-                "已下架": "",
-            }
-        )
-        time.sleep(5)
-    columns = [
-        "編號",
-        "檢查案號",
-        "查核日期",
-        "網路名稱/店家名稱",
-        "賣家帳號或拍賣代碼",
-        "商品名稱",
-        "再查核日期",
-        "是否下架",
-        "是否改正",
-        "調查結果",
-        "網址/地址",
-        "商檢標識",
-        "已宣導",
-        "已下架",
-    ]
-    return pd.DataFrame(rows, columns=columns)
-
-
-def export_to_excel(df: pd.DataFrame, roc_date: str) -> str:
-    filename = f"momo_check_output_ROC{roc_date.replace('/', '')}.xlsx"
-    with pd.ExcelWriter(filename, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False)
-    from openpyxl import load_workbook
-
-    wb = load_workbook(filename)
-    ws = wb.active
-
-    column_widths = [6, 15, 12, 16, 18, 30, 12, 10, 10, 30, 40, 14, 10, 10]
-    for idx, width in enumerate(column_widths, start=1):
-        col_letter = get_column_letter(idx)
-        ws.column_dimensions[col_letter].width = width
-
-    wrap_columns = {6, 10, 11}  # 商品名稱、調查結果、網址/地址
-    for row in ws.iter_rows(min_row=1, max_col=ws.max_column, max_row=ws.max_row):
-        for cell in row:
-            if cell.col_idx in wrap_columns:
-                cell.alignment = Alignment(wrap_text=True)
-
-    wb.save(filename)
-
-    try:
-        from google.colab import files  # type: ignore
-
-        files.download(filename)
-    except Exception:
-        print(f"已匯出檔案：{filename}")
-    return filename
+def __getattr__(name):
+    # 舊的 from momo_check_v6 import parse_momo_simple 等寫法改由 momo_tools 提供，接受 rules 的函式預設為 rules="v6"
+    return momo_tools.legacy_export(name, "v6")
 
 
 def main():
-    df_in = load_input_csv()
-    roc_date = to_roc_date(datetime.date.today())
-    df_out = build_output_rows(df_in, roc_date)
-    export_to_excel(df_out, roc_date)
+    momo_tools.main(["--rules", "v6"] + sys.argv[1:])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . p i p e l i n e
+ 查核清單讀取 → 並行抓取 → 組成輸出列 → 匯出 Excel
+
+ pandas / openpyxl 只在對應階段執行時才載入：串流讀入（inputs）與 write-only 匯出（export）
+ 全程不需要 pandas，只有傳入或要求回傳 DataFrame 時才會 import。
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from . import config
+from .archive import PageArchive
+from .cache import PageCache
+from .checkpoint import CheckpointJournal, checkpoint_key
+from .common import canonicalize_momo_url
+from .fetch import fetch_momo_product
+from .inputs import InputRecord, open_input_records
+from .metrics import RowTrace, RunMetrics
+from .pool import HostRateLimiter, imap_ordered
+from .retry import CircuitBreaker, RetryBudget, RetryPolicy
+
+OUTPUT_COLUMNS = [
+    "編號",
+    "檢查案號",
+    "查核日期",
+    "網路名稱/店家名稱",
+    "賣家帳號或拍賣代碼",
+    "商品名稱",
+    "再查核日期",
+    "是否下架",
+    "是否改正",
+    "調查結果",
+    "網址/地址",
+    "商檢標識",
+    "已宣導",
+    "已下架",
+]
+COLUMN_WIDTHS = [6, 15, 12, 16, 18, 30, 12, 10, 10, 30, 40, 14, 10, 10]
+WRAP_COLUMNS = {6, 10, 11}  # 商品名稱、調查結果、網址/地址
+
+
+def _is_dataframe(obj: object) -> bool:
+    # 以 duck typing 判斷，避免只為了 isinstance 就載入 pandas
+    return hasattr(obj, "itertuples") and hasattr(obj, "columns")
+
+
+def _choose_input_file() -> str:
+    try:
+        from google.colab import files  # type: ignore
+
+        uploaded = files.upload()
+        if not uploaded:
+            raise FileNotFoundError("No file uploaded.")
+        return next(iter(uploaded))
+    except Exception:
+        return input("請輸入 CSV 檔名：").strip()
+
+
+def load_input_csv(path: Optional[str] = None):
+    """一次讀入整份 CSV 為 DataFrame（會載入 pandas）；大量資料請改用 load_input_records。"""
+    import pandas as pd
+
+    df = pd.read_csv(path or _choose_input_file())
+    if "序號" not in df.columns or "商品網址" not in df.columns:
+        raise ValueError("CSV 必須包含『序號』與『商品網址』欄位")
+    return df
+
+
+def load_input_records(path: Optional[str] = None) -> Iterator[InputRecord]:
+    """串流版的 load_input_csv：只驗證表頭，之後逐列產生 (序號, 商品網址)，支援 CSV / XLSX。"""
+    return open_input_records(path or _choose_input_file())
+
+
+def _dataframe_records(df) -> Iterator[InputRecord]:
+    for seq, url in df[["序號", "商品網址"]].itertuples(index=False, name=None):
+        yield seq, str(url).strip()
+
+
+def _build_output_row(seq: object, url: str, product_info: Dict[str, str], roc_date: str) -> Dict[str, object]:
+    name = product_info.get("商品名稱", "") if isinstance(product_info, dict) else ""
+    prod_no = product_info.get("品號", "") if isinstance(product_info, dict) else ""
+    zhigui = product_info.get("商檢字號", "") if isinstance(product_info, dict) else ""
+    error_msg = ""
+    if not name or name.startswith("錯誤："):
+        error_msg = name.replace("錯誤：", "").strip() if name else "抓取失敗"
+        name = ""
+    elif name == "未取得":
+        error_msg = "抓取失敗：未取得商品名稱"
+        name = ""
+
+    return {
+        "編號": seq,
+        "檢查案號": "",
+        "查核日期": roc_date,
+        "網路名稱/店家名稱": "momo購物網",
+        "賣家帳號或拍賣代碼": prod_no,
+        "商品名稱": name,
+        "再查核日期": "",
+        "是否下架": "",
+        "是否改正": "",
+        "調查結果": error_msg,
+        "網址/地址": url,
+        "商檢標識": zhigui,
+        "已宣導": "",
+        "已下架": "",
+    }
+
+
+def is_failed_row(row: Dict[str, object]) -> bool:
+    """
+    抓取失敗的輸出列（調查結果有錯誤訊息；舊版檢查點日誌中則是商品名稱為「未取得」）：
+    不寫入檢查點，續跑時也不視為已完成，會重新抓取。
+    """
+    return bool(row.get("調查結果")) or row.get("商品名稱") in ("", None, "未取得")
+
+
+def resumable_rows(completed: Optional[Dict[str, Dict[str, object]]]) -> Dict[str, Dict[str, object]]:
+    """檢查點日誌讀回的列中，可以直接沿用的部分（去掉 is_failed_row 的列）。"""
+    return {key: row for key, row in (completed or {}).items() if not is_failed_row(row)}
+
+
+def make_retry_policy(policy_cls: Type[RetryPolicy] = RetryPolicy) -> RetryPolicy:
+    # 整輪共用一個重試策略：重試額度與熔斷器由所有 worker 共享
+    return policy_cls(
+        base_delay=config.RETRY_BASE_DELAY,
+        max_delay=config.RETRY_MAX_DELAY,
+        budget=RetryBudget(config.RETRY_BUDGET),
+        breaker=CircuitBreaker(failure_threshold=config.BREAKER_THRESHOLD, cooldown=config.BREAKER_COOLDOWN),
+    )
+
+
+class RecentResults:
+    """最近完成的抓取結果（LRU，最多 size 筆；不含鎖，由呼叫端保護）。"""
+
+    def __init__(self, size: int = config.DEDUPE_RECENT) -> None:
+        self.size = size
+        self._items: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        info = self._items.get(key)
+        if info is not None:
+            self._items.move_to_end(key)
+        return info
+
+    def put(self, key: str, info: Dict[str, str]) -> None:
+        if self.size <= 0:
+            return
+        self._items[key] = info
+        self._items.move_to_end(key)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+
+class SharedFetches:
+    """
+    同一商品（canonicalize_momo_url 相同）在一輪中只抓一次：第一個遇到的列負責抓取，
+    其餘列等待並沿用同一份結果。imap_ordered 依輸入順序送出工作，負責抓取的列一定比等待它的列先開始。
+    抓取中的商品以參考計數保留，最後一個列取走結果後即移出，成功的結果改存進 RecentResults，
+    因此記憶體只與同時在途的列數及 config.DEDUPE_RECENT 有關；太久之後才出現的重複網址會重新抓取。
+    """
+
+    def __init__(self, recent: int = config.DEDUPE_RECENT) -> None:
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List] = {}  # 鍵 → [Future, 尚未取走結果的列數]
+        self._recent = RecentResults(recent)
+
+    def get(self, key: str, fetch: Callable[[], Dict[str, str]]) -> Tuple[Dict[str, str], bool]:
+        """回傳（結果、是否由本次呼叫實際抓取）。"""
+        with self._lock:
+            info = self._recent.get(key)
+            if info is not None:
+                self.duplicates += 1
+                return info, False
+            entry = self._pending.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._pending[key] = [Future(), 0]
+            else:
+                self.duplicates += 1
+            entry[1] += 1
+        future = entry[0]
+        try:
+            if owner:
+                try:
+                    future.set_result(fetch())
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+            return future.result(), owner
+        finally:
+            self._release(key, entry)
+
+    def _release(self, key: str, entry: List) -> None:
+        with self._lock:
+            entry[1] -= 1
+            if entry[1]:
+                return
+            del self._pending[key]
+            if entry[0].exception() is None:
+                self._recent.put(key, entry[0].result())
+
+    def summary(self) -> str:
+        return f"🔁 重複的商品網址 {self.duplicates} 列，沿用同一次抓取結果"
+
+
+def iter_output_rows(
+    records: Iterable[InputRecord],
+    roc_date: str,
+    max_workers: int = config.MAX_WORKERS,
+    rate_per_host: float = config.RATE_PER_HOST,
+    burst: int = config.RATE_BURST,
+    cache: Optional[PageCache] = None,
+    journal: Optional[CheckpointJournal] = None,
+    completed: Optional[Dict[str, Dict[str, object]]] = None,
+    metrics: Optional[RunMetrics] = None,
+    rules: Optional[str] = None,
+    archive: Optional[PageArchive] = None,
+    dedupe: bool = True,
+    light: bool = False,
+) -> Iterator[Dict[str, object]]:
+    """
+    逐列抓取並依輸入順序 yield 輸出列；records 會被逐步取用，不會一次讀完。
+    - journal：每完成一列即寫入檢查點日誌（抓取失敗的列不寫入）
+    - completed：續跑時由日誌讀回的已完成列（以序號為鍵），這些序號不再重新抓取；其中抓取失敗的列照常重新抓取
+    - metrics：逐列記錄連線/TTFB/下載/解析/擷取耗時與命中順位
+    - rules：商檢字號規則版本（extractors.RULESETS），預設為 config.BSMI_RULES
+    - archive：原始頁面存檔，保留每次抓取到的 HTML 供稽核
+    - light：改走輕量抓取路徑（lightfetch：JSON API / JSON-LD 優先，欄位不足才解析整頁）
+    - dedupe：同一商品的不同網址寫法（追蹤參數、桌機 / 手機版）只抓一次，結果分送給每個對應的序號
+    """
+    limiter = HostRateLimiter(rate=rate_per_host, burst=burst)
+    policy = make_retry_policy()
+    completed = resumable_rows(completed)
+    shared = SharedFetches() if dedupe else None
+    if completed:
+        print(f"續跑：檢查點日誌已有 {len(completed)} 列完成紀錄，這些序號將直接沿用")
+
+    def _process(record: InputRecord) -> Dict[str, object]:
+        seq, url = record
+        done = completed.get(checkpoint_key(seq))
+        if done is not None:
+            return done
+        trace = RowTrace(seq=seq, url=url) if metrics is not None else None
+
+        def _fetch() -> Dict[str, str]:
+            return fetch_momo_product(
+                url,
+                rate_limiter=limiter,
+                cache=cache,
+                retry_policy=policy,
+                trace=trace,
+                rules=rules,
+                archive=archive,
+                light=light,
+            )
+
+        if not url:
+            product_info = {}
+        elif shared is not None:
+            product_info, fetched = shared.get(canonicalize_momo_url(url), _fetch)
+            if trace is not None and not fetched:
+                trace.cache = "dedup"
+        else:
+            product_info = _fetch()
+        row = _build_output_row(seq, url, product_info, roc_date)
+        if trace is not None:
+            trace.finish()
+            metrics.record(trace)
+        if journal is not None and not is_failed_row(row):
+            journal.append(row)
+        return row
+
+    yield from imap_ordered(_process, records, max_workers=max_workers)
+    if shared is not None and shared.duplicates:
+        print(shared.summary())
+
+
+def build_output_rows(records, roc_date: str, **kwargs):
+    """records 可為 load_input_csv 的 DataFrame 或 load_input_records 的串流；其餘參數同 iter_output_rows。"""
+    import pandas as pd
+
+    if _is_dataframe(records):
+        records = _dataframe_records(records)
+    return pd.DataFrame(list(iter_output_rows(records, roc_date, **kwargs)), columns=OUTPUT_COLUMNS)
+
+
+def export_to_excel(rows, roc_date: str) -> str:
+    """rows 可為 DataFrame 或 iter_output_rows 的串流；以 write-only 模式一次寫完（export）。"""
+    from .export import dataframe_rows, write_rows_xlsx
+
+    filename = f"momo_check_output_ROC{roc_date.replace('/', '')}.xlsx"
+    if _is_dataframe(rows):
+        rows = dataframe_rows(rows)
+
+    write_rows_xlsx(filename, rows, OUTPUT_COLUMNS, column_widths=COLUMN_WIDTHS, wrap_columns=WRAP_COLUMNS)
+
+    try:
+        from google.colab import files  # type: ignore
+
+        files.download(filename)
+    except Exception:
+        print(f"已匯出檔案：{filename}")
+    return filename
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . p o o l
+ momo_check 批次抓取用的並行工具：
+
+ - TokenBucket / HostRateLimiter：以 token bucket 控制「每個主機」的請求速率，取代每列固定 sleep
+ - imap_ordered：以有上限的執行緒池同時保持 N 個工作進行，並依輸入順序回傳結果
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, TypeVar
+from urllib.parse import urlparse
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE_PER_HOST = 2.0  # 每秒請求數
+DEFAULT_BURST = 2
+
+
+class TokenBucket:
+    """
+    執行緒安全的 token bucket：
+    - 每秒補充 rate 個 token，最多累積 capacity 個
+    - acquire() 取不到 token 時會在鎖外等待，不阻塞其他主機
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        if rate <= 0:
+            raise ValueError("rate 必須大於 0")
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self) -> float:
+        """不等待：取得 token 時回傳 0，否則回傳還要等幾秒（供 asyncio 以 await sleep 等待）。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """依 URL 主機名稱分別維護 TokenBucket（首次遇到該主機時建立）。"""
+
+    def __init__(self, rate: float = DEFAULT_RATE_PER_HOST, burst: int = DEFAULT_BURST) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> None:
+        self.bucket_for(_host(url)).acquire()
+
+    def try_acquire(self, url: str) -> float:
+        return self.bucket_for(_host(url)).try_acquire()
+
+
+def _host(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def imap_ordered(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_pending: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[R]:
+    """
+    以執行緒池並行執行 func，結果依 items 的原始順序逐一 yield。
+    - 同時在途的工作數上限為 max_pending（預設 max_workers * 2），避免一次把整份輸入送進池子
+    - func 應自行處理例外；若有例外會在對應順序 yield 時拋出
+    - executor：改用呼叫端提供的池子（例如 ProcessPoolExecutor，func 與 items 須可 pickle），不會自動關閉
+    """
+    max_workers = max(1, int(max_workers))
+    window = max(max_workers, int(max_pending or max_workers * 2))
+
+    if executor is not None:
+        yield from _ordered_results(executor, func, items, window)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from _ordered_results(pool, func, items, window)
+
+
+def _ordered_results(executor: Executor, func: Callable[[T], R], items: Iterable[T], window: int) -> Iterator[R]:
+    pending: Deque = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . r e c h e c k
+ 增量再查核（cli --recheck 上次輸出.xlsx）：讀回上一輪的查核結果，只重新檢查「過期」的列
+
+ - 過期：再查核日期（沒有時看查核日期）距今已達 max_age_days 天；已判定下架的列預設不再檢查
+ - 每個過期的列只發一次探測請求（不跟隨轉址、stream 模式先看狀態碼）：
+   · 404 / 410，或轉址後 i_code 消失或改變 → 判定下架，不下載內容
+   · 頁面快取有 ETag / Last-Modified 時帶條件式請求，304 → 未變動，不下載也不解析
+   · 200 → 下載；內容與快取中上次的頁面相同時也不解析，只有真的變動的頁面才重新擷取欄位
+ - 輸出欄位與一般查核相同，填入 再查核日期、是否下架、是否改正（上次缺商檢標識、這次找到即為已改正）
+ - 探測失敗的列保留原樣、不填再查核日期，下一次再查核會再處理
+"""
+
+import datetime
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from . import config
+from .archive import PageArchive
+from .cache import PageCache
+from .common import _extract_i_code, canonicalize_momo_url, from_roc_date, to_roc_date
+from .fetch import REQUEST_HEADERS, extract_page_fields, fetch_momo_product, fetch_failed, fetch_target
+from .pipeline import make_retry_policy
+from .pool import HostRateLimiter, imap_ordered
+from .retry import RetryPolicy
+from .session import get_session
+
+UNCHANGED = "unchanged"
+DELISTED = "delisted"
+CHANGED = "changed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+GONE_STATUSES = (404, 410)
+OUTCOME_LABELS = {
+    SKIPPED: "未過期略過",
+    UNCHANGED: "未變動",
+    CHANGED: "內容變動",
+    DELISTED: "下架",
+    FAILED: "探測失敗",
+}
+
+
+@dataclass
+class ProbeResult:
+    outcome: str
+    status: int = 0
+    page_html: str = ""  # CHANGED 時為新頁面；空字串表示需要走完整抓取流程（例如轉址到同一商品頁）
+    error: str = ""
+
+
+def _text(value: object) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def last_checked(row: Dict[str, object]) -> Optional[datetime.date]:
+    """該列最後一次查核的日期（再查核日期優先）；沒有或無法辨識時回傳 None。"""
+    for col in ("再查核日期", "查核日期"):
+        value = row.get(col)
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        if _text(value):
+            try:
+                return from_roc_date(_text(value))
+            except ValueError:
+                continue
+    return None
+
+
+def is_stale(
+    row: Dict[str, object], today: datetime.date, max_age_days: int, include_delisted: bool = False
+) -> bool:
+    if not _text(row.get("網址/地址")):
+        return False
+    if _text(row.get("是否下架")) == "是" and not include_delisted:
+        return False
+    checked = last_checked(row)
+    return checked is None or (today - checked).days >= max_age_days
+
+
+def _is_same_product_location(location: str, m_url: str, i_code: str) -> bool:
+    # 轉址目標仍是同一商品（手機 / 桌機版、http → https 皆可）：i_code 完全相同；沒有 i_code 時比對標準化網址。
+    # 沒有 Location 的轉址視為原網址，改走完整抓取流程，不判定下架
+    target = urljoin(m_url, location)
+    if i_code:
+        return _extract_i_code(target).strip() == i_code
+    return canonicalize_momo_url(target) == canonicalize_momo_url(m_url)
+
+
+def probe_page(
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[PageCache] = None,
+    archive: Optional[PageArchive] = None,
+    rules: Optional[str] = None,
+) -> ProbeResult:
+    """
+    以一次請求判斷商品頁是否下架或變動；網路錯誤照常拋出，由呼叫端決定是否重試。
+    rules 決定探測手機版或桌機版頁面（同 fetch.fetch_target）。
+    """
+    i_code, key, m_url = fetch_target(url, rules)
+    entry = cache.lookup(key) if cache is not None and key else None
+    if entry is not None and entry.is_fresh():
+        cache.record("hit")
+        return ProbeResult(UNCHANGED)
+
+    headers = dict(REQUEST_HEADERS)
+    if entry is not None:
+        headers.update(entry.conditional_headers())
+    if rate_limiter is not None:
+        rate_limiter.acquire(m_url)
+    with get_session().get(m_url, headers=headers, timeout=20, stream=True, allow_redirects=False) as res:
+        status = res.status_code
+        if status == 304 and entry is not None:
+            cache.refresh(key)
+            cache.record("revalidated")
+            if archive is not None:
+                archive.put(key, m_url, entry.body)
+            return ProbeResult(UNCHANGED, status)
+        if status in GONE_STATUSES:
+            return ProbeResult(DELISTED, status)
+        if 300 <= status < 400:
+            if _is_same_product_location(res.headers.get("Location", ""), m_url, i_code):
+                return ProbeResult(CHANGED, status)
+            return ProbeResult(DELISTED, status)
+        res.raise_for_status()
+        body = res.text
+        etag = res.headers.get("ETag", "")
+        last_modified = res.headers.get("Last-Modified", "")
+
+    if archive is not None:
+        archive.put(key, m_url, body)
+    if cache is not None and key:
+        cache.put(key, m_url, body, etag=etag, last_modified=last_modified)
+        cache.record("miss")
+    if entry is not None and entry.body == body:
+        return ProbeResult(UNCHANGED, status)
+    return ProbeResult(CHANGED, status, page_html=body)
+
+
+def _probe_with_retry(url: str, policy: RetryPolicy, **kwargs) -> ProbeResult:
+    # 與 parse_momo_simple 相同的重試規則：暫時性錯誤退避重試，其餘錯誤直接放棄
+    error = ""
+    for attempt in range(1, config.MAX_ATTEMPTS + 1):
+        try:
+            policy.before_request()
+            result = probe_page(url, **kwargs)
+            policy.on_success()
+            return result
+        except requests.RequestException as e:
+            error = str(e)
+            delay = policy.on_failure(e, attempt, config.MAX_ATTEMPTS)
+            print(f"❌ (再查核) 第 {attempt} 次失敗：{e}")
+            if delay is None:
+                break
+            time.sleep(delay)
+        except Exception as e:
+            error = str(e)
+            print(f"❌ (再查核) 發生例外：{e}")
+            break
+    return ProbeResult(FAILED, error=error)
+
+
+def apply_recheck(
+    row: Dict[str, object], outcome: str, roc_date: str, fields: Optional[Tuple[str, str, str]] = None
+) -> Dict[str, object]:
+    """
+    依探測結果更新一列：再查核日期、是否下架、是否改正。
+    fields：內容變動時重新擷取的（商品名稱、品號、商檢字號）；None 表示沿用上次的值。
+    """
+    updated = dict(row)
+    if outcome == FAILED:
+        return updated
+    updated["再查核日期"] = roc_date
+    if outcome == DELISTED:
+        updated["是否下架"] = "是"
+        return updated
+    updated["是否下架"] = "否"
+    previous_code = _text(row.get("商檢標識"))
+    code = previous_code
+    if fields is not None:
+        name, prod_no, code = fields
+        if name and name != "未取得":
+            updated["商品名稱"] = name
+        if prod_no and prod_no != "未取得":
+            updated["賣家帳號或拍賣代碼"] = prod_no
+        updated["商檢標識"] = code
+    if not previous_code:
+        updated["是否改正"] = "是" if code else "否"
+    return updated
+
+
+def iter_recheck_rows(
+    rows: Iterable[Dict[str, object]],
+    today: Optional[datetime.date] = None,
+    max_age_days: int = config.RECHECK_MAX_AGE_DAYS,
+    include_delisted: bool = False,
+    max_workers: int = config.MAX_WORKERS,
+    rate_per_host: float = config.RATE_PER_HOST,
+    burst: int = config.RATE_BURST,
+    cache: Optional[PageCache] = None,
+    archive: Optional[PageArchive] = None,
+    rules: Optional[str] = None,
+    stats: Optional[Counter] = None,
+) -> Iterator[Dict[str, object]]:
+    """
+    依原順序 yield 再查核後的輸出列；未過期的列原樣輸出、不發出任何請求。
+    stats：傳入 Counter 時累計各結果（SKIPPED / UNCHANGED / CHANGED / DELISTED / FAILED）與新增已改正列數。
+    """
+    today = today or datetime.date.today()
+    roc_date = to_roc_date(today)
+    limiter = HostRateLimiter(rate=rate_per_host, burst=burst)
+    policy = make_retry_policy()
+    stats = stats if stats is not None else Counter()
+
+    def _process(row: Dict[str, object]) -> Tuple[Dict[str, object], Dict[str, object], str]:
+        # 在 worker 執行緒中執行：只回傳結果，統計由下方依序取用結果的迴圈累計
+        if not is_stale(row, today, max_age_days, include_delisted):
+            return row, row, SKIPPED
+        url = _text(row.get("網址/地址"))
+        result = _probe_with_retry(url, policy, rate_limiter=limiter, cache=cache, archive=archive, rules=rules)
+        outcome, fields = result.outcome, None
+        if outcome == CHANGED and result.page_html:
+            # 與一般查核相同：頁面中沒有字號時也查 Area302 的 iframe，避免把上次找到的字號清掉
+            fields = extract_page_fields(
+                result.page_html, fetch_target(url, rules)[2], rules=rules, rate_limiter=limiter, cache=cache
+            )
+        elif outcome == CHANGED:
+            # 轉址到同一商品頁（例如 http → https）：改走完整抓取流程
+            info = fetch_momo_product(
+                url, rate_limiter=limiter, cache=cache, retry_policy=policy, rules=rules, archive=archive
+            )
+            if fetch_failed(info):
+                outcome = FAILED
+            else:
+                fields = (info["商品名稱"], info["品號"], info["商檢字號"])
+        return row, apply_recheck(row, outcome, roc_date, fields), outcome
+
+    for row, updated, outcome in imap_ordered(_process, rows, max_workers=max_workers):
+        stats[outcome] += 1
+        if updated.get("是否改正") == "是" and _text(row.get("是否改正")) != "是":
+            stats["corrected"] += 1
+        yield updated
+
+
+def run_recheck(
+    path: str,
+    max_age_days: int = config.RECHECK_MAX_AGE_DAYS,
+    include_delisted: bool = False,
+    max_workers: int = config.MAX_WORKERS,
+    cache: Optional[PageCache] = None,
+    archive: Optional[PageArchive] = None,
+    rules: Optional[str] = None,
+) -> str:
+    """讀回 path（上一輪的輸出活頁簿），再查核後匯出新的活頁簿，回傳輸出檔名。"""
+    from .export import write_rows_xlsx
+    from .inputs import open_output_rows
+    from .pipeline import COLUMN_WIDTHS, OUTPUT_COLUMNS, WRAP_COLUMNS
+
+    today = datetime.date.today()
+    filename = f"momo_recheck_output_ROC{to_roc_date(today).replace('/', '')}.xlsx"
+    stats: Counter = Counter()
+    start = time.perf_counter()
+    rows = iter_recheck_rows(
+        open_output_rows(path),
+        today=today,
+        max_age_days=max_age_days,
+        include_delisted=include_delisted,
+        max_workers=max_workers,
+        rate_per_host=config.RATE_PER_HOST,
+        burst=config.RATE_BURST,
+        cache=cache,
+        archive=archive,
+        rules=rules,
+        stats=stats,
+    )
+    total = write_rows_xlsx(filename, rows, OUTPUT_COLUMNS, column_widths=COLUMN_WIDTHS, wrap_columns=WRAP_COLUMNS)
+    elapsed = time.perf_counter() - start
+    checked = total - stats[SKIPPED]
+    print(f"✅ 再查核完成：共 {total} 列，實際檢查 {checked} 列，耗時 {elapsed:.1f} 秒：{filename}")
+    print("📊 " + "、".join(f"{label} {stats[key]}" for key, label in OUTCOME_LABELS.items()))
+    if stats["corrected"]:
+        print(f"   本次新增已改正（找到商檢標識）：{stats['corrected']} 列")
+    return filename
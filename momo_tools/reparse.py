@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . r e p a r s e
+ 離線重新解析已存檔的商品頁（不連線 momo）：python -m momo_tools.reparse 來源 [--rules v6] [--compare v5]
+
+ - 來源可為 HTML 目錄（遞迴讀取 .html / .htm）、zip / tar 壓縮檔、頁面快取（cache）的 SQLite 檔，
+   或原始頁面存檔（archive，.arc，各 i_code 取最新一筆，逐筆以 mmap 讀取）
+ - 以目前的商檢字號規則與品號擷取邏輯重新擷取；--compare 另以舊規則擷取，標出字號有變動的頁面
+ - 頁面分批（chunk_size 頁為一批）送進 ProcessPoolExecutor，同時在途的批數有上限，
+   來源邊讀邊送，不會一次把數萬頁讀進記憶體；輸出依來源順序逐列寫入 Excel
+"""
+
+import argparse
+import os
+import tarfile
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import config
+from .archive import MAGIC as ARCHIVE_MAGIC
+from .extractors import extract_product_fields, get_rules
+from .metrics import RowTrace
+from .pool import imap_ordered
+
+SavedPage = Tuple[str, str]  # （來源名稱、HTML）
+
+HTML_SUFFIXES = (".html", ".htm")
+REPARSE_COLUMNS = ["來源", "商品名稱", "品號", "商檢字號", "命中順位"]
+COMPARE_COLUMNS = ["比較規則商檢字號", "字號不同"]
+DEFAULT_CHUNK_SIZE = 64
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _iter_directory(path: str) -> Iterator[SavedPage]:
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(HTML_SUFFIXES):
+                full = os.path.join(root, name)
+                with open(full, "rb") as fh:
+                    yield os.path.relpath(full, path), _decode(fh.read())
+
+
+def _iter_file(path: str) -> Iterator[SavedPage]:
+    with open(path, "rb") as fh:
+        yield os.path.basename(path), _decode(fh.read())
+
+
+def _iter_zip(path: str) -> Iterator[SavedPage]:
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(HTML_SUFFIXES):
+                yield info.filename, _decode(zf.read(info))
+
+
+def _iter_tar(path: str) -> Iterator[SavedPage]:
+    # 以串流模式讀取，壓縮過的 tar 也不需要先整包解開
+    with tarfile.open(path, "r|*") as tf:
+        for member in tf:
+            if member.isfile() and member.name.lower().endswith(HTML_SUFFIXES):
+                fh = tf.extractfile(member)
+                if fh is not None:
+                    yield member.name, _decode(fh.read())
+
+
+def _iter_cache(path: str) -> Iterator[SavedPage]:
+    from .cache import PageCache
+
+    cache = PageCache(path)
+    try:
+        for i_code, _url, body in cache.iter_pages():
+            yield i_code, body
+    finally:
+        cache.close()
+
+
+def _iter_archive(path: str) -> Iterator[SavedPage]:
+    from .archive import PageArchive
+
+    archive = PageArchive(path)
+    try:
+        for i_code, _url, body in archive.iter_pages():
+            yield i_code, body
+    finally:
+        archive.close()
+
+
+def iter_saved_pages(source: str) -> Iterator[SavedPage]:
+    """依來源型態逐頁產生（來源名稱、HTML）。"""
+    if os.path.isdir(source):
+        return _iter_directory(source)
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"找不到來源：{source}")
+    if zipfile.is_zipfile(source):
+        return _iter_zip(source)
+    if tarfile.is_tarfile(source):
+        return _iter_tar(source)
+    with open(source, "rb") as fh:
+        header = fh.read(16)
+    if header.startswith(b"SQLite format 3"):
+        return _iter_cache(source)
+    if header.startswith(ARCHIVE_MAGIC):
+        return _iter_archive(source)
+    if source.lower().endswith(HTML_SUFFIXES):
+        return _iter_file(source)
+    raise ValueError(f"無法辨識的來源格式：{source}（支援目錄、zip、tar、頁面快取 SQLite、頁面存檔、單一 HTML）")
+
+
+def _chunks(pages: Iterable[SavedPage], size: int) -> Iterator[List[SavedPage]]:
+    it = iter(pages)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _reparse_chunk(task: Tuple[List[SavedPage], str, str, Optional[str]]) -> List[Dict[str, object]]:
+    # 在解析行程中執行：一次處理一批頁面，減少行程間往返次數
+    chunk, rules, backend, compare = task
+    rows: List[Dict[str, object]] = []
+    for name, page_html in chunk:
+        trace = RowTrace()
+        try:
+            title, prod_no, code = extract_product_fields(page_html, rules=rules, backend=backend, trace=trace)
+        except Exception as e:
+            title, prod_no, code = f"錯誤：{e}", "", ""
+        row: Dict[str, object] = {
+            "來源": name,
+            "商品名稱": title,
+            "品號": prod_no,
+            "商檢字號": code,
+            "命中順位": trace.tier,
+        }
+        if compare:
+            try:
+                old_code = extract_product_fields(page_html, rules=compare, backend=backend)[2]
+            except Exception:
+                old_code = ""
+            row["比較規則商檢字號"] = old_code
+            row["字號不同"] = "是" if old_code != code else ""
+        rows.append(row)
+    return rows
+
+
+def reparse(
+    pages: Iterable[SavedPage],
+    rules: Optional[str] = None,
+    backend: Optional[str] = None,
+    processes: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compare: Optional[str] = None,
+) -> Iterator[Dict[str, object]]:
+    """以 processes 個行程重新擷取 pages，依原始順序逐列 yield 結果。"""
+    rules = rules or config.BSMI_RULES
+    backend = backend or config.PARSER_BACKEND
+    # 規則名稱在主行程先驗證，避免每一頁都在解析行程中失敗
+    get_rules(rules)
+    if compare:
+        get_rules(compare)
+    processes = max(1, int(processes or os.cpu_count() or 1))
+    tasks = ((chunk, rules, backend, compare) for chunk in _chunks(pages, max(1, chunk_size)))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for rows in imap_ordered(_reparse_chunk, tasks, max_workers=processes, executor=executor):
+            yield from rows
+
+
+def run_reparse(
+    source: str,
+    output: str = "",
+    rules: Optional[str] = None,
+    backend: Optional[str] = None,
+    processes: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compare: Optional[str] = None,
+) -> str:
+    """重新解析 source 並匯出 Excel，回傳輸出檔名。"""
+    from .export import write_rows_xlsx
+
+    rules = rules or config.BSMI_RULES
+    # 來源與規則名稱在建立 Excel 檔之前先檢查，錯誤時不留下半份輸出
+    get_rules(rules)
+    if compare:
+        get_rules(compare)
+    pages = iter_saved_pages(source)
+    output = output or f"momo_reparse_{rules}.xlsx"
+    columns = REPARSE_COLUMNS + (COMPARE_COLUMNS if compare else [])
+    widths = [30, 40, 14, 14, 12] + ([16, 10] if compare else [])
+    tiers: Counter = Counter()
+    stats = {"pages": 0, "changed": 0}
+    start = time.perf_counter()
+
+    def _counted(rows: Iterable[Dict[str, object]]) -> Iterator[Dict[str, object]]:
+        for row in rows:
+            stats["pages"] += 1
+            tiers[row["命中順位"] or "未命中"] += 1
+            if row.get("字號不同"):
+                stats["changed"] += 1
+            if stats["pages"] % 1000 == 0:
+                print(f"已重新解析 {stats['pages']} 頁")
+            yield row
+
+    rows = reparse(
+        pages,
+        rules=rules,
+        backend=backend,
+        processes=processes,
+        chunk_size=chunk_size,
+        compare=compare,
+    )
+    write_rows_xlsx(output, _counted(rows), columns, column_widths=widths, wrap_columns={2}, sheet_title="reparse")
+
+    elapsed = time.perf_counter() - start
+    pages = stats["pages"]
+    print(f"✅ 重新解析 {pages} 頁，耗時 {elapsed:.1f} 秒（{pages / elapsed if elapsed > 0 else 0:.1f} 頁/秒）：{output}")
+    print("   商檢字號命中順位：" + "、".join(f"{k} {v}" for k, v in tiers.most_common()))
+    if compare:
+        print(f"   與 {compare} 規則相比，商檢字號不同的頁面：{stats['changed']} 頁")
+    return output
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.reparse", description="以目前規則離線重新解析已存檔的商品頁")
+    parser.add_argument("source", help="HTML 目錄、zip / tar 壓縮檔、頁面快取 SQLite 檔或頁面存檔（.arc）")
+    parser.add_argument("--output", default="", help="輸出 Excel 檔名（預設 momo_reparse_<規則>.xlsx）")
+    parser.add_argument("--rules", default=config.BSMI_RULES, help="商檢字號判定規則版本")
+    parser.add_argument("--compare", default="", help="另以此規則版本擷取並標出字號不同的頁面（例如 v5）")
+    parser.add_argument(
+        "--parser", default=config.PARSER_BACKEND, choices=("lxml", "html.parser"), help="HTML 解析後端"
+    )
+    parser.add_argument("--processes", type=int, default=0, help="解析行程數（0 為 CPU 核心數）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每批送進行程的頁數")
+    args = parser.parse_args(argv)
+    try:
+        run_reparse(
+            args.source,
+            output=args.output,
+            rules=args.rules,
+            backend=args.parser,
+            processes=args.processes,
+            chunk_size=args.chunk_size,
+            compare=args.compare or None,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
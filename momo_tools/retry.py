@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . r e t r y
+ 抓取重試策略與熔斷器：
+
+ - RetryPolicy：指數退避 + full jitter，遵守 Retry-After；Timeout、連線錯誤、429 與 5xx 皆可重試
+ - RetryBudget：整輪執行共用的重試次數上限，避免大量失敗時無止盡地重試
+ - CircuitBreaker：momo 開始限流（429，或連續 failure_threshold 次 5xx／連線失敗）時暫停整個 worker 池，
+   而不是每列各自 sleep；暫停結束後若立刻又被限流，暫停時間加倍（上限 max_cooldown）
+"""
+
+import email.utils
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 可為秒數或 HTTP 日期；無法解析時回傳 None。"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def response_info(exc: BaseException):
+    """
+    從例外取出 (HTTP 狀態碼, Retry-After 秒數)；非 HTTP 錯誤時狀態碼為 None。
+    支援 requests（exc.response）與 aiohttp.ClientResponseError（exc.status / exc.headers）。
+    """
+    response = getattr(exc, "response", None)
+    if response is not None:
+        return response.status_code, parse_retry_after(response.headers.get("Retry-After"))
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        headers = getattr(exc, "headers", None) or {}
+        return status, parse_retry_after(headers.get("Retry-After"))
+    return None, None
+
+
+class RetryBudget:
+    def __init__(self, max_retries: int) -> None:
+        self.remaining = max_retries
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class CircuitBreaker:
+    def __init__(
+        self, failure_threshold: int = 5, cooldown: float = 30.0, max_cooldown: float = 300.0
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.trips = 0
+        self._cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._last_trip_end = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """距離暫停結束還有幾秒；未熔斷時為 0。"""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def wait(self) -> None:
+        """熔斷中則等到暫停結束；每次送出請求前呼叫。"""
+        while True:
+            remaining = self.remaining()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._last_trip_end and time.monotonic() - self._last_trip_end > self._cooldown:
+                self._cooldown = self.base_cooldown
+
+    def record_failure(self, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            if status == 429:
+                self._trip_locked(retry_after)
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._trip_locked(retry_after)
+
+    def _trip_locked(self, retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        if now < self._open_until:
+            # 已在熔斷中（其他 worker 剛觸發），只需確保涵蓋對方要求的等待時間
+            if retry_after:
+                self._open_until = max(self._open_until, now + retry_after)
+            return
+        if self._last_trip_end and now - self._last_trip_end <= self._cooldown:
+            self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+        pause = max(self._cooldown, retry_after or 0.0)
+        self._open_until = now + pause
+        self._last_trip_end = self._open_until
+        self._failures = 0
+        self.trips += 1
+        print(f"⏸️ momo 回應限流，暫停所有請求 {pause:.0f} 秒")
+
+
+class RetryPolicy:
+    # 視為暫時性、可重試的例外型別；asyncio 版的抓取流程會再加入 aiohttp 的連線錯誤
+    transient_errors = (requests.Timeout, requests.ConnectionError)
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.breaker = breaker
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, self.transient_errors):
+            return True
+        status, _ = response_info(exc)
+        return status in RETRY_STATUSES
+
+    def before_request(self) -> None:
+        if self.breaker is not None:
+            self.breaker.wait()
+
+    def pause_remaining(self) -> float:
+        """不等待版的 before_request：回傳熔斷暫停還剩幾秒。"""
+        return self.breaker.remaining() if self.breaker is not None else 0.0
+
+    def on_success(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def on_failure(self, exc: BaseException, attempt: int, max_attempts: int) -> Optional[float]:
+        """
+        記錄一次失敗並決定是否重試：回傳應等待的秒數，不應重試時回傳 None。
+        熔斷器觸發時的整池暫停由 before_request 處理；回應帶 Retry-After 時，不論有無熔斷器，
+        本列的退避時間都不短於伺服器要求的等待（上限 max_delay）。
+        """
+        status, retry_after = response_info(exc)
+        if self.breaker is not None and self.is_retryable(exc):
+            self.breaker.record_failure(status, retry_after)
+        if attempt >= max_attempts or not self.is_retryable(exc):
+            return None
+        if self.budget is not None and not self.budget.try_spend():
+            print("⚠️ 本輪重試額度已用完，不再重試")
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            backoff = max(backoff, min(retry_after, self.max_delay))
+        return backoff
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . s e s s i o n
+ 所有 momo 抓取路徑共用的 HTTP 連線層：
+
+ - 全程序共用一個 requests.Session，連線池大小可設定，同主機請求重用 TCP/TLS 連線（keep-alive）
+ - 預設協商 gzip/deflate；環境有安裝 brotli（或 brotlicffi）時一併宣告 br
+ - 重試交由呼叫端處理，連線池本身不做自動重試
+ - 建立新連線（DNS+TCP+TLS）的耗時依執行緒累計，供 metrics 模組以 pop_connect_seconds() 取回
+"""
+
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_timing = threading.local()
+
+
+def _add_connect_seconds(seconds: float) -> None:
+    _timing.connect = getattr(_timing, "connect", 0.0) + seconds
+
+
+def pop_connect_seconds() -> float:
+    """取回並歸零目前執行緒累計的建立連線秒數（重用 keep-alive 連線時為 0）。"""
+    seconds = getattr(_timing, "connect", 0.0)
+    _timing.connect = 0.0
+    return seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_seconds(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_seconds(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _accept_encoding() -> str:
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # type: ignore  # noqa: F401
+
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # type: ignore  # noqa: F401
+
+            encodings.append("br")
+        except ImportError:
+            pass
+    return ", ".join(encodings)
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE, keep_alive: bool = True) -> requests.Session:
+    """
+    建立一個掛好連線池的 Session：
+    - pool_size：每個主機保留的連線數（建議不小於並行 worker 數）
+    - keep_alive：False 時每次請求後關閉連線（除錯或對方不支援時使用）
+    """
+    session = requests.Session()
+    adapter = _TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers["Accept-Encoding"] = _accept_encoding()
+    session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+    return session
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE, keep_alive: bool = True) -> requests.Session:
+    """以新的設定取代共用 Session（舊 Session 會被關閉）。"""
+    global _session
+    with _session_lock:
+        old = _session
+        _session = create_session(pool_size=pool_size, keep_alive=keep_alive)
+        if old is not None:
+            old.close()
+        return _session
+
+
+def get_session() -> requests.Session:
+    """取得共用 Session；尚未建立時以預設值建立。"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . t e s t s . t e s t _ w o r k q u e u e
+ 工作佇列的租約、逾時重新派發、失敗退回與 max_attempts：python -m pytest momo_tools/tests
+"""
+
+import time
+
+from momo_tools.bench import StubServer, load_fixtures
+from momo_tools.metrics import RunMetrics
+from momo_tools.workqueue import DONE, FAILED, PENDING, WorkQueue, numbered_path, run_worker
+
+ROC_DATE = "115/10/18"
+
+
+def _queue(rows: int = 3, visibility_timeout: float = 60.0, max_attempts: int = 3) -> WorkQueue:
+    queue = WorkQueue(":memory:", visibility_timeout=visibility_timeout, max_attempts=max_attempts)
+    urls = (f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={i}" for i in range(1, rows + 1))
+    queue.enqueue(enumerate(urls, 1), ROC_DATE)
+    return queue
+
+
+def test_lease_in_input_order_without_overlap():
+    queue = _queue(rows=3)
+    first = queue.lease("a", 2)
+    second = queue.lease("b", 5)
+    assert [item.seq for item in first] == [1, 2]
+    assert [item.seq for item in second] == [3]
+    assert all(item.attempts == 1 for item in first + second)
+    assert queue.lease("c", 5) == []
+    assert queue.remaining() == 3
+
+
+def test_expired_lease_is_taken_over():
+    queue = _queue(rows=1, visibility_timeout=0.05)
+    (item,) = queue.lease("a", 1)
+    assert queue.lease("b", 1) == []
+    time.sleep(0.1)
+    (again,) = queue.lease("b", 1)
+    assert again.item_id == item.item_id
+    assert again.attempts == 2
+    # 原 worker 的租約已被領走：不能再延長或退回
+    assert not queue.touch(item.item_id, "a")
+    assert queue.fail(item.item_id, "a", "逾時") == ""
+    assert queue.touch(again.item_id, "b")
+    assert queue.complete(again.item_id, "b", {"編號": 1})
+    assert queue.counts()[DONE] == 1
+    assert queue.remaining() == 0
+
+
+def test_failed_row_requeued_until_max_attempts():
+    queue = _queue(rows=1, max_attempts=2)
+    (item,) = queue.lease("a", 1)
+    assert queue.fail(item.item_id, "a", "抓取失敗", {"編號": 1, "調查結果": "第一次"}) == PENDING
+    (again,) = queue.lease("b", 1)
+    assert again.attempts == 2
+    assert queue.fail(again.item_id, "b", "抓取失敗", {"編號": 1, "調查結果": "第二次"}) == FAILED
+    assert queue.lease("c", 1) == []
+    assert queue.remaining() == 0
+    # 放棄的列保留最後一次的輸出列
+    assert [row["調查結果"] for row in queue.iter_rows()] == ["第二次"]
+
+
+def test_expired_lease_given_up_after_max_attempts():
+    queue = _queue(rows=1, visibility_timeout=0.05, max_attempts=1)
+    queue.lease("a", 1)
+    time.sleep(0.1)
+    assert queue.lease("b", 1) == []
+    assert queue.counts()[FAILED] == 1
+    (row,) = queue.iter_rows()
+    assert row["調查結果"] == "租約逾時次數過多"
+
+
+def test_run_worker_completes_rows_from_stub_server():
+    fixtures = load_fixtures()
+    queue = WorkQueue(":memory:")
+    with StubServer(fixtures) as server:
+        records = [(i, server.url(i)) for i in range(1, len(fixtures) * 2 + 1)] + [(0, "")]
+        queue.enqueue(records, ROC_DATE)
+        metrics = RunMetrics()
+        stats = run_worker(
+            queue, worker="w", max_workers=4, batch_size=3, poll_interval=0.01, rate_per_host=1e6, burst=4,
+            metrics=metrics, rules="v6",
+        )
+    assert stats == {"done": len(records)}
+    assert len(metrics.total_ms) == len(records)
+    rows = list(queue.iter_rows())
+    assert [row["編號"] for row in rows] == [seq for seq, _ in records]
+    for (seq, url), row in zip(records, rows):
+        expected = fixtures[seq % len(fixtures)].expected if url else None
+        if expected:
+            assert row["商品名稱"] == expected["商品名稱"]
+            assert row["商檢標識"] == expected["商檢字號"]
+        assert row["查核日期"] == ROC_DATE
+
+
+def test_numbered_path():
+    assert numbered_path("cache/pages.bin", 2) == "cache/pages-2.bin"
+    assert numbered_path("trace", 1) == "trace-1"
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . t e x t i n d e x
+ 商檢字號擷取用的單次走訪文字索引（BeautifulSoup 版 SoupTextIndex；lxml 版見 lxml_backend.LxmlTextIndex）：
+
+ - 走訪整棵樹一次，依 get_text(strip=True) 的規則收集字串（僅 NavigableString / CData），
+   並記錄每個元素涵蓋的字串範圍，之後任一節點的文字都可由切片取得，不必重新走訪子樹
+ - 商檢關鍵字以 KEYWORD_SCAN_REGEX 對整頁文字流掃描一次，節點是否含關鍵字改為 O(log n) 的區間查詢
+ - Area504 / 規格條列候選 / Area302 三個順位共用同一次走訪的結果
+"""
+
+from bisect import bisect_left
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from .bsmi import KEYWORD_SCAN_REGEX
+
+SPEC_TAG_NAMES = ("div", "span", "li", "p", "td", "th")
+_TEXT_TYPES = (NavigableString, CData)
+# 這些標籤本身呼叫 get_text 時只取自己的專屬字串型別（Script、Stylesheet…），索引不涵蓋，改走原本的 get_text
+_STRING_CONTAINER_TAGS = ("script", "style", "template", "rt", "rp")
+
+
+class TextSpanIndex:
+    """
+    兩種解析器共用的部分：子類別走訪樹時填入 strings（已 strip 的非空字串）、spans（節點鍵 → 字串範圍）
+    與三個順位的節點清單，再呼叫 _build 建立整頁文字流與關鍵字位置。
+    """
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self.spans: Dict[Hashable, Tuple[int, int]] = {}
+        self.area504: List[object] = []
+        self.area302: List[object] = []
+        self.spec_tags: List[object] = []
+
+    def _build(self) -> None:
+        # 字串 i 在整頁文字流（"".join(strings)）中的起點；多一個哨兵方便取區間終點
+        self.offsets: List[int] = [0]
+        for s in self.strings:
+            self.offsets.append(self.offsets[-1] + len(s))
+        self.flat = "".join(self.strings)
+
+        self.kw_starts: List[int] = []
+        self.kw_ends: List[int] = []
+        for m in KEYWORD_SCAN_REGEX.finditer(self.flat):
+            self.kw_starts.append(m.start())
+            self.kw_ends.append(m.start() + len(m.group(1)))
+
+    def _key(self, node) -> Hashable:
+        return node
+
+    def _span_text(self, span: Tuple[int, int], separator: str) -> str:
+        start, end = span
+        if separator == "":
+            return self.flat[self.offsets[start] : self.offsets[end]]
+        return separator.join(self.strings[start:end])
+
+    def span_of(self, node) -> Optional[Tuple[int, int]]:
+        return self.spans.get(self._key(node))
+
+    def has_keyword(self, node) -> bool:
+        """等同 any(k in 節點文字(strip=True) for k in BSMI_KEYWORDS)。"""
+        span = self.span_of(node)
+        if span is None:
+            return False
+        lo, hi = self.offsets[span[0]], self.offsets[span[1]]
+        i = bisect_left(self.kw_starts, lo)
+        while i < len(self.kw_starts) and self.kw_starts[i] < hi:
+            if self.kw_ends[i] <= hi:
+                return True
+            i += 1
+        return False
+
+    def spec_candidates(self) -> List[object]:
+        return [tag for tag in self.spec_tags if self.has_keyword(tag)]
+
+
+class SoupTextIndex(TextSpanIndex):
+    def __init__(self, soup: BeautifulSoup) -> None:
+        super().__init__()
+        self._walk(soup)
+        self._build()
+
+    def _key(self, node) -> Hashable:
+        return id(node)
+
+    def _walk(self, root: Tag) -> None:
+        # 以顯式堆疊做前序走訪，避免極深的 DOM 觸發遞迴上限
+        stack: List[Tuple[Tag, int]] = [(root, 0)]
+        starts: Dict[int, int] = {id(root): 0}
+        while stack:
+            tag, child_idx = stack.pop()
+            contents = tag.contents
+            if child_idx >= len(contents):
+                self.spans[id(tag)] = (starts[id(tag)], len(self.strings))
+                continue
+            stack.append((tag, child_idx + 1))
+            child = contents[child_idx]
+            if isinstance(child, Tag):
+                starts[id(child)] = len(self.strings)
+                classes = child.get("class") or []
+                if "Area504" in classes:
+                    self.area504.append(child)
+                if "Area302" in classes:
+                    self.area302.append(child)
+                if child.name in SPEC_TAG_NAMES:
+                    self.spec_tags.append(child)
+                stack.append((child, 0))
+            elif type(child) in _TEXT_TYPES:
+                stripped = child.strip()
+                if stripped:
+                    self.strings.append(stripped)
+
+    def text(self, tag: Tag, separator: str = " ") -> str:
+        """等同 tag.get_text(separator, strip=True)，但直接由索引切片組出。"""
+        span = self.span_of(tag)
+        if span is None or tag.name in _STRING_CONTAINER_TAGS:
+            return tag.get_text(separator, strip=True)
+        return self._span_text(span, separator)
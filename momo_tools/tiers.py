@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . t i e r s
+ 欄位擷取的分層宣告（商品名稱、品號）：每個欄位是一串依序嘗試的 tier，第一個有結果的 tier 即為答案
+
+ - 順序為：選擇器（#osmPrdNo、品號 li、meta keywords）→ 目標區塊（含「品號」的文字節點附近）→ 整頁全文
+ - tier 函式接收 PageContext：解析後的樹，以及延遲計算的整頁文字（最多計算一次，只有用到的 tier 才會觸發）
+ - run_tiers 把每個嘗試過的 tier（欄位、tier、是否命中、耗時 ms）記進 RowTrace.field_tiers，
+   RunMetrics 彙總各 tier 的命中率與平均成本，用來判斷哪些 tier 可以拿掉
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .metrics import RowTrace
+
+PROD_NO_REGEX = re.compile(r"品號[:： ]?\s*(\w+)")
+# 「品號」標籤還沒有接上值（值可能在下一個文字節點）
+_OPEN_LABEL_REGEX = re.compile(r"品號[:： ]?\s*$")
+_WORD_PREFIX_REGEX = re.compile(r"\w*")
+PROD_NO_LABEL = "品號"
+
+
+class PageContext:
+    """一頁的擷取狀態：root 為解析後的樹（soup 或 lxml root），text 為第一次存取時才計算的整頁文字。"""
+
+    def __init__(self, root, text_func: Callable[[object], str]) -> None:
+        self.root = root
+        self._text_func = text_func
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._text_func(self.root)
+        return self._text
+
+    @property
+    def text_materialized(self) -> bool:
+        return self._text is not None
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    find: Callable[[PageContext], str]
+
+
+def run_tiers(
+    field: str, tiers: Sequence[Tier], page: PageContext, trace: Optional[RowTrace] = None
+) -> Tuple[str, str]:
+    """依序執行 tiers，回傳（值、命中的 tier 名稱）；全部落空時回傳（""、""）。"""
+    for tier in tiers:
+        start = time.perf_counter()
+        value = tier.find(page)
+        if trace is not None:
+            trace.field_tiers.append((field, tier.name, bool(value), (time.perf_counter() - start) * 1000))
+        if value:
+            return value, tier.name
+    return "", ""
+
+
+def prod_no_near_label(candidates: Iterable[Tuple[str, Callable[[], Iterator[str]]]]) -> str:
+    """
+    目標區塊 tier：candidates 依文件順序提供（含「品號」的文字節點、取得其後文字節點的函式）。
+    以 PROD_NO_REGEX 比對該節點從「品號」開始的文字，值被切到下一個節點時才往後接，整頁文字不會被組出來。
+    結果與對整頁全文 search 相同；唯一例外是「品」「號」兩字被拆在不同節點，這種標籤不會被認出，由全文 tier 處理。
+    """
+    for text, following in candidates:
+        window = text[text.index(PROD_NO_LABEL) :]
+        rest: Optional[Iterator[str]] = None
+        m = PROD_NO_REGEX.search(window)
+        while not m and _OPEN_LABEL_REGEX.search(window):
+            # 標籤還沒接上值：接上下一個文字節點再比對
+            rest = rest if rest is not None else following()
+            more = next(rest, None)
+            if more is None:
+                break
+            window += more
+            m = PROD_NO_REGEX.search(window)
+        if not m:
+            continue
+        value = m.group(1)
+        if m.end() == len(window):
+            # 值一路到視窗結尾：後續節點開頭的英數字仍屬同一個值（只接 \w 前綴，不重新比對整個視窗）
+            for more in rest if rest is not None else following():
+                word = _WORD_PREFIX_REGEX.match(more).group(0)
+                value += word
+                if len(word) < len(more):
+                    break
+        return value.strip()
+    return ""
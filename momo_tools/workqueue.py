@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+"""
+ m o m o _ t o o l s . w o r k q u e u e
+ 大量查核的分散式工作佇列（SQLite）：一個 coordinator 建立佇列、多個 worker（行程或主機）租用工作列
+
+     python -m momo_tools.workqueue coordinator --input 清單.csv [--local-workers 4]
+     python -m momo_tools.workqueue worker        # 其他行程 / 主機（共用同一個佇列檔）
+     python -m momo_tools.workqueue status | export
+
+ - coordinator 把 load_input_records 的每一列寫入佇列（依輸入順序編號），寫完才標記為可領取
+ - worker 每次租用 batch_size 列，租約在 visibility_timeout 秒後到期；worker 當掉或斷線時，
+   到期的列會再被其他 worker 領走。同一列最多派發 max_attempts 次，抓取失敗的列退回佇列重試
+ - 完成的輸出列存回佇列；coordinator 等所有列完成（或放棄）後依輸入順序匯出單一活頁簿（export_to_excel）
+ - 佇列本身即為檢查點：coordinator 中斷後重新執行會沿用既有佇列，只處理尚未完成的列
+ - --archive / --trace 每個行程各寫一個檔：coordinator 啟動的第 N 個本機 worker 寫入「檔名-N.副檔名」
+ - 佇列檔須放在所有 worker 都能存取的磁碟上；WorkQueue(":memory:") 可在單一行程內以多執行緒模擬多個 worker
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from . import config
+from .archive import PageArchive
+from .cache import PageCache
+from .checkpoint import json_default
+from .fetch import fetch_failed, fetch_momo_product
+from .inputs import InputRecord
+from .metrics import RowTrace, RunMetrics
+from .pipeline import _build_output_row, make_retry_policy
+from .pool import HostRateLimiter, imap_ordered
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+STATE_LABELS = {PENDING: "待處理", LEASED: "處理中", DONE: "完成", FAILED: "放棄"}
+ENQUEUE_CHUNK = 1000
+
+
+@dataclass
+class WorkItem:
+    item_id: int
+    seq: object
+    url: str
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    以 SQLite 實作的租約式工作佇列。單一連線 + 鎖，可由同一行程內的多個執行緒共用；
+    跨行程 / 跨主機時各自開啟同一個檔案，租用以 BEGIN IMMEDIATE 交易序列化。
+    """
+
+    def __init__(
+        self,
+        path: str = config.QUEUE_PATH,
+        visibility_timeout: float = config.QUEUE_VISIBILITY_TIMEOUT,
+        max_attempts: int = config.QUEUE_MAX_ATTEMPTS,
+    ) -> None:
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                seq TEXT NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT NOT NULL DEFAULT '',
+                lease_expires REAL NOT NULL DEFAULT 0,
+                row TEXT,
+                error TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_state ON items (state, lease_expires)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_sealed(self) -> bool:
+        """coordinator 已寫完所有工作列（worker 在此之前只等待、不領取）。"""
+        return self._meta("sealed") == "1"
+
+    def roc_date(self) -> str:
+        return self._meta("roc_date") or ""
+
+    def enqueue(self, records: Iterable[InputRecord], roc_date: str) -> int:
+        """依輸入順序寫入工作列並標記為可領取，回傳列數；records 分批取用，不會一次讀完。"""
+        if self.is_sealed():
+            raise ValueError(f"佇列已建立：{self.path}（請沿用，或以 --reset 重新建立）")
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM items")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('roc_date', ?)", (roc_date,))
+        total = 0
+        chunk: List[tuple] = []
+        for seq, url in records:
+            chunk.append((json.dumps(seq, ensure_ascii=False, default=json_default), url or ""))
+            if len(chunk) >= ENQUEUE_CHUNK:
+                total += self._insert(chunk)
+                chunk = []
+        total += self._insert(chunk)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sealed', '1')")
+        return total
+
+    def _insert(self, chunk: List[tuple]) -> int:
+        if chunk:
+            with self._transaction() as conn:
+                conn.executemany("INSERT INTO items (seq, url) VALUES (?, ?)", chunk)
+        return len(chunk)
+
+    def lease(self, worker: str, limit: int = config.QUEUE_BATCH_SIZE) -> List[WorkItem]:
+        """租用最多 limit 列（待處理或租約已到期的列，依輸入順序）；派發次數已滿又逾時的列改為放棄。"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE items SET state = 'failed', error = '租約逾時次數過多', updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT id, seq, url, attempts FROM items "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(worker, now + self.visibility_timeout, now, row[0]) for row in rows],
+            )
+        return [WorkItem(item_id, json.loads(seq), url, attempts + 1) for item_id, seq, url, attempts in rows]
+
+    def touch(self, item_id: int, worker: str) -> bool:
+        """延長租約；回傳 False 表示這一列已不屬於 worker（租約到期被他人領走，或已完成）。"""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE items SET lease_expires = ?, updated_at = ? WHERE id = ? AND state = 'leased' AND worker = ?",
+                (now + self.visibility_timeout, now, item_id, worker),
+            )
+        return cur.rowcount > 0
+
+    def complete(self, item_id: int, worker: str, row: Dict[str, object]) -> bool:
+        """存回輸出列；同一列被重複處理時以第一個完成的結果為準。"""
+        data = json.dumps(row, ensure_ascii=False, default=json_default)
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE items SET state = 'done', worker = ?, row = ?, error = '', updated_at = ? "
+                "WHERE id = ? AND state IN ('pending', 'leased')",
+                (worker, data, time.time(), item_id),
+            )
+        return cur.rowcount > 0
+
+    def fail(self, item_id: int, worker: str, error: str, row: Optional[Dict[str, object]] = None) -> str:
+        """
+        放回租用中的一列：派發次數未滿時退回佇列（立即可被領取），否則改為放棄並保留 row（最後一次的輸出列）。
+        回傳新的狀態；這一列已不屬於 worker 時回傳空字串。
+        """
+        data = json.dumps(row, ensure_ascii=False, default=json_default) if row is not None else None
+        with self._transaction() as conn:
+            found = conn.execute(
+                "SELECT attempts FROM items WHERE id = ? AND state = 'leased' AND worker = ?", (item_id, worker)
+            ).fetchone()
+            if found is None:
+                return ""
+            state = PENDING if found[0] < self.max_attempts else FAILED
+            conn.execute(
+                "UPDATE items SET state = ?, lease_expires = 0, row = ?, error = ?, updated_at = ? WHERE id = ?",
+                (state, data, error, time.time(), item_id),
+            )
+        return state
+
+    def counts(self) -> Counter:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall()
+        return Counter(dict(rows))
+
+    def remaining(self) -> int:
+        counts = self.counts()
+        return counts[PENDING] + counts[LEASED]
+
+    def iter_rows(self, roc_date: str = "") -> Iterator[Dict[str, object]]:
+        """依輸入順序逐列產生輸出列；放棄的列附上錯誤原因，尚未完成的列標示為未完成。"""
+        roc_date = roc_date or self.roc_date()
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, seq, url, state, row, error FROM items WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, ENQUEUE_CHUNK),
+                ).fetchall()
+            if not rows:
+                return
+            for item_id, seq, url, state, data, error in rows:
+                last_id = item_id
+                if data is not None and state in (DONE, FAILED):
+                    yield json.loads(data)
+                else:
+                    info = {"商品名稱": f"錯誤：{error or '尚未完成'}"}
+                    yield _build_output_row(json.loads(seq), url, info, roc_date)
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return "📊 工作佇列：" + "、".join(f"{label} {counts[state]}" for state, label in STATE_LABELS.items())
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM meta")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_leased(
+    queue: WorkQueue, worker: str, batch_size: int = config.QUEUE_BATCH_SIZE, poll_interval: float = 5.0
+) -> Iterator[WorkItem]:
+    """持續租用工作列，直到佇列中沒有待處理或處理中的列為止；其他 worker 的租約未到期時等待（佇列須已標記為可領取）。"""
+    while True:
+        items = queue.lease(worker, batch_size)
+        if items:
+            yield from items
+        elif queue.remaining() == 0:
+            return
+        else:
+            time.sleep(poll_interval)
+
+
+def run_worker(
+    queue: WorkQueue,
+    worker: str = "",
+    max_workers: int = config.MAX_WORKERS,
+    batch_size: int = config.QUEUE_BATCH_SIZE,
+    poll_interval: float = 5.0,
+    rate_per_host: float = config.RATE_PER_HOST,
+    burst: int = config.RATE_BURST,
+    cache: Optional[PageCache] = None,
+    archive: Optional[PageArchive] = None,
+    metrics: Optional[RunMetrics] = None,
+    rules: Optional[str] = None,
+    light: bool = False,
+) -> Counter:
+    """
+    從佇列領取工作並抓取，直到佇列處理完畢；回傳本 worker 的結果統計（done / retry / failed / lost）。
+    抓取失敗（商品名稱未取得或為錯誤訊息）的列退回佇列，讓同一或其他 worker 重試；派發次數用完才以失敗結果定案。
+    """
+    worker = worker or default_worker_id()
+    batch_size = max(1, batch_size or max_workers)
+    limiter = HostRateLimiter(rate=rate_per_host, burst=burst)
+    policy = make_retry_policy()
+    stats: Counter = Counter()
+    stats_lock = threading.Lock()
+    roc_date = ""
+
+    def _process(item: WorkItem) -> None:
+        # 租用後可能在本機等待了一段時間：開始前先延長租約，已被他人領走就略過
+        if not queue.touch(item.item_id, worker):
+            outcome = "lost"
+        else:
+            trace = RowTrace(seq=item.seq, url=item.url) if metrics is not None else None
+            info: Dict[str, str] = {}
+            if item.url:
+                info = fetch_momo_product(
+                    item.url,
+                    rate_limiter=limiter,
+                    cache=cache,
+                    retry_policy=policy,
+                    trace=trace,
+                    rules=rules,
+                    archive=archive,
+                    light=light,
+                )
+            row = _build_output_row(item.seq, item.url, info, roc_date)
+            if item.url and fetch_failed(info):
+                error = (trace.error if trace is not None else "") or "抓取失敗"
+                state = queue.fail(item.item_id, worker, error, row)
+                outcome = {PENDING: "retry", FAILED: "failed"}.get(state, "lost")
+            else:
+                outcome = "done" if queue.complete(item.item_id, worker, row) else "lost"
+            if trace is not None:
+                trace.finish()
+                metrics.record(trace)
+        with stats_lock:
+            stats[outcome] += 1
+
+    while not queue.is_sealed():
+        time.sleep(poll_interval)
+    roc_date = queue.roc_date()
+    print(f"👷 worker {worker} 開始領取工作（每次 {batch_size} 列）")
+    for _ in imap_ordered(_process, iter_leased(queue, worker, batch_size, poll_interval), max_workers=max_workers):
+        pass
+    print(f"✅ worker {worker} 結束：完成 {stats['done']}、退回重試 {stats['retry']}、放棄 {stats['failed']}")
+    return stats
+
+
+def numbered_path(path: str, index: int) -> str:
+    """第 index 個本機 worker 行程的存檔 / trace 路徑（pages.bin → pages-1.bin）；PageArchive 與 trace 檔不能跨行程共用。"""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index}{ext}"
+
+
+def _worker_process(path: str, options: Dict[str, object]) -> None:
+    # coordinator 以 --local-workers 啟動的 worker 行程：各自開啟佇列、快取、存檔與 trace
+    from .session import configure_session
+
+    configure_session(pool_size=max(config.POOL_SIZE, int(options["max_workers"])))
+    queue = WorkQueue(
+        path,
+        visibility_timeout=float(options.pop("visibility_timeout")),
+        max_attempts=int(options.pop("max_attempts")),
+    )
+    cache_path = str(options.pop("cache_path"))
+    cache = None
+    if cache_path:
+        cache = PageCache(cache_path, ttl_seconds=config.CACHE_TTL_SECONDS, max_bytes=config.CACHE_MAX_BYTES)
+    archive_path = str(options.pop("archive_path", ""))
+    archive = PageArchive(archive_path) if archive_path else None
+    metrics = RunMetrics(str(options.pop("trace_path", "")))
+    try:
+        run_worker(queue, cache=cache, archive=archive, metrics=metrics, **options)
+    finally:
+        metrics.close()
+        if archive is not None:
+            archive.close()
+        if cache is not None:
+            cache.close()
+        queue.close()
+    print(metrics.summary())
+    if archive is not None:
+        print(archive.summary())
+
+
+def run_coordinator(
+    queue: WorkQueue,
+    input_path: Optional[str] = None,
+    local_workers: int = 0,
+    worker_options: Optional[Dict[str, object]] = None,
+    poll_interval: float = 5.0,
+    reset: bool = False,
+) -> str:
+    """
+    建立（或沿用）佇列、視需要啟動本機 worker 行程，等待所有列處理完畢後匯出活頁簿，回傳輸出檔名。
+    worker_options 的 archive_path / trace_path 依行程編號改為 numbered_path，每個本機 worker 各寫一個檔。
+    本機 worker 全部結束但仍有未完成的列時（例如 worker 異常終止），匯出目前結果並提示稍後再執行。
+    """
+    import datetime
+
+    from .common import to_roc_date
+    from .pipeline import export_to_excel, load_input_records
+
+    if reset:
+        queue.clear()
+    if queue.is_sealed():
+        print(f"續跑：沿用既有佇列 {queue.path}（{queue.summary()[2:]}）")
+    else:
+        roc_date = to_roc_date(datetime.date.today())
+        total = queue.enqueue(load_input_records(input_path), roc_date)
+        print(f"✅ 已建立工作佇列：{total} 列 → {queue.path}")
+    roc_date = queue.roc_date()
+
+    # 以 spawn 啟動：子行程不繼承 coordinator 已開啟的 SQLite 連線
+    context = multiprocessing.get_context("spawn")
+    procs: List[multiprocessing.process.BaseProcess] = []
+    for index in range(1, max(0, local_workers) + 1):
+        options = dict(worker_options or {})
+        for key in ("archive_path", "trace_path"):
+            if options.get(key):
+                options[key] = numbered_path(str(options[key]), index)
+        proc = context.Process(target=_worker_process, args=(queue.path, options))
+        proc.start()
+        procs.append(proc)
+
+    last = ""
+    try:
+        while queue.remaining():
+            if procs and not any(proc.is_alive() for proc in procs) and queue.remaining():
+                print("⚠️ 本機 worker 已全部結束，但佇列仍有未完成的列；先匯出目前結果，稍後可再執行 coordinator 續跑")
+                break
+            status = queue.summary()
+            if status != last:
+                print(status)
+                last = status
+            time.sleep(poll_interval)
+        # 佇列處理完畢後 worker 會在下一次輪詢時自行結束（寫完 trace 與存檔）；逾時或中斷才強制結束
+        deadline = time.monotonic() + float((worker_options or {}).get("poll_interval", poll_interval)) + 10
+        for proc in procs:
+            proc.join(timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+    print(queue.summary())
+    return export_to_excel(queue.iter_rows(roc_date), roc_date)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="momo_tools.workqueue", description="大量查核的分散式工作佇列")
+    parser.add_argument("--queue", default=config.QUEUE_PATH, help="佇列檔路徑（SQLite，須所有 worker 可存取）")
+    parser.add_argument(
+        "--visibility-timeout", type=float, default=config.QUEUE_VISIBILITY_TIMEOUT, help="租約逾時秒數"
+    )
+    parser.add_argument("--max-attempts", type=int, default=config.QUEUE_MAX_ATTEMPTS, help="單列最多派發次數")
+    parser.add_argument("--poll", type=float, default=5.0, help="等待時的輪詢間隔（秒）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _add_worker_options(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--workers", type=int, default=config.MAX_WORKERS, help="每個 worker 同時在途的請求數")
+        p.add_argument("--batch-size", type=int, default=config.QUEUE_BATCH_SIZE, help="每次租用的列數")
+        p.add_argument("--rules", default=config.BSMI_RULES, help="商檢字號判定規則版本")
+        p.add_argument("--light", action="store_true", help="輕量抓取（見 lightfetch）")
+        p.add_argument("--no-cache", action="store_true", help="不使用本機頁面快取")
+        p.add_argument("--trace", default="", help="逐列耗時 trace（JSONL）路徑（預設不寫）")
+
+    coordinator = sub.add_parser("coordinator", help="建立佇列、等待完成並匯出活頁簿")
+    coordinator.add_argument("--input", default="", help="查核清單路徑（CSV / XLSX）")
+    coordinator.add_argument("--local-workers", type=int, default=0, help="同時在本機啟動的 worker 行程數")
+    coordinator.add_argument("--reset", action="store_true", help="清除既有佇列重新建立")
+    coordinator.add_argument(
+        "--archive", default="", help="原始頁面存檔路徑；本機 worker 各自寫入「檔名-N.副檔名」（預設不存檔）"
+    )
+    _add_worker_options(coordinator)
+    worker = sub.add_parser("worker", help="領取並處理工作，直到佇列處理完畢")
+    worker.add_argument("--id", default="", help="worker 名稱（預設為 主機名稱:行程編號）")
+    worker.add_argument(
+        "--archive", default="", help="原始頁面存檔路徑；多個 worker 行程請各自使用不同的檔案（預設不存檔）"
+    )
+    _add_worker_options(worker)
+    sub.add_parser("status", help="顯示佇列各狀態列數")
+    export = sub.add_parser("export", help="依目前結果匯出活頁簿（未完成的列標示為未完成）")
+    export.add_argument("--roc-date", default="", help="輸出檔名與查核日期（預設為建立佇列當天）")
+    args = parser.parse_args(argv)
+
+    if args.command in ("status", "export") and not os.path.exists(args.queue):
+        raise SystemExit(f"❌ 找不到佇列：{args.queue}")
+    queue = WorkQueue(args.queue, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    try:
+        if args.command == "status":
+            print(queue.summary())
+        elif args.command == "export":
+            from .pipeline import export_to_excel
+
+            roc_date = args.roc_date or queue.roc_date()
+            export_to_excel(queue.iter_rows(roc_date), roc_date)
+        elif args.command == "coordinator":
+            options = dict(
+                max_workers=args.workers,
+                batch_size=args.batch_size,
+                poll_interval=args.poll,
+                rules=args.rules,
+                light=args.light,
+                visibility_timeout=args.visibility_timeout,
+                max_attempts=args.max_attempts,
+                cache_path="" if args.no_cache else config.CACHE_PATH,
+                archive_path=args.archive,
+                trace_path=args.trace,
+            )
+            if args.light and args.archive and args.local_workers:
+                print("⚠️ --light 搭配 --archive：每頁仍會完整下載以便存檔，不會提前結束")
+            run_coordinator(
+                queue,
+                input_path=args.input or None,
+                local_workers=args.local_workers,
+                worker_options=options,
+                poll_interval=args.poll,
+                reset=args.reset,
+            )
+        else:
+            from .session import configure_session
+
+            configure_session(pool_size=max(config.POOL_SIZE, args.workers))
+            cache = None
+            if not args.no_cache and config.CACHE_PATH:
+                cache = PageCache(
+                    config.CACHE_PATH, ttl_seconds=config.CACHE_TTL_SECONDS, max_bytes=config.CACHE_MAX_BYTES
+                )
+            archive = PageArchive(args.archive) if args.archive else None
+            if args.light and archive is not None:
+                print("⚠️ --light 搭配 --archive：每頁仍會完整下載以便存檔，不會提前結束")
+            metrics = RunMetrics(args.trace)
+            try:
+                run_worker(
+                    queue,
+                    worker=args.id,
+                    max_workers=args.workers,
+                    batch_size=args.batch_size,
+                    poll_interval=args.poll,
+                    cache=cache,
+                    archive=archive,
+                    metrics=metrics,
+                    rules=args.rules,
+                    light=args.light,
+                )
+            finally:
+                metrics.close()
+                if archive is not None:
+                    archive.close()
+                if cache is not None:
+                    cache.close()
+            print(metrics.summary())
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()